@@ -1,70 +1,79 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, send_file
 from flask_cors import CORS
-from database import get_conn, setup_database, seed_if_empty, row_to_dict
-from models.user import User
+from database import (
+    get_conn, release_conn, get_pool_stats, run_write, get_writer_stats,
+    start_query_log, stop_query_log, start_backup, list_backups, get_backup_status,
+    BackupInProgress, setup_database, epoch_seconds, parse_utc, fetch_dicts, get_replica_stats
+)
+from models.user import User, UNIQUE_MESSAGES
 from models.class_model import Class
 from services.auth_service import auth_service, token_required, role_required, optional_auth
+from services.activity_service import activity_buffer
+from services.import_service import user_importer
+from services.password_service import password_service, PasswordServiceBusy
+from services.media_service import media_store
+from services.prerequisite_service import prerequisite_service
 from services.rbac_service import rbac_service, require_permission, require_any_permission, require_role, require_own_resource_or_permission, Permission
 from datetime import datetime, timedelta
-import os
-import base64
-import hmac
-import hashlib
+import io
 import json
+import logging
 
 app = Flask(__name__)
 CORS(app)
 
-# Simple secret for signing tokens (for MVP; replace with strong secret in prod)
-SECRET = os.environ.get("SKJ_SECRET", "dev-secret-change-me")
+# Each request keeps one pooled connection; hand it back when the request ends
+app.teardown_appcontext(release_conn)
 
-def setup():
-    """Setup database with migrations and seed data"""
-    setup_database()
-    seed_if_empty()
+query_logger = logging.getLogger("skj.queries")
+
+@app.before_request
+def begin_query_tracking():
+    g.query_log = start_query_log()
 
+@app.after_request
+def report_query_stats(response):
+    """Flag likely N+1 patterns and expose query stats in debug mode"""
+    log = g.get("query_log")
+    if log is None:
+        return response
 
-# --- Minimal JWT-like token for MVP (username only, HMAC-SHA256 signed) ---
+    repeated = log.repeated()
+    if repeated:
+        for sql, times in repeated.items():
+            query_logger.warning(
+                "Possible N+1 in %s %s: statement ran %d times: %s",
+                request.method, request.path, times, sql
+            )
 
-def b64url(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+    if app.debug or app.config.get("SKJ_QUERY_HEADERS"):
+        response.headers["X-Query-Count"] = str(log.count)
+        response.headers["X-Query-Time-Ms"] = f"{log.total_ms:.2f}"
+        if repeated:
+            response.headers["X-Query-Repeated"] = str(len(repeated))
+    return response
 
+@app.teardown_request
+def end_query_tracking(exc=None):
+    log = g.pop("query_log", None)
+    if log is not None:
+        stop_query_log(log)
 
-def sign_token(payload: dict, exp_minutes: int = 120) -> str:
-    header = {"alg": "HS256", "typ": "JWT"}
-    payload = dict(payload)
-    payload["exp"] = (datetime.utcnow() + timedelta(minutes=exp_minutes)).isoformat()
-    header_b64 = b64url(json.dumps(header, separators=(",", ":")).encode())
-    payload_b64 = b64url(json.dumps(payload, separators=(",", ":")).encode())
-    signing_input = f"{header_b64}.{payload_b64}".encode()
-    sig = hmac.new(SECRET.encode(), signing_input, hashlib.sha256).digest()
-    token = f"{header_b64}.{payload_b64}.{b64url(sig)}"
-    return token
+def setup():
+    """Setup database with migrations and seed data"""
+    setup_database(seed=True)
 
 
-def verify_token(token: str):
-    try:
-        header_b64, payload_b64, sig_b64 = token.split(".")
-        signing_input = f"{header_b64}.{payload_b64}".encode()
-        expected = hmac.new(SECRET.encode(), signing_input, hashlib.sha256).digest()
-        if not hmac.compare_digest(expected, base64.urlsafe_b64decode(sig_b64 + "==")):
-            return None
-        payload = json.loads(base64.urlsafe_b64decode(payload_b64 + "==").decode())
-        if "exp" in payload and datetime.fromisoformat(payload["exp"]) < datetime.utcnow():
-            return None
-        return payload
-    except Exception:
-        return None
-
-
-def get_auth_user():
-    auth = request.headers.get("Authorization", "")
-    if auth.startswith("Bearer "):
-        token = auth.split(" ", 1)[1].strip()
-        payload = verify_token(token)
-        if payload and "user_id" in payload:
-            return payload
-    return None
+@app.errorhandler(PasswordServiceBusy)
+def password_service_busy(e):
+    """Too many logins queued for the password workers"""
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+def _save_error(e):
+    """Response message for a ValueError raised by User.save"""
+    if str(e) == UNIQUE_MESSAGES['users.email']:
+        return "Email already in use"
+    return str(e)
 
 
 # Enhanced Authentication Endpoints
@@ -96,6 +105,8 @@ def auth_register():
     
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except PasswordServiceBusy:
+        raise
     except Exception as e:
         return jsonify({"error": "Registration failed"}), 500
 
@@ -144,7 +155,8 @@ def get_current_user(current_user):
 @app.post("/api/auth/logout")
 @token_required
 def auth_logout(current_user):
-    """Logout (client should discard token)"""
+    """Logout: the token is rejected for the rest of its lifetime"""
+    auth_service.revoke_token(request.headers["Authorization"].split(" ", 1)[1])
     return jsonify({"message": "Logged out successfully"})
 
 @app.put("/api/auth/profile")
@@ -157,14 +169,15 @@ def update_profile(current_user):
     if "email" in data:
         email = data["email"].strip() if data["email"] else None
         if email and email != current_user.email:
-            # Check if email is already taken
-            existing_user = User.find_by_email(email)
-            if existing_user and existing_user.id != current_user.id:
-                return jsonify({"error": "Email already in use"}), 400
+            # A taken email is rejected by the unique index on save
             current_user.email = email
     
     if "profile_picture" in data:
-        current_user.profile_picture = data["profile_picture"]
+        # Image data goes to the media store; the row keeps a short reference
+        try:
+            current_user.profile_picture = media_store.profile_picture(data["profile_picture"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     
     if "preferences" in data and isinstance(data["preferences"], dict):
         current_user.preferences.update(data["preferences"])
@@ -175,9 +188,45 @@ def update_profile(current_user):
             "message": "Profile updated successfully",
             "user": current_user.to_dict()
         })
+    except ValueError as e:
+        return jsonify({"error": _save_error(e)}), 400
     except Exception as e:
         return jsonify({"error": "Failed to update profile"}), 500
 
+@app.post("/api/auth/profile/picture")
+@token_required
+def upload_profile_picture(current_user):
+    """Upload a profile picture (multipart ``file`` or raw image body)"""
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    data = stream.read(media_store.max_bytes + 1)
+    if not data:
+        return jsonify({"error": "Image is required"}), 400
+    
+    try:
+        current_user.profile_picture = media_store.put(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    current_user.save()
+    return jsonify({
+        "message": "Profile picture updated successfully",
+        "user": current_user.to_dict()
+    })
+
+@app.get("/api/media/<ref>")
+def get_media(ref):
+    """Serve a stored image; ``?size=thumb|small`` selects a resized variant"""
+    found = media_store.open(ref, request.args.get('size'))
+    if not found:
+        return jsonify({"error": "Not found"}), 404
+    
+    path, mimetype = found
+    # Content-addressed: a reference never changes, so it can be cached forever
+    response = send_file(path, mimetype=mimetype, etag=path.name, conditional=True, max_age=31536000)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
 @app.post("/api/auth/change-password")
 @token_required
 def change_password(current_user):
@@ -211,16 +260,17 @@ def student_dashboard(current_user):
     with get_conn() as conn:
         cursor = conn.cursor()
         
-        # Get user's progress
+        # Get user's most recent progress
         cursor.execute("""
             SELECT p.*, c.title, c.points as max_points, m.title as module_title
             FROM progress p
             JOIN challenges c ON p.challenge_id = c.id
             JOIN modules m ON c.module_id = m.id
             WHERE p.user_id = ?
-            ORDER BY p.updated_at DESC
+            ORDER BY p.updated_ts DESC, p.id DESC
+            LIMIT 5
         """, (current_user.id,))
-        progress = [row_to_dict(row) for row in cursor.fetchall()]
+        progress = fetch_dicts(cursor)
         
         # Get available challenges
         cursor.execute("""
@@ -229,7 +279,7 @@ def student_dashboard(current_user):
             JOIN modules m ON c.module_id = m.id
             ORDER BY m.semester, c.id
         """)
-        challenges = [row_to_dict(row) for row in cursor.fetchall()]
+        challenges = fetch_dicts(cursor)
         
         # Get user's achievements
         cursor.execute("""
@@ -239,24 +289,24 @@ def student_dashboard(current_user):
             WHERE ua.user_id = ?
             ORDER BY ua.earned_at DESC
         """, (current_user.id,))
-        achievements = [row_to_dict(row) for row in cursor.fetchall()]
-        
-        # Calculate statistics
-        total_points = sum(p['points'] for p in progress)
-        completed_challenges = len([p for p in progress if p['status'] == 'completed'])
+        achievements = fetch_dicts(cursor)
         
-        return jsonify({
-            "user": current_user.to_dict(),
-            "statistics": {
-                "total_points": total_points,
-                "completed_challenges": completed_challenges,
-                "total_achievements": len(achievements)
-            },
-            "recent_progress": progress[:5],
-            "available_challenges": challenges,
-            "achievements": achievements,
-            "permissions": rbac_service.get_user_permissions(current_user.role)
-        })
+    # Statistics are maintained by triggers, independent of history length
+    summary = User.get_progress_summary(current_user.id)
+    
+    return jsonify({
+        "user": current_user.to_dict(),
+        "statistics": {
+            "total_points": summary['total_points'],
+            "completed_challenges": summary['completed_count'],
+            "total_achievements": len(achievements),
+            "module_completion": summary['module_completion']
+        },
+        "recent_progress": progress,
+        "available_challenges": challenges,
+        "achievements": achievements,
+        "permissions": rbac_service.get_user_permissions(current_user.role)
+    })
 
 @app.get("/api/dashboard/teacher")
 @require_permission(Permission.VIEW_STUDENT_PROGRESS)
@@ -272,9 +322,9 @@ def teacher_dashboard(current_user):
             LEFT JOIN users u ON c.id = u.class_id
             WHERE c.teacher_id = ?
             GROUP BY c.id
-            ORDER BY c.created_at DESC
+            ORDER BY c.created_ts DESC, c.id DESC
         """, (current_user.id,))
-        classes = [row_to_dict(row) for row in cursor.fetchall()]
+        classes = fetch_dicts(cursor)
         
         # Get students in teacher's classes
         cursor.execute("""
@@ -284,7 +334,7 @@ def teacher_dashboard(current_user):
             WHERE c.teacher_id = ? AND u.role = 'student'
             ORDER BY c.name, u.name
         """, (current_user.id,))
-        students = [row_to_dict(row) for row in cursor.fetchall()]
+        students = fetch_dicts(cursor)
         
         # Get recent student activity
         cursor.execute("""
@@ -294,10 +344,10 @@ def teacher_dashboard(current_user):
             JOIN challenges ch ON p.challenge_id = ch.id
             JOIN classes c ON u.class_id = c.id
             WHERE c.teacher_id = ?
-            ORDER BY p.updated_at DESC
+            ORDER BY p.updated_ts DESC, p.id DESC
             LIMIT 10
         """, (current_user.id,))
-        recent_activity = [row_to_dict(row) for row in cursor.fetchall()]
+        recent_activity = fetch_dicts(cursor)
         
         # Calculate statistics
         total_students = len(students)
@@ -320,7 +370,8 @@ def teacher_dashboard(current_user):
 @require_permission(Permission.VIEW_ALL_PROGRESS)
 def admin_dashboard(current_user):
     """Admin dashboard with system-wide statistics and management"""
-    with get_conn() as conn:
+    # Reporting reads may come from the read replica
+    with get_conn(readonly=True) as conn:
         cursor = conn.cursor()
         
         # Get system statistics
@@ -345,7 +396,7 @@ def admin_dashboard(current_user):
             ORDER BY created_at DESC 
             LIMIT 10
         """)
-        recent_users = [row_to_dict(row) for row in cursor.fetchall()]
+        recent_users = fetch_dicts(cursor)
         
         # Get system activity
         cursor.execute("""
@@ -353,10 +404,10 @@ def admin_dashboard(current_user):
             FROM progress p
             JOIN users u ON p.user_id = u.id
             JOIN challenges c ON p.challenge_id = c.id
-            ORDER BY p.updated_at DESC
+            ORDER BY p.updated_ts DESC, p.id DESC
             LIMIT 15
         """)
-        recent_activity = [row_to_dict(row) for row in cursor.fetchall()]
+        recent_activity = fetch_dicts(cursor)
         
         return jsonify({
             "user": current_user.to_dict(),
@@ -372,14 +423,70 @@ def admin_dashboard(current_user):
             "permissions": rbac_service.get_user_permissions(current_user.role)
         })
 
+@app.get("/api/analytics/activity")
+@require_permission(Permission.VIEW_ALL_PROGRESS)
+def activity_analytics(current_user):
+    """Daily progress activity in a date range (?start=YYYY-MM-DD&end=YYYY-MM-DD, end exclusive)"""
+    try:
+        now = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=1)
+        # Offsets are converted so everything compares as naive UTC
+        end = parse_utc(request.args["end"]) if request.args.get("end") else now
+        start = parse_utc(request.args["start"]) if request.args.get("start") else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates (YYYY-MM-DD)"}), 400
+    if start >= end:
+        return jsonify({"error": "start must be before end"}), 400
+
+    with get_conn(readonly=True) as conn:
+        cursor = conn.cursor()
+        # Range over the integer epoch column is an index seek
+        cursor.execute("""
+            SELECT date(created_ts, 'unixepoch') as day,
+                   COUNT(*) as events,
+                   COUNT(DISTINCT user_id) as active_users
+            FROM detailed_progress
+            WHERE created_ts >= ? AND created_ts < ?
+            GROUP BY day
+            ORDER BY day
+        """, (epoch_seconds(start.isoformat()), epoch_seconds(end.isoformat())))
+        days = fetch_dicts(cursor)
+
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total_events": sum(day["events"] for day in days),
+        "days": days
+    })
+
 # Enhanced User Management Endpoints
+@app.post("/api/admin/users/import")
+@require_permission(Permission.CREATE_USERS)
+def import_users_endpoint(current_user):
+    """Bulk import users from an uploaded CSV or JSONL file (admin only)"""
+    upload = request.files.get('file')
+    filename = (upload.filename if upload else '') or ''
+    fmt = request.args.get('format')
+    if not fmt:
+        content_type = upload.mimetype if upload else request.mimetype
+        fmt = "jsonl" if filename.endswith(('.jsonl', '.ndjson')) or 'ndjson' in content_type or 'jsonl' in content_type else "csv"
+    class_id = request.args.get('class_id', type=int)
+    
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = user_importer.import_users(stream, fmt, class_id=class_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({"error": "File must be UTF-8 encoded"}), 400
+    
+    return jsonify(summary)
+
 @app.get("/api/users")
 @require_permission(Permission.VIEW_USERS)
 def list_users(current_user):
     """List all users (teachers and admins only)"""
     role_filter = request.args.get('role')
-    users = User.get_all_users(role=role_filter)
-    return jsonify([user.to_dict() for user in users])
+    return jsonify(User.get_all_user_dicts(role=role_filter))
 
 @app.get("/api/users/<int:user_id>")
 @require_own_resource_or_permission('user_id', Permission.VIEW_USERS)
@@ -415,9 +522,7 @@ def update_user(current_user, user_id):
     if "email" in data:
         email = data["email"].strip() if data["email"] else None
         if email and email != user.email:
-            existing_user = User.find_by_email(email)
-            if existing_user and existing_user.id != user.id:
-                return jsonify({"error": "Email already in use"}), 400
+            # A taken email is rejected by the unique index on save
             user.email = email
     
     try:
@@ -426,6 +531,8 @@ def update_user(current_user, user_id):
             "message": "User updated successfully",
             "user": user.to_dict()
         })
+    except ValueError as e:
+        return jsonify({"error": _save_error(e)}), 400
     except Exception as e:
         return jsonify({"error": "Failed to update user"}), 500
 
@@ -471,10 +578,7 @@ def list_classes(current_user):
     include_students = request.args.get('include_students', 'false').lower() == 'true'
     include_progress = request.args.get('include_progress', 'false').lower() == 'true'
     
-    return jsonify([
-        class_obj.to_dict(include_students=include_students, include_progress=include_progress) 
-        for class_obj in classes
-    ])
+    return jsonify(Class.to_dicts(classes, include_students=include_students, include_progress=include_progress))
 
 @app.post("/api/classes")
 @require_permission(Permission.CREATE_CLASSES)
@@ -529,7 +633,7 @@ def get_class(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only view their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     include_students = request.args.get('include_students', 'true').lower() == 'true'
@@ -548,7 +652,7 @@ def update_class(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only edit their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     data = request.get_json(force=True)
@@ -611,7 +715,7 @@ def delete_class(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only delete their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     # Check if class has students
@@ -643,7 +747,7 @@ def deactivate_class(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only deactivate their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     try:
@@ -665,7 +769,7 @@ def add_student_to_class(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only manage their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     data = request.get_json(force=True)
@@ -682,12 +786,14 @@ def add_student_to_class(current_user, class_id):
     if student.role != 'student':
         return jsonify({"error": "User is not a student"}), 400
     
-    # Check if student is already in a class
-    if student.class_id:
+    # Students in another class are not moved (same as the bulk endpoint's in_other_class)
+    if student.class_id and student.class_id != class_obj.id:
         existing_class = Class.find_by_id(student.class_id)
         if existing_class:
             return jsonify({
-                "error": f"Student is already enrolled in class '{existing_class.name}'"
+                "error": f"Student is already enrolled in class '{existing_class.name}'",
+                "status": "in_other_class",
+                "class_id": existing_class.id
             }), 400
     
     try:
@@ -713,7 +819,7 @@ def remove_student_from_class(current_user, class_id, student_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only manage their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     student = User.find_by_id(student_id)
@@ -730,6 +836,71 @@ def remove_student_from_class(current_user, class_id, student_id):
     except Exception as e:
         return jsonify({"error": "Failed to remove student from class"}), 500
 
+MAX_BULK_STUDENTS = 1000
+
+def _bulk_roster_request(current_user, class_id):
+    """Validate a bulk roster request; returns (class, student_ids, error response)"""
+    class_obj = Class.find_by_id(class_id)
+    if not class_obj:
+        return None, None, (jsonify({"error": "Class not found"}), 404)
+    
+    # Teachers can only manage their own classes
+    if not rbac_service.can_access_class(current_user, class_obj):
+        return None, None, (jsonify({"error": "Access denied"}), 403)
+    
+    data = request.get_json(force=True, silent=True) or {}
+    student_ids = data.get('student_ids')
+    if not isinstance(student_ids, list) or not student_ids or not all(
+        isinstance(student_id, int) and not isinstance(student_id, bool) for student_id in student_ids
+    ):
+        return None, None, (jsonify({"error": "student_ids must be a non-empty list of user IDs"}), 400)
+    if len(student_ids) > MAX_BULK_STUDENTS:
+        return None, None, (jsonify({"error": f"At most {MAX_BULK_STUDENTS} students per request"}), 400)
+    
+    return class_obj, student_ids, None
+
+def _bulk_roster_response(results, status):
+    """Summarize per-student roster results"""
+    counts = {}
+    for result in results.values():
+        counts[result] = counts.get(result, 0) + 1
+    return jsonify({
+        status: counts.get(status, 0),
+        "skipped": len(results) - counts.get(status, 0),
+        "counts": counts,
+        "results": [{"student_id": student_id, "status": result} for student_id, result in results.items()]
+    })
+
+@app.post("/api/classes/<int:class_id>/students/bulk")
+@require_permission(Permission.MANAGE_CLASS_MEMBERS)
+def bulk_add_students_to_class(current_user, class_id):
+    """Enroll many students at once, up to the class capacity.
+
+    Students already in another class are skipped (``in_other_class``),
+    as the single-student endpoint rejects them.
+    """
+    class_obj, student_ids, error = _bulk_roster_request(current_user, class_id)
+    if error:
+        return error
+    
+    try:
+        return _bulk_roster_response(class_obj.add_students(student_ids), "enrolled")
+    except Exception as e:
+        return jsonify({"error": "Failed to add students to class"}), 500
+
+@app.post("/api/classes/<int:class_id>/students/bulk-remove")
+@require_permission(Permission.MANAGE_CLASS_MEMBERS)
+def bulk_remove_students_from_class(current_user, class_id):
+    """Remove many students at once"""
+    class_obj, student_ids, error = _bulk_roster_request(current_user, class_id)
+    if error:
+        return error
+    
+    try:
+        return _bulk_roster_response(class_obj.remove_students(student_ids), "removed")
+    except Exception as e:
+        return jsonify({"error": "Failed to remove students from class"}), 500
+
 @app.post("/api/classes/join")
 @token_required
 def join_class_by_code(current_user):
@@ -806,7 +977,7 @@ def get_class_students(current_user, class_id):
         return jsonify({"error": "Class not found"}), 404
     
     # Teachers can only view their own classes
-    if current_user.role == "teacher" and class_obj.teacher_id != current_user.id:
+    if not rbac_service.can_access_class(current_user, class_obj):
         return jsonify({"error": "Access denied"}), 403
     
     students = class_obj.get_students()
@@ -817,6 +988,20 @@ def get_class_students(current_user, class_id):
         "total_students": len(students)
     })
 
+@app.get("/api/classes/<int:class_id>/unlocks")
+@require_permission(Permission.VIEW_STUDENT_PROGRESS)
+def get_class_unlocks(current_user, class_id):
+    """Completed/available/locked status of every challenge for every student in a class"""
+    class_obj = Class.find_by_id(class_id)
+    if not class_obj:
+        return jsonify({"error": "Class not found"}), 404
+    
+    # Teachers can only view their own classes
+    if not rbac_service.can_access_class(current_user, class_obj):
+        return jsonify({"error": "Access denied"}), 403
+    
+    return jsonify(prerequisite_service.get_class_unlock_matrix(class_id, request.args.get("module_id")))
+
 
 # Modules and challenges
 @app.get("/api/modules")
@@ -824,29 +1009,56 @@ def get_modules():
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM modules ORDER BY semester, id")
-        mods = [row_to_dict(r) for r in cur.fetchall()]
+        mods = fetch_dicts(cur)
+        by_module = {m["id"]: m for m in mods}
         for m in mods:
-            cur.execute("SELECT * FROM challenges WHERE module_id=? ORDER BY id", (m["id"],))
-            m["challenges"] = [row_to_dict(r) for r in cur.fetchall()]
+            m["challenges"] = []
+        # One query for all challenges instead of one per module
+        cur.execute("SELECT * FROM challenges ORDER BY id")
+        for c in fetch_dicts(cur):
+            if c["module_id"] in by_module:
+                by_module[c["module_id"]]["challenges"].append(c)
         return jsonify(mods)
 
 
 # Progress (protected endpoints but lenient for MVP if no token)
 @app.get("/api/progress/<int:user_id>")
 def get_progress(user_id: int):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM progress WHERE user_id=?", (user_id,))
-        rows = [row_to_dict(r) for r in cur.fetchall()]
-        total_points = sum(r["points"] for r in rows)
-        completed = [r["challenge_id"] for r in rows if r["status"] == "completed"]
-        return jsonify({"user_id": user_id, "points": total_points, "completed": completed, "entries": rows})
+    summary = User.get_progress_summary(user_id)
+    result = {
+        "user_id": user_id,
+        "points": summary["total_points"],
+        "completed": summary["completed"],
+        "module_completion": summary["module_completion"]
+    }
+    # The raw rows grow with the user's history; clients can skip them
+    if request.args.get('include_entries', 'true').lower() != 'false':
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM progress WHERE user_id=?", (user_id,))
+            result["entries"] = fetch_dicts(cur)
+    return jsonify(result)
+
+
+def _write_progress(conn, user_id, challenge_id, status, points, payload):
+    """Write unit: upsert a progress row and log the detailed action"""
+    cur = conn.cursor()
+    ts = datetime.utcnow().isoformat()
+    epoch = epoch_seconds(ts)
+    cur.execute("""INSERT INTO progress(user_id, challenge_id, status, points, updated_at, updated_ts) VALUES(?,?,?,?,?,?)
+                   ON CONFLICT(user_id, challenge_id) DO UPDATE SET
+                       status=excluded.status, points=excluded.points,
+                       updated_at=excluded.updated_at, updated_ts=excluded.updated_ts""",
+                (user_id, challenge_id, status, points, ts, epoch))
+    # optional: write detailed action
+    cur.execute("INSERT INTO detailed_progress(user_id, challenge_id, action, payload, created_at, created_ts) VALUES(?,?,?,?,?,?)",
+                (user_id, challenge_id, "upsert_progress", payload, ts, epoch))
 
 
 @app.post("/api/progress")
 def upsert_progress():
     # For MVP, allow without JWT but prefer with Authorization: Bearer <token>
-    payload = get_auth_user()
+    payload = auth_service.get_current_claims()
     data = request.get_json(force=True)
     user_id = data.get("user_id") or (payload and payload.get("user_id"))
     challenge_id = data.get("challenge_id")
@@ -854,21 +1066,8 @@ def upsert_progress():
     points = int(data.get("points", 0))
     if not user_id or not challenge_id:
         return jsonify({"error": "user_id and challenge_id required"}), 400
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM progress WHERE user_id=? AND challenge_id=?", (user_id, challenge_id))
-        row = cur.fetchone()
-        ts = datetime.utcnow().isoformat()
-        if row:
-            cur.execute("UPDATE progress SET status=?, points=?, updated_at=? WHERE id=?", (status, points, ts, row["id"]))
-        else:
-            cur.execute("INSERT INTO progress(user_id, challenge_id, status, points, updated_at) VALUES(?,?,?,?,?)",
-                        (user_id, challenge_id, status, points, ts))
-        # optional: write detailed action
-        cur.execute("INSERT INTO detailed_progress(user_id, challenge_id, action, payload, created_at) VALUES(?,?,?,?,?)",
-                    (user_id, challenge_id, "upsert_progress", json.dumps(data), ts))
-        conn.commit()
-        return jsonify({"ok": True})
+    run_write(_write_progress, user_id, challenge_id, status, points, json.dumps(data))
+    return jsonify({"ok": True})
 
 
 @app.get("/api/leaderboard")
@@ -876,16 +1075,49 @@ def api_leaderboard():
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
-        SELECT u.name, COALESCE(SUM(p.points),0) AS points
+        SELECT u.name, COALESCE(s.total_points,0) AS points
         FROM users u
-        LEFT JOIN progress p ON p.user_id=u.id
-        GROUP BY u.id
+        LEFT JOIN user_stats s ON s.user_id=u.id
         ORDER BY points DESC, u.name ASC
         """)
         rows = [{"name": r["name"], "points": r["points"]} for r in cur.fetchall()]
         return jsonify(rows)
 
 
+# System administration
+@app.get("/api/admin/system/stats")
+@require_permission(Permission.MANAGE_SYSTEM)
+def system_stats(current_user):
+    """Runtime statistics for the backend (admin only)"""
+    return jsonify({
+        "database": get_pool_stats(),
+        "writer": get_writer_stats(),
+        "replica": get_replica_stats(),
+        "activity": activity_buffer.stats(),
+        "passwords": password_service.stats(),
+        "tokens": auth_service.cache.stats()
+    })
+
+@app.post("/api/admin/backups")
+@require_permission(Permission.MANAGE_SYSTEM)
+def create_backup_endpoint(current_user):
+    """Start an online database backup in the background (admin only)"""
+    try:
+        start_backup()
+    except BackupInProgress as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"message": "Backup started", "status": get_backup_status()}), 202
+
+@app.get("/api/admin/backups")
+@require_permission(Permission.MANAGE_SYSTEM)
+def list_backups_endpoint(current_user):
+    """List backup snapshots and the state of the last backup (admin only)"""
+    return jsonify({
+        "backups": list_backups(),
+        "status": get_backup_status()
+    })
+
+
 if __name__ == "__main__":
     # Flask 3.1 menghapus before_first_request; panggil setup() langsung saat start
     setup()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Online database backups using the SQLite backup API.
+
+Usage:
+    python backup.py create [--dir DIR] [--keep N] [--pages N] [--sleep SECONDS]
+    python backup.py list [--dir DIR]
+"""
+
+import argparse
+import sys
+
+from database import create_backup, list_backups, BackupInProgress
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and list verified database backups")
+    parser.add_argument("command", choices=["create", "list"])
+    parser.add_argument("--dir", help="Backup directory (default: backups/ or SKJ_BACKUP_DIR)")
+    parser.add_argument("--keep", type=int, help="Number of snapshots to keep")
+    parser.add_argument("--pages", type=int, help="Pages copied per step")
+    parser.add_argument("--sleep", type=float, help="Seconds to pause between steps")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        try:
+            backup = create_backup(args.dir, pages=args.pages, sleep=args.sleep, keep=args.keep)
+        except BackupInProgress as e:
+            print(f"Error: {e}")
+            return 1
+        except Exception as e:
+            print(f"Backup failed: {e}")
+            return 1
+        print(f"Created {backup['path']} ({backup['size']} bytes, integrity ok)")
+        return 0
+
+    backups = list_backups(args.dir)
+    for backup in backups:
+        print(f"{backup['name']}  {backup['size']:>12} bytes  {backup['created_at']}")
+    print(f"{len(backups)} backups")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,1027 @@
+import atexit
+import json
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 from migrations.migration_manager import MigrationManager
 
 DB_PATH = Path(__file__).parent / "skj.db"
 MIGRATIONS_DIR = Path(__file__).parent / "migrations"
 
-def get_conn():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DB_PATH)
+# Bump when the tables created by init_db() change so existing databases
+# fail the startup fast path and are brought up to date
+INIT_SCHEMA_REVISION = 1
+
+# Connection pool settings (override with environment variables)
+POOL_SIZE = int(os.environ.get("SKJ_DB_POOL_SIZE", "32"))
+POOL_TIMEOUT = float(os.environ.get("SKJ_DB_POOL_TIMEOUT", "10"))
+BUSY_TIMEOUT_MS = int(os.environ.get("SKJ_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Single-writer queue settings
+WRITE_QUEUE_SIZE = int(os.environ.get("SKJ_WRITE_QUEUE_SIZE", "1024"))
+WRITE_BATCH_MAX = int(os.environ.get("SKJ_WRITE_BATCH_MAX", "256"))
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("SKJ_WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_TIMEOUT = float(os.environ.get("SKJ_WRITE_TIMEOUT", "30"))
+
+# Query instrumentation settings
+SLOW_QUERY_MS = float(os.environ.get("SKJ_SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("SKJ_N_PLUS_ONE_THRESHOLD", "5"))
+
+# Online backup settings
+BACKUP_DIR = Path(os.environ.get("SKJ_BACKUP_DIR", Path(__file__).parent / "backups"))
+BACKUP_KEEP = int(os.environ.get("SKJ_BACKUP_KEEP", "7"))
+BACKUP_PAGES = int(os.environ.get("SKJ_BACKUP_PAGES", "256"))       # pages copied per step
+BACKUP_SLEEP = float(os.environ.get("SKJ_BACKUP_SLEEP", "0.05"))    # seconds between steps
+
+# Read replica settings; reporting queries may read a snapshot this old
+READ_REPLICA = os.environ.get("SKJ_READ_REPLICA", "").lower() in ("1", "true", "yes", "on")
+REPLICA_DIR = Path(os.environ.get("SKJ_REPLICA_DIR", Path(__file__).parent / "replica"))
+REPLICA_MAX_STALENESS = float(os.environ.get("SKJ_REPLICA_MAX_STALENESS", "60"))
+REPLICA_REFRESH_INTERVAL = float(os.environ.get("SKJ_REPLICA_REFRESH_INTERVAL", str(REPLICA_MAX_STALENESS / 2)))
+
+logger = logging.getLogger("skj.database")
+
+# PRAGMAs applied to every pooled connection
+CONNECTION_PRAGMAS = (
+    ("journal_mode", "WAL"),           # readers never block the writer
+    ("synchronous", "NORMAL"),         # fsync on checkpoint, not on every commit
+    ("cache_size", "-16000"),          # ~16 MB page cache per connection
+    ("mmap_size", "134217728"),        # 128 MB memory-mapped reads
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", str(BUSY_TIMEOUT_MS)),
+)
+
+
+class QueryRecord:
+    """One executed statement with its timing and row count"""
+
+    __slots__ = ('sql', 'duration', 'rows', 'reported')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.duration = 0.0
+        self.rows = 0
+        self.reported = False
+
+
+class QueryLog:
+    """Statements executed by one thread while the log is active"""
+
+    def __init__(self):
+        self.records = []
+
+    @property
+    def count(self):
+        return len(self.records)
+
+    @property
+    def total_ms(self):
+        return sum(record.duration for record in self.records) * 1000
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Statements run at least ``threshold`` times (likely N+1 patterns)"""
+        counts = Counter(record.sql for record in self.records)
+        return {sql: n for sql, n in counts.items() if n >= threshold}
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 2),
+            'repeated': self.repeated()
+        }
+
+
+_query_local = threading.local()
+
+def _active_logs():
+    return getattr(_query_local, 'logs', None)
+
+def start_query_log():
+    """Start recording statements executed by the current thread"""
+    log = QueryLog()
+    logs = _active_logs()
+    if logs is None:
+        logs = _query_local.logs = []
+    logs.append(log)
+    return log
+
+def stop_query_log(log):
+    """Stop recording into ``log``"""
+    logs = _active_logs()
+    if logs and log in logs:
+        logs.remove(log)
+    return log
+
+@contextmanager
+def track_queries():
+    """Record every statement executed in the block (nested logs all see them)"""
+    log = start_query_log()
+    try:
+        yield log
+    finally:
+        stop_query_log(log)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def query_budget(max_queries):
+    """Test helper: fail if the block runs more than ``max_queries`` statements"""
+    with track_queries() as log:
+        yield log
+    if log.count > max_queries:
+        statements = "\n".join(f"  {record.sql}" for record in log.records)
+        raise QueryBudgetExceeded(
+            f"Expected at most {max_queries} queries, got {log.count}:\n{statements}"
+        )
+
+
+def _normalize_sql(sql):
+    return " ".join(sql.split())
+
+def _log_slow_query(cursor, record, params):
+    """Log a slow statement together with its query plan"""
+    record.reported = True
+    plan = []
+    if record.sql.upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+        try:
+            # Plain cursor so the EXPLAIN itself is not instrumented
+            plan_cursor = sqlite3.Cursor(cursor.connection)
+            plan = [row[3] for row in plan_cursor.execute(f"EXPLAIN QUERY PLAN {record.sql}", params)]
+        except sqlite3.Error:
+            pass
+    logger.warning(
+        "Slow query (%.1f ms, %d rows): %s | plan: %s",
+        record.duration * 1000, record.rows, record.sql, "; ".join(plan) or "n/a"
+    )
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times statements, counts rows and logs slow queries"""
+
+    _record = None
+    _params = ()
+
+    def _track(self, sql, params, run):
+        start = time.perf_counter()
+        try:
+            return run()
+        finally:
+            elapsed = time.perf_counter() - start
+            record = QueryRecord(_normalize_sql(sql))
+            record.duration = elapsed
+            logs = _active_logs()
+            if logs:
+                for log in logs:
+                    log.records.append(record)
+            self._record = record
+            self._params = params
+            if self.rowcount > 0:
+                record.rows = self.rowcount
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                _log_slow_query(self, record, params)
+
+    def execute(self, sql, parameters=()):
+        return self._track(sql, parameters, lambda: super(InstrumentedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._track(sql, (), lambda: super(InstrumentedCursor, self).executemany(sql, seq_of_parameters))
+
+    def _fetched(self, rows, start, done):
+        record = self._record
+        if record is not None:
+            record.rows += rows
+            record.duration += time.perf_counter() - start
+            if done and not record.reported and record.duration * 1000 >= SLOW_QUERY_MS:
+                _log_slow_query(self, record, self._params)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, start, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start, not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start, True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(0, start, True)
+            raise
+        self._fetched(1, start, False)
+        return row
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection owned by a ConnectionPool.
+
+    close() is a no-op so existing ``conn.close()`` calls do not tear down a
+    connection that is still leased to the current request; the pool closes
+    connections itself through ``_close()``. Cursors are instrumented so each
+    request can report its queries.
+
+    Because every get_conn() in a thread returns this one connection, a
+    ``with get_conn()`` block entered inside another one (or while the
+    caller has uncommitted writes) does not own the transaction: it runs in
+    a savepoint, its commit() is a no-op and its rollback() only undoes the
+    block's own work. Only the outermost block commits or rolls back.
+    """
+
+    _frames = ()
+
+    def _raw(self, sql):
+        # Plain cursor so savepoint bookkeeping is not instrumented
+        sqlite3.Cursor(self).execute(sql)
+
+    def _nested(self):
+        return bool(self._frames) and self._frames[-1] is not None
+
+    def __enter__(self):
+        frames = list(self._frames)
+        if frames or self.in_transaction:
+            if not self.in_transaction:
+                self._raw("BEGIN")
+            name = f"nested_{len(frames)}"
+            self._raw(f"SAVEPOINT {name}")
+            frames.append(name)
+        else:
+            frames.append(None)
+        self._frames = frames
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        name = self._frames.pop()
+        if name is None:
+            if exc_type is None:
+                sqlite3.Connection.commit(self)
+            else:
+                sqlite3.Connection.rollback(self)
+            return False
+        try:
+            if exc_type is not None:
+                self._raw(f"ROLLBACK TO {name}")
+            self._raw(f"RELEASE {name}")
+        except sqlite3.OperationalError:
+            pass  # the enclosing transaction already ended
+        return False
+
+    def commit(self):
+        if not self._nested():
+            sqlite3.Connection.commit(self)
+
+    def rollback(self):
+        if not self._nested():
+            sqlite3.Connection.rollback(self)
+            return
+        try:
+            self._raw(f"ROLLBACK TO {self._frames[-1]}")
+        except sqlite3.OperationalError:
+            pass
+
+    def _reset(self):
+        """Drop block bookkeeping and any open transaction (pool checkin)"""
+        self._frames = ()
+        if self.in_transaction:
+            sqlite3.Connection.rollback(self)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        pass
+
+    def _close(self):
+        sqlite3.Connection.close(self)
+
+
+class WriterConnection(PooledConnection):
+    """Connection used by the writer thread.
+
+    Write units run inside the writer's group transaction, so commit(),
+    rollback() and the ``with conn:`` block are no-ops here; the writer
+    commits or rolls back each unit through savepoints.
+    """
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+def open_connection(db_path, factory=PooledConnection, **kwargs):
+    """Open a connection with the tuned PRAGMAs applied"""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        factory=factory,
+        **kwargs
+    )
     conn.row_factory = sqlite3.Row
+    for name, value in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
     return conn
 
+
+class _Lease:
+    """Binds a pooled connection to one thread until released"""
+
+    def __init__(self, pool, conn):
+        self.conn = conn
+        # Returns the connection if the thread exits without releasing it
+        self.finalizer = weakref.finalize(self, pool._checkin, conn)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections with one lease per thread.
+
+    Every thread (and therefore every Flask request) gets the same connection
+    for all of its get_conn() calls until release() is called, which the app
+    does at request teardown.
+    """
+
+    def __init__(self, db_path, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = Path(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            'created': 0,
+            'acquired': 0,
+            'reused': 0,
+            'released': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def _checkout(self):
+        with self._cond:
+            self._stats['acquired'] += 1
+            if not self._idle and self._size >= self.max_size:
+                self._stats['waits'] += 1
+                if not self._cond.wait_for(
+                    lambda: self._idle or self._size < self.max_size,
+                    timeout=self.timeout
+                ):
+                    self._stats['timeouts'] += 1
+                    raise sqlite3.OperationalError("Database connection pool exhausted")
+            if self._idle:
+                self._stats['reused'] += 1
+                return self._idle.pop()
+            self._size += 1
+            self._stats['created'] += 1
+
+        try:
+            return open_connection(self.db_path)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, conn):
+        try:
+            conn._reset()
+        except sqlite3.Error:
+            # Broken connection: drop it instead of handing it out again
+            conn._close()
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._stats['released'] += 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def connection(self):
+        """Get the connection leased to the calling thread"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            lease = _Lease(self, self._checkout())
+            self._local.lease = lease
+        return lease.conn
+
+    def release(self):
+        """Return the calling thread's connection to the pool"""
+        lease = self._local.__dict__.pop('lease', None)
+        if lease is not None:
+            lease.finalizer()
+
+    def close_all(self):
+        """Close idle connections (leased ones are closed on release)"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop()._close()
+                self._size -= 1
+
+    def stats(self):
+        """Get pool usage statistics"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'db_path': str(self.db_path),
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                **self._stats
+            }
+
+
+class WriteQueue:
+    """Single writer thread that group-commits queued write units.
+
+    A write unit is a callable ``unit(conn, *args)`` that runs on the writer
+    connection. Units queued within a few milliseconds of each other share
+    one BEGIN IMMEDIATE ... COMMIT; each unit runs in its own savepoint so a
+    failing unit is rolled back without affecting the rest of the batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path, maxsize=WRITE_QUEUE_SIZE, batch_max=WRITE_BATCH_MAX,
+                 batch_window_ms=WRITE_BATCH_WINDOW_MS):
+        self.db_path = Path(db_path)
+        self.batch_max = batch_max
+        self.batch_window = batch_window_ms / 1000
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'committed': 0,
+            'failed': 0,
+            'batches': 0,
+            'largest_batch': 0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="skj-db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, unit, *args):
+        """Queue a write unit and return a Future for its result"""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Nested write from inside a unit: already in the writer transaction
+            try:
+                future.set_result(unit(self._conn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        self._ensure_started()
+        try:
+            self._queue.put((unit, args, future), timeout=WRITE_TIMEOUT)
+        except queue.Full:
+            raise sqlite3.OperationalError("Database write queue is full")
+        with self._lock:
+            self._stats['submitted'] += 1
+        return future
+
+    def _next_batch(self, first):
+        """Collect units queued shortly after ``first``"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_max:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _commit_batch(self, batch):
+        conn = self._conn
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            for _, _, future in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return len(batch)
+
+        for unit, args, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT write_unit")
+            try:
+                result = unit(conn, *args)
+            except BaseException as e:
+                conn.execute("ROLLBACK TO write_unit")
+                conn.execute("RELEASE write_unit")
+                future.set_exception(e)
+                continue
+            conn.execute("RELEASE write_unit")
+            done.append((future, result))
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _ in done:
+                future.set_exception(e)
+            return len(batch)
+
+        for future, result in done:
+            future.set_result(result)
+        return len(batch) - len(done)
+
+    def _abort_batch(self, batch, error):
+        """Roll back and fail every unresolved unit of ``batch``"""
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            logger.exception("Writer rollback failed")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+        return len(batch)
+
+    def _run(self):
+        self._conn = open_connection(self.db_path, factory=WriterConnection, isolation_level=None)
+        _writer_local.conn = self._conn
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                batch = self._next_batch(item)
+                try:
+                    failed = self._commit_batch(batch)
+                except Exception as e:
+                    # e.g. a failing ROLLBACK TO: fail the batch, keep the writer alive
+                    failed = self._abort_batch(batch, e)
+                with self._lock:
+                    self._stats['batches'] += 1
+                    self._stats['committed'] += len(batch) - failed
+                    self._stats['failed'] += failed
+                    self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+        finally:
+            _writer_local.conn = None
+            self._conn._close()
+            self._conn = None
+
+    def shutdown(self, timeout=WRITE_TIMEOUT):
+        """Flush queued writes and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        thread.join(timeout)
+
+    def stats(self):
+        """Get writer queue statistics"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'running': self._thread is not None and self._thread.is_alive(),
+                **self._stats
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+_writer_local = threading.local()
+
+def get_pool():
+    """Get the process-wide connection pool for DB_PATH"""
+    global _pool
+    if _pool is None or _pool.db_path != Path(DB_PATH):
+        with _pool_lock:
+            if _pool is None or _pool.db_path != Path(DB_PATH):
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+def get_conn(readonly=False):
+    """Get the pooled connection for the current request/thread.
+
+    ``readonly=True`` marks reporting queries: with SKJ_READ_REPLICA enabled
+    they read the replica snapshot while it is within the staleness bound,
+    otherwise the primary database.
+    """
+    conn = getattr(_writer_local, 'conn', None)
+    if conn is not None:
+        # Model code called from a write unit joins the writer transaction
+        return conn
+    if readonly and READ_REPLICA:
+        conn = get_replica().connect()
+        if conn is not None:
+            return conn
+    return get_pool().connection()
+
+def release_conn(exc=None):
+    """Release the current request's connection back to the pool"""
+    if _pool is not None:
+        _pool.release()
+
+def get_pool_stats():
+    """Get connection pool statistics"""
+    return get_pool().stats()
+
+def get_writer():
+    """Get the process-wide write queue for DB_PATH"""
+    global _writer
+    if _writer is None or _writer.db_path != Path(DB_PATH):
+        with _writer_lock:
+            if _writer is None or _writer.db_path != Path(DB_PATH):
+                if _writer is not None:
+                    _writer.shutdown()
+                _writer = WriteQueue(DB_PATH)
+    return _writer
+
+def submit_write(unit, *args):
+    """Queue ``unit(conn, *args)`` on the writer thread; returns a Future"""
+    return get_writer().submit(unit, *args)
+
+def run_write(unit, *args, timeout=WRITE_TIMEOUT):
+    """Run ``unit(conn, *args)`` on the writer thread and wait for its result"""
+    return submit_write(unit, *args).result(timeout)
+
+def get_writer_stats():
+    """Get write queue statistics"""
+    return get_writer().stats()
+
+@atexit.register
+def shutdown_writer():
+    """Flush pending writes before the process exits"""
+    if _writer is not None:
+        _writer.shutdown()
+
+class BackupInProgress(RuntimeError):
+    pass
+
+_backup_lock = threading.Lock()
+_backup_status = {
+    'running': False,
+    'started_at': None,
+    'finished_at': None,
+    'pages_total': 0,
+    'pages_remaining': 0,
+    'last_backup': None,
+    'error': None
+}
+
+def _copy_snapshot(target_path, pages, sleep, progress=None):
+    """Copy a consistent snapshot of DB_PATH to ``target_path`` in paged steps.
+
+    Returns the time the snapshot was taken.
+    """
+    source = sqlite3.connect(f"file:{Path(DB_PATH).as_posix()}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    target = sqlite3.connect(target_path)
+    try:
+        # Pin a WAL snapshot for the whole copy: writers carry on, and
+        # their commits do not force the backup to restart between steps
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        snapshot_at = time.time()
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        source.execute("COMMIT")
+        # Copies are standalone files; do not leave them in WAL mode
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        source.close()
+    return snapshot_at
+
+def _run_backup(dest_dir=None, pages=None, sleep=None, keep=None):
+    """Copy the database page by page; the caller holds ``_backup_lock``"""
+    dest_dir = Path(dest_dir or BACKUP_DIR)
+    pages = BACKUP_PAGES if pages is None else pages
+    sleep = BACKUP_SLEEP if sleep is None else sleep
+    keep = BACKUP_KEEP if keep is None else keep
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    name = f"skj-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')}.db"
+    partial = dest_dir / f"{name}.part"
+    _backup_status.update(running=True, started_at=datetime.utcnow().isoformat(),
+                          finished_at=None, pages_total=0, pages_remaining=0, error=None)
+
+    def progress(status, remaining, total):
+        _backup_status.update(pages_total=total, pages_remaining=remaining)
+
+    try:
+        _copy_snapshot(partial, pages, sleep, progress)
+        target = sqlite3.connect(partial)
+        try:
+            result = target.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            target.close()
+
+        if result != "ok":
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+        path = partial.rename(dest_dir / name)
+
+        info = _backup_info(path)
+        _backup_status.update(last_backup=info)
+        _rotate_backups(dest_dir, keep)
+        return info
+    except Exception as e:
+        partial.unlink(missing_ok=True)
+        _backup_status.update(error=str(e))
+        logger.error("Backup failed: %s", e)
+        raise
+    finally:
+        _backup_status.update(running=False, finished_at=datetime.utcnow().isoformat())
+
+def _backup_info(path):
+    stat = path.stat()
+    return {
+        'name': path.name,
+        'path': str(path),
+        'size': stat.st_size,
+        'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+    }
+
+def _rotate_backups(dest_dir, keep):
+    """Delete the oldest snapshots beyond ``keep``"""
+    for path in sorted(Path(dest_dir).glob("skj-*.db"), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+
+def create_backup(dest_dir=None, pages=None, sleep=None, keep=None):
+    """Take a verified online backup of the database and rotate old ones"""
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupInProgress("A backup is already running")
+    try:
+        return _run_backup(dest_dir, pages, sleep, keep)
+    finally:
+        _backup_lock.release()
+
+def start_backup(dest_dir=None, pages=None, sleep=None, keep=None):
+    """Start create_backup() in a background thread"""
+    if not _backup_lock.acquire(blocking=False):
+        raise BackupInProgress("A backup is already running")
+    _backup_status.update(running=True)
+
+    def worker():
+        try:
+            _run_backup(dest_dir, pages, sleep, keep)
+        except Exception:
+            pass  # recorded in the backup status
+        finally:
+            _backup_lock.release()
+
+    thread = threading.Thread(target=worker, name="skj-backup", daemon=True)
+    thread.start()
+    return thread
+
+def list_backups(dest_dir=None):
+    """List backup snapshots, newest first"""
+    dest_dir = Path(dest_dir or BACKUP_DIR)
+    if not dest_dir.exists():
+        return []
+    return [_backup_info(path) for path in sorted(dest_dir.glob("skj-*.db"), reverse=True)]
+
+def get_backup_status():
+    """Get the state of the current or last backup"""
+    return dict(_backup_status)
+
+class ReadReplica:
+    """Periodically refreshed snapshot of the database for reporting queries.
+
+    A refresh copies DB_PATH into a new generation file with the backup API
+    and then atomically points the ``CURRENT`` file at it, so readers in any
+    worker process switch over without seeing a partial copy. Published
+    generations never change, which lets readers open them immutable.
+    Refreshes are started by readers once the snapshot is older than the
+    refresh interval; past the staleness bound readers use the primary.
+    """
+
+    def __init__(self, db_path, replica_dir, max_staleness, refresh_interval):
+        self.db_path = Path(db_path)
+        self.replica_dir = Path(replica_dir)
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.current_file = self.replica_dir / "CURRENT"
+        self._current = None
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()  # guards _stats
+        self._stats = {
+            'refreshes': 0,
+            'replica_reads': 0,
+            'primary_fallbacks': 0,
+            'last_refresh_ms': None,
+            'error': None
+        }
+
+    def current(self):
+        """Get the published generation as ``{'file', 'snapshot_at'}`` (None if there is none)"""
+        try:
+            mtime = self.current_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._current
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            info = json.loads(self.current_file.read_text())
+        except (OSError, ValueError):
+            return None
+        self._current = (mtime, info)
+        return info
+
+    def age(self):
+        """Seconds since the published snapshot was taken (None if there is none)"""
+        info = self.current()
+        return None if info is None else time.time() - info['snapshot_at']
+
+    def refresh(self, min_age=0):
+        """Copy the live database into a new generation and publish it.
+
+        Skipped (returns False) when another refresh is running or the
+        published snapshot is younger than ``min_age`` seconds.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            age = self.age()
+            if age is not None and age < min_age:
+                # Another worker process refreshed in the meantime
+                return False
+
+            start = time.perf_counter()
+            self.replica_dir.mkdir(parents=True, exist_ok=True)
+            name = f"replica-{time.time_ns()}.db"
+            partial = self.replica_dir / f"{name}.part"
+            try:
+                snapshot_at = _copy_snapshot(partial, BACKUP_PAGES, BACKUP_SLEEP)
+                partial.rename(self.replica_dir / name)
+            except Exception as e:
+                partial.unlink(missing_ok=True)
+                with self._lock:
+                    self._stats['error'] = str(e)
+                logger.error("Replica refresh failed: %s", e)
+                raise
+
+            pending = self.replica_dir / f"CURRENT.{os.getpid()}.tmp"
+            pending.write_text(json.dumps({'file': name, 'snapshot_at': snapshot_at}))
+            os.replace(pending, self.current_file)
+            self._prune()
+
+            with self._lock:
+                self._stats.update(
+                    refreshes=self._stats['refreshes'] + 1,
+                    last_refresh_ms=round((time.perf_counter() - start) * 1000, 2),
+                    error=None
+                )
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_async(self):
+        """Start a background refresh unless one is already running"""
+        if self._refresh_lock.locked():
+            return
+
+        def worker():
+            try:
+                self.refresh(min_age=self.refresh_interval)
+            except Exception:
+                pass  # recorded in the replica stats
+
+        threading.Thread(target=worker, name="skj-replica-refresh", daemon=True).start()
+
+    def _prune(self):
+        # Keep the previous generation for readers that are switching over
+        for path in sorted(self.replica_dir.glob("replica-*.db"), reverse=True)[2:]:
+            path.unlink(missing_ok=True)
+
+    def connect(self):
+        """Get this thread's connection to a fresh enough snapshot, or None"""
+        info = self.current()
+        age = None if info is None else time.time() - info['snapshot_at']
+        if age is None or age > self.refresh_interval:
+            self.refresh_async()
+        if age is None or age > self.max_staleness:
+            self._count('primary_fallbacks')
+            return None
+
+        path = self.replica_dir / info['file']
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.path != path:
+            if conn is not None:
+                conn._close()
+            try:
+                conn = sqlite3.connect(
+                    f"file:{path.as_posix()}?mode=ro&immutable=1",
+                    uri=True,
+                    check_same_thread=False,
+                    factory=PooledConnection
+                )
+            except sqlite3.Error:
+                self._local.conn = None
+                self._count('primary_fallbacks')
+                return None
+            conn.row_factory = sqlite3.Row
+            for name, value in CONNECTION_PRAGMAS:
+                if name in ("cache_size", "mmap_size", "temp_store"):
+                    conn.execute(f"PRAGMA {name} = {value}")
+            self._local.conn, self._local.path = conn, path
+
+        self._count('replica_reads')
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        info = self.current()
+        with self._lock:
+            counters = dict(self._stats)
+        return {
+            **counters,
+            'max_staleness': self.max_staleness,
+            'refresh_interval': self.refresh_interval,
+            'generation': info['file'] if info else None,
+            'age_seconds': round(time.time() - info['snapshot_at'], 2) if info else None,
+            'refreshing': self._refresh_lock.locked()
+        }
+
+_replica = None
+_replica_lock = threading.Lock()
+
+def get_replica():
+    """Get the process-wide read replica for DB_PATH"""
+    global _replica
+    if _replica is None or _replica.db_path != Path(DB_PATH) or _replica.replica_dir != Path(REPLICA_DIR):
+        with _replica_lock:
+            if _replica is None or _replica.db_path != Path(DB_PATH) or _replica.replica_dir != Path(REPLICA_DIR):
+                _replica = ReadReplica(DB_PATH, REPLICA_DIR, REPLICA_MAX_STALENESS, REPLICA_REFRESH_INTERVAL)
+    return _replica
+
+def refresh_replica():
+    """Refresh the read replica now"""
+    return get_replica().refresh()
+
+def get_replica_stats():
+    """Get read replica statistics"""
+    if not READ_REPLICA:
+        return {'enabled': False}
+    return {'enabled': True, **get_replica().stats()}
+
 def init_db():
     """Initialize database with basic tables"""
     with get_conn() as conn:
@@ -79,10 +1089,42 @@ def run_migrations():
     migration_manager = MigrationManager(DB_PATH, MIGRATIONS_DIR)
     migration_manager.run_migrations()
 
-def setup_database():
-    """Complete database setup including migrations"""
+_schema_fingerprint = None
+
+def get_schema_fingerprint(seeded=False):
+    """Expected PRAGMA user_version for the current schema sources.
+
+    The low bit records whether seed data has been checked as well.
+    """
+    global _schema_fingerprint
+    if _schema_fingerprint is None:
+        checksum = MigrationManager.checksum(MIGRATIONS_DIR, INIT_SCHEMA_REVISION)
+        # user_version is a signed 32-bit integer; keep it positive and non-zero
+        _schema_fingerprint = (checksum & 0x3FFFFFFE) | 0x40000000
+    return _schema_fingerprint | (1 if seeded else 0)
+
+def _read_user_version():
+    with get_conn() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def setup_database(seed=False):
+    """Complete database setup including migrations.
+
+    Returns False without touching the schema when the database already
+    matches the current migrations (and seed data, if ``seed`` is set).
+    """
+    version = _read_user_version()
+    if version == get_schema_fingerprint(seeded=True) or (not seed and version == get_schema_fingerprint()):
+        return False
+
     init_db()
     run_migrations()
+    if seed:
+        seed_if_empty()
+
+    with get_conn() as conn:
+        conn.execute(f"PRAGMA user_version = {get_schema_fingerprint(seeded=seed)}")
+    return True
 
 def seed_if_empty():
     """Seed database with initial data if empty"""
@@ -135,7 +1177,137 @@ def seed_if_empty():
             
             conn.commit()
 
+def parse_utc(iso_timestamp):
+    """Parse an ISO timestamp into a naive UTC datetime (naive input is taken as UTC)"""
+    value = datetime.fromisoformat(iso_timestamp)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def epoch_seconds(iso_timestamp):
+    """Convert an ISO timestamp (naive UTC as stored in TEXT columns, or with an offset) to epoch seconds"""
+    if not iso_timestamp:
+        return None
+    return int(parse_utc(iso_timestamp).replace(tzinfo=timezone.utc).timestamp())
+
 # Helper function for row to dict conversion
 def row_to_dict(row):
     """Convert SQLite row to dictionary"""
-    return {k: row[k] for k in row.keys()}
\ No newline at end of file
+    return {k: row[k] for k in row.keys()}
+
+# Compiled row mappers: column positions are resolved once per result shape
+# and baked into a generated function, so building a dict or model object
+# from a row tuple costs one function call instead of per-column lookups.
+_mapper_cache = {}
+_mapper_lock = threading.Lock()
+
+def result_columns(cursor):
+    """Column names of the cursor's current result"""
+    return tuple(column[0] for column in cursor.description)
+
+def compile_mapper(columns, fields=None, target=dict):
+    """Get a function that builds ``target`` from a row of ``columns``.
+
+    ``fields`` is a tuple of ``(name, column, default, convert)``; ``convert``
+    (or None) is applied to the column value, and ``default`` is used when the
+    result has no such column. Without ``fields`` every column maps to a key
+    of the same name. ``target=dict`` returns plain dicts; a class returns
+    instances populated without calling ``__init__``.
+    """
+    key = (columns, fields, target)
+    mapper = _mapper_cache.get(key)
+    if mapper is not None:
+        return mapper
+
+    if fields is None:
+        fields = tuple((column, column, None, None) for column in dict.fromkeys(columns))
+
+    positions = {}
+    for index, column in enumerate(columns):
+        # Like sqlite3.Row, the first column with a given name wins
+        positions.setdefault(column, index)
+
+    namespace = {'_new': object.__new__, '_target': target}
+    values = []
+    for n, (name, column, default, convert) in enumerate(fields):
+        if column in positions:
+            value = f"row[{positions[column]}]"
+        else:
+            namespace[f"_d{n}"] = default
+            value = f"_d{n}"
+        if convert is not None:
+            namespace[f"_c{n}"] = convert
+            value = f"_c{n}({value})"
+        values.append((name, value))
+
+    if target is dict:
+        body = "    return {" + ", ".join(f"{name!r}: {value}" for name, value in values) + "}"
+    else:
+        body = "\n".join(
+            ["    obj = _new(_target)"] +
+            [f"    obj.{name} = {value}" for name, value in values] +
+            ["    return obj"]
+        )
+    exec(f"def mapper(row):\n{body}\n", namespace)
+    mapper = namespace['mapper']
+
+    with _mapper_lock:
+        return _mapper_cache.setdefault(key, mapper)
+
+def _fetch_tuples(cursor):
+    # Skip building sqlite3.Row objects; mappers index tuples by position
+    row_factory = cursor.row_factory
+    cursor.row_factory = None
+    try:
+        return cursor.fetchall()
+    finally:
+        cursor.row_factory = row_factory
+
+def fetch_dicts(cursor, fields=None):
+    """Fetch the remaining rows as JSON-ready dicts"""
+    rows = _fetch_tuples(cursor)
+    if not rows:
+        return []
+    mapper = compile_mapper(result_columns(cursor), fields)
+    return [mapper(row) for row in rows]
+
+def fetch_models(cursor, model, fields=None):
+    """Fetch the remaining rows as ``model`` instances (using ``model.FIELDS`` by default)"""
+    rows = _fetch_tuples(cursor)
+    if not rows:
+        return []
+    mapper = compile_mapper(result_columns(cursor), fields or model.FIELDS, model)
+    return [mapper(row) for row in rows]
+
+def map_row(row, fields=None, target=dict):
+    """Map a single sqlite3.Row through a compiled mapper"""
+    return compile_mapper(tuple(row.keys()), fields, target)(row)
+
+@contextmanager
+def unique_errors(messages):
+    """Turn UNIQUE constraint failures into ``ValueError``.
+
+    ``messages`` maps ``"table.column"`` (as named in SQLite's error) to the
+    message to raise; other integrity errors propagate unchanged.
+    """
+    try:
+        yield
+    except sqlite3.IntegrityError as e:
+        prefix = "UNIQUE constraint failed: "
+        text = str(e)
+        if text.startswith(prefix):
+            for column in text[len(prefix):].split(", "):
+                if column in messages:
+                    raise ValueError(messages[column]) from e
+        raise
+
+def json_column(default):
+    """Converter for JSON TEXT columns; empty or invalid values become ``default()``"""
+    def convert(value):
+        if value:
+            try:
+                return json.loads(value)
+            except (TypeError, ValueError):
+                pass
+        return default()
+    return convert
\ No newline at end of file
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Bulk user import from CSV (header: name,email,password,role) or JSONL.
+
+Usage:
+    python import_users.py FILE [--format csv|jsonl] [--class-id N] [--batch-size N]
+"""
+
+import argparse
+import sys
+
+from services.import_service import UserImporter, FORMATS, IMPORT_BATCH_SIZE
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import users in batches")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from the file extension)")
+    parser.add_argument("--class-id", type=int, help="Class assigned to imported students")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Records per batch")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+
+    from database import setup_database
+    setup_database()
+    importer = UserImporter(batch_size=args.batch_size)
+    try:
+        with open(args.file, encoding="utf-8-sig", newline="") as stream:
+            summary = importer.import_users(stream, fmt, class_id=args.class_id)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    for error in summary["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"Imported {summary['imported']} users in {summary['batches']} batches, skipped {summary['skipped']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
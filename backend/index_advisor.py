@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Index advisor: runs EXPLAIN QUERY PLAN over the SQL used by the backend
+and reports statements that still scan whole tables.
+
+Usage:
+    python index_advisor.py [--db PATH] [--strict] [FILE_OR_DIR ...]
+"""
+
+import argparse
+import ast
+import sqlite3
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_TARGETS = [BASE_DIR / "app.py", BASE_DIR / "models"]
+
+# Statement kinds that can be planned; DDL and PRAGMAs are skipped
+PLANNABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+def iter_source_files(targets):
+    """Yield Python files from a list of files and directories"""
+    for target in targets:
+        target = Path(target)
+        if target.is_dir():
+            yield from sorted(p for p in target.rglob("*.py") if "__pycache__" not in p.parts)
+        elif target.suffix == ".py":
+            yield target
+
+def collect_statements(targets=None):
+    """Find literal SQL passed to execute()/executemany() calls"""
+    statements = []
+    for path in iter_source_files(targets or DEFAULT_TARGETS):
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+                continue
+            if node.func.attr not in ("execute", "executemany") or not node.args:
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                sql = " ".join(arg.value.split())
+                if sql.upper().startswith(PLANNABLE):
+                    statements.append({
+                        "file": str(path.relative_to(BASE_DIR) if path.is_relative_to(BASE_DIR) else path),
+                        "line": node.lineno,
+                        "sql": sql
+                    })
+    return statements
+
+def explain(conn, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    params = [None] * sql.count("?")
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
+
+def find_scans(plan, sql=""):
+    """Pick out full scans and temporary sorts from a query plan"""
+    limited = " LIMIT " in sql.upper()
+    issues = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and not detail.startswith("SCAN CONSTANT ROW"):
+            # Walking an index in ORDER BY order stops early under LIMIT
+            if limited and " USING " in detail and "INDEX" in detail:
+                continue
+            # Id lists passed as json_each(?) drive index lookups
+            if " VIRTUAL TABLE " in detail:
+                continue
+            issues.append(detail)
+        elif detail.startswith("USE TEMP B-TREE"):
+            issues.append(detail)
+    return issues
+
+def advise(db_path=None, targets=None):
+    """Explain every collected statement and report remaining scans"""
+    if db_path is None:
+        from database import DB_PATH
+        db_path = DB_PATH
+
+    conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    report = []
+    try:
+        for statement in collect_statements(targets):
+            try:
+                plan = explain(conn, statement["sql"])
+            except sqlite3.Error as e:
+                report.append({**statement, "error": str(e), "plan": [], "issues": []})
+                continue
+            report.append({**statement, "plan": plan, "issues": find_scans(plan, statement["sql"])})
+    finally:
+        conn.close()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report SQL statements that scan whole tables")
+    parser.add_argument("targets", nargs="*", help="Python files or directories to scan (default: app.py models/)")
+    parser.add_argument("--db", help="SQLite database to plan against (default: skj.db)")
+    parser.add_argument("--strict", action="store_true", help="Exit with status 1 when scans remain")
+    args = parser.parse_args(argv)
+
+    report = advise(args.db, args.targets or None)
+    flagged = [entry for entry in report if entry["issues"] or entry.get("error")]
+
+    for entry in flagged:
+        print(f"{entry['file']}:{entry['line']}")
+        print(f"   {entry['sql'][:160]}")
+        if entry.get("error"):
+            print(f"   ! could not plan: {entry['error']}")
+        for issue in entry["issues"]:
+            print(f"   - {issue}")
+        print()
+
+    print(f"Checked {len(report)} statements, {len(flagged)} with full scans or temp sorts")
+    return 1 if args.strict and flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Migration: Add secondary indexes for hot query predicates
+"""
+
+# (index name, table, columns)
+INDEXES = [
+    # Per-user progress filtered by status; covers completed lists and point sums
+    ("idx_progress_user_status", "progress", "user_id, status, challenge_id, points"),
+    ("idx_progress_status", "progress", "status"),
+    ("idx_progress_updated_at", "progress", "updated_at"),
+    ("idx_progress_user_updated", "progress", "user_id, updated_at"),
+    ("idx_detailed_progress_user_created", "detailed_progress", "user_id, created_at"),
+
+    # Class rosters, role filters and lookups by email
+    ("idx_users_class_role", "users", "class_id, role, name"),
+    ("idx_users_role_created", "users", "role, created_at"),
+    ("idx_users_created_at", "users", "created_at"),
+    ("idx_users_email", "users", "email"),
+
+    # Teacher class lists and joining by code
+    ("idx_classes_teacher_created", "classes", "teacher_id, created_at"),
+    ("idx_classes_active_created", "classes", "is_active, created_at"),
+    ("idx_classes_class_code", "classes", "class_code"),
+
+    # Challenge catalog per module
+    ("idx_challenges_module_active", "challenges", "module_id, is_active, id"),
+    ("idx_challenges_module", "challenges", "module_id, id"),
+    ("idx_challenges_active_module", "challenges", "is_active, module_id, id"),
+    ("idx_modules_semester", "modules", "semester, id"),
+
+    # Achievement lists on the student dashboard
+    ("idx_user_achievements_user_earned", "user_achievements", "user_id, earned_at"),
+]
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    
+    for index_name, table, columns in INDEXES:
+        try:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table}({columns})")
+        except Exception as e:
+            print(f"Warning: Could not create index {index_name}: {e}")
+    
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for index_name, _, _ in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    conn.commit()
@@ -0,0 +1,101 @@
+"""
+Migration: Add indexed integer epoch columns next to ISO timestamp columns
+"""
+
+from migrations.online import BatchedBackfill
+
+# SQL expression converting a naive UTC ISO timestamp to epoch seconds
+EPOCH = "CAST(strftime('%s', {column}) AS INTEGER)"
+
+# (table, ISO column, epoch column)
+TIMESTAMP_COLUMNS = [
+    ("progress", "updated_at", "updated_ts"),
+    ("detailed_progress", "created_at", "created_ts"),
+    ("users", "last_active", "last_active_ts"),
+    ("classes", "created_at", "created_ts"),
+]
+
+# (index name, table, columns)
+INDEXES = [
+    ("idx_progress_updated_ts", "progress", "updated_ts"),
+    ("idx_progress_user_updated_ts", "progress", "user_id, updated_ts"),
+    ("idx_detailed_progress_created_ts", "detailed_progress", "created_ts"),
+    ("idx_detailed_progress_user_created_ts", "detailed_progress", "user_id, created_ts"),
+    ("idx_users_last_active_ts", "users", "last_active_ts"),
+    ("idx_classes_teacher_created_ts", "classes", "teacher_id, created_ts"),
+    ("idx_classes_active_created_ts", "classes", "is_active, created_ts"),
+]
+
+# Text-ordered indexes from 009 replaced by the ones above
+REPLACED_INDEXES = [
+    "idx_progress_updated_at",
+    "idx_progress_user_updated",
+    "idx_detailed_progress_user_created",
+    "idx_classes_teacher_created",
+    "idx_classes_active_created",
+]
+
+# Existing rows are filled in chunks after up() so large tables stay writable
+ONLINE_STEPS = [
+    BatchedBackfill(
+        f"010_backfill_{table}_{ts_column}", table,
+        f"{ts_column} = {EPOCH.format(column=column)}",
+        where=f"{ts_column} IS NULL AND {column} IS NOT NULL"
+    )
+    for table, column, ts_column in TIMESTAMP_COLUMNS
+]
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+
+    for table, column, ts_column in TIMESTAMP_COLUMNS:
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing_columns = [col[1] for col in cursor.fetchall()]
+        if ts_column not in existing_columns:
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {ts_column} INTEGER")
+                print(f"Added {ts_column} column to {table} table")
+            except Exception as e:
+                print(f"Warning: Could not add column {ts_column}: {e}")
+                continue
+
+        # Application code writes both columns; these keep other writers in sync
+        epoch = EPOCH.format(column=f"NEW.{column}")
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{ts_column}_insert
+            AFTER INSERT ON {table}
+            WHEN NEW.{ts_column} IS NULL AND NEW.{column} IS NOT NULL
+            BEGIN
+                UPDATE {table} SET {ts_column} = {epoch} WHERE rowid = NEW.rowid;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{ts_column}_update
+            AFTER UPDATE OF {column} ON {table}
+            WHEN NEW.{ts_column} IS OLD.{ts_column} AND NEW.{column} IS NOT OLD.{column}
+            BEGIN
+                UPDATE {table} SET {ts_column} = {epoch} WHERE rowid = NEW.rowid;
+            END
+        """)
+
+    for name in REPLACED_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    for name, table, columns in INDEXES:
+        try:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        except Exception as e:
+            print(f"Warning: Could not create index {name}: {e}")
+
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration (optional)"""
+    cursor = conn.cursor()
+    for name, _, _ in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for table, _, ts_column in TIMESTAMP_COLUMNS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{ts_column}_insert")
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{ts_column}_update")
+    conn.commit()
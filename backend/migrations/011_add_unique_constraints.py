@@ -0,0 +1,44 @@
+"""
+Migration: Enforce unique emails and class codes with unique indexes
+
+The UNIQUE column constraints in earlier migrations could not be applied by
+ALTER TABLE, so uniqueness was only checked by reads before each write.
+"""
+
+# (index name, replaced plain index, table, column)
+UNIQUE_INDEXES = [
+    ("uq_users_email", "idx_users_email", "users", "email"),
+    ("uq_classes_class_code", "idx_classes_class_code", "classes", "class_code"),
+]
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+
+    for index_name, replaced, table, column in UNIQUE_INDEXES:
+        duplicates = cursor.execute(f"""
+            SELECT {column}, COUNT(*) FROM {table}
+            WHERE {column} IS NOT NULL
+            GROUP BY {column} HAVING COUNT(*) > 1
+        """).fetchall()
+        if duplicates:
+            # Models no longer check uniqueness themselves, so the index is required
+            values = ", ".join(str(row[0]) for row in duplicates[:5])
+            raise RuntimeError(
+                f"Cannot create {index_name}: {len(duplicates)} duplicate {table}.{column} values "
+                f"(e.g. {values}); resolve them and restart"
+            )
+
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table}({column})")
+        cursor.execute(f"DROP INDEX IF EXISTS {replaced}")
+        print(f"Created unique index {index_name}")
+
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for index_name, replaced, table, column in UNIQUE_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {replaced} ON {table}({column})")
+    conn.commit()
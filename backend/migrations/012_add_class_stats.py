@@ -0,0 +1,21 @@
+"""
+Migration: Add trigger-maintained per-class statistics
+"""
+
+from stats import create_class_stats, rebuild_class_stats, CLASS_STATS_TRIGGERS
+
+def up(conn):
+    """Apply the migration"""
+    create_class_stats(conn)
+    classes = rebuild_class_stats(conn)
+    print(f"Created class_stats for {classes} classes")
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in CLASS_STATS_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS class_module_stats")
+    cursor.execute("DROP TABLE IF EXISTS class_stats")
+    conn.commit()
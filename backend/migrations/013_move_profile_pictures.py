@@ -0,0 +1,51 @@
+"""
+Migration: Move data URL profile pictures into the media store
+
+``users.profile_picture`` keeps only the content-addressed reference, so
+user lists no longer carry the image bytes.
+"""
+
+import base64
+from services.media_service import MediaStore, media_store, is_media_ref
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    # Existing pictures are kept whatever their size
+    store = MediaStore(media_store.root, max_bytes=float("inf"))
+
+    moved = cleared = 0
+    last_id = 0
+    while True:
+        rows = cursor.execute("""
+            SELECT id, profile_picture FROM users
+            WHERE id > ? AND profile_picture LIKE 'data:%'
+            ORDER BY id LIMIT 100
+        """, (last_id,)).fetchall()
+        if not rows:
+            break
+        for user_id, data_url in rows:
+            try:
+                ref = store.put_data_url(data_url)
+                moved += 1
+            except ValueError as e:
+                print(f"Warning: Clearing profile picture of user {user_id}: {e}")
+                ref = None
+                cleared += 1
+            cursor.execute("UPDATE users SET profile_picture = ? WHERE id = ?", (ref, user_id))
+        last_id = rows[-1][0]
+
+    print(f"Moved {moved} profile pictures to {store.root} ({cleared} cleared)")
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    rows = cursor.execute("SELECT id, profile_picture FROM users WHERE profile_picture IS NOT NULL").fetchall()
+    for user_id, ref in rows:
+        found = media_store.open(ref) if is_media_ref(ref) else None
+        if found:
+            path, mimetype = found
+            data_url = f"data:{mimetype};base64,{base64.b64encode(path.read_bytes()).decode()}"
+            cursor.execute("UPDATE users SET profile_picture = ? WHERE id = ?", (data_url, user_id))
+    conn.commit()
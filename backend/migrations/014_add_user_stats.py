@@ -0,0 +1,21 @@
+"""
+Migration: Add trigger-maintained per-user progress summaries
+"""
+
+from stats import create_user_stats, rebuild_user_stats, USER_STATS_TRIGGERS
+
+def up(conn):
+    """Apply the migration"""
+    create_user_stats(conn)
+    users = rebuild_user_stats(conn)
+    print(f"Created user_stats for {users} users")
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in USER_STATS_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS user_module_stats")
+    cursor.execute("DROP TABLE IF EXISTS user_stats")
+    conn.commit()
@@ -0,0 +1,48 @@
+"""
+Migration: Share token revocations and per-user token versions between workers
+
+``users.token_version`` is bumped whenever a user's role, class or password
+changes (by a trigger, unless the UPDATE already bumped it), and ``revoked_tokens`` holds logged-out tokens until
+they expire, so every worker process sees both on its next request.
+"""
+
+TOKEN_VERSION_TRIGGER = "trg_users_token_version"
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(users)")
+    if "token_version" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+        print("Added token_version column to users table")
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {TOKEN_VERSION_TRIGGER}
+        AFTER UPDATE OF role, class_id, password_hash ON users
+        WHEN (OLD.role IS NOT NEW.role OR OLD.class_id IS NOT NEW.class_id
+          OR OLD.password_hash IS NOT NEW.password_hash)
+          AND OLD.token_version IS NEW.token_version
+        BEGIN
+            UPDATE users SET token_version = token_version + 1 WHERE id = NEW.id;
+        END
+    """)
+
+    # Token digests (sha256) of logged-out tokens, kept until the token's exp
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            digest BLOB PRIMARY KEY,
+            expires_ts INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens(expires_ts)")
+
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TRIGGER IF EXISTS {TOKEN_VERSION_TRIGGER}")
+    cursor.execute("DROP TABLE IF EXISTS revoked_tokens")
+    cursor.execute("ALTER TABLE users DROP COLUMN token_version")
+    conn.commit()
@@ -0,0 +1,45 @@
+"""
+Migration: Add a shared generation counter for the class ownership index
+
+Triggers bump ``ownership_generation`` whenever a class changes teacher or
+is deleted and whenever a user changes role or class or is deleted, so
+every worker process can tell that its in-memory index is stale.
+"""
+
+OWNERSHIP_TRIGGERS = {
+    "trg_ownership_users_update": """
+        AFTER UPDATE OF role, class_id ON users
+        WHEN OLD.role IS NOT NEW.role OR OLD.class_id IS NOT NEW.class_id""",
+    "trg_ownership_users_delete": "AFTER DELETE ON users",
+    "trg_ownership_classes_update": """
+        AFTER UPDATE OF teacher_id ON classes
+        WHEN OLD.teacher_id IS NOT NEW.teacher_id""",
+    "trg_ownership_classes_delete": "AFTER DELETE ON classes",
+}
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ownership_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO ownership_generation (id, generation) VALUES (1, 0)")
+    for name, event in OWNERSHIP_TRIGGERS.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event}
+            BEGIN
+                UPDATE ownership_generation SET generation = generation + 1 WHERE id = 1;
+            END
+        """)
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in OWNERSHIP_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS ownership_generation")
+    conn.commit()
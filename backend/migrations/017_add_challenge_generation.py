@@ -0,0 +1,42 @@
+"""
+Migration: Add a shared generation counter for the prerequisite graph
+
+Triggers bump ``challenge_generation`` on every insert and delete of a
+challenge and on updates of the columns the graph keeps in memory, so
+every worker process can tell that its graph is stale.
+"""
+
+GRAPH_COLUMNS = "module_id, title, difficulty, points, estimated_duration, is_active, prerequisites"
+
+CHALLENGE_TRIGGERS = {
+    "trg_challenge_generation_insert": "AFTER INSERT ON challenges",
+    "trg_challenge_generation_update": f"AFTER UPDATE OF {GRAPH_COLUMNS} ON challenges",
+    "trg_challenge_generation_delete": "AFTER DELETE ON challenges",
+}
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS challenge_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO challenge_generation (id, generation) VALUES (1, 0)")
+    for name, event in CHALLENGE_TRIGGERS.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event}
+            BEGIN
+                UPDATE challenge_generation SET generation = generation + 1 WHERE id = 1;
+            END
+        """)
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in CHALLENGE_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS challenge_generation")
+    conn.commit()
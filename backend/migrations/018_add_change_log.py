@@ -0,0 +1,45 @@
+"""
+Migration: Add a shared change log for in-memory caches
+
+Triggers append ``(kind, key)`` entries to ``change_log`` so every worker
+process can patch the entries it caches instead of reloading them. This
+migration records logged-out tokens (``revoked``, keyed by token digest);
+only the newest ``CHANGE_LOG_KEPT`` entries are kept.
+"""
+
+CHANGE_LOG_KEPT = 10000
+
+CHANGE_TRIGGERS = {
+    "trg_change_log_prune": f"""
+        AFTER INSERT ON change_log
+        BEGIN
+            DELETE FROM change_log WHERE seq <= NEW.seq - {CHANGE_LOG_KEPT};
+        END""",
+    "trg_changes_revoked_tokens": """
+        AFTER INSERT ON revoked_tokens
+        BEGIN
+            INSERT INTO change_log (kind, key) VALUES ('revoked', NEW.digest);
+        END""",
+}
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key
+        )
+    """)
+    for name, body in CHANGE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in CHANGE_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS change_log")
+    conn.commit()
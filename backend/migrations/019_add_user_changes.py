@@ -0,0 +1,35 @@
+"""
+Migration: Record token version changes and user deletes in the change log
+
+Every worker keeps ``users.token_version`` in memory to decide whether the
+claims of a token are current; ``user`` entries (keyed by user ID) tell it
+which ones to drop.
+"""
+
+USER_CHANGE_TRIGGERS = {
+    "trg_changes_users_token_version": """
+        AFTER UPDATE OF token_version ON users
+        WHEN OLD.token_version IS NOT NEW.token_version
+        BEGIN
+            INSERT INTO change_log (kind, key) VALUES ('user', NEW.id);
+        END""",
+    "trg_changes_users_delete": """
+        AFTER DELETE ON users
+        BEGIN
+            INSERT INTO change_log (kind, key) VALUES ('user', OLD.id);
+        END""",
+}
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    for name, body in USER_CHANGE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in USER_CHANGE_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.commit()
@@ -0,0 +1,43 @@
+"""
+Migration: Record class ownership changes in the change log
+
+Classes that change teacher or are deleted are logged as ``class`` entries
+(keyed by class ID), so the ownership index patches just those classes.
+Role and class changes of users already bump ``users.token_version`` and
+are logged as ``user`` entries, so the ``ownership_generation`` counter and
+its triggers are dropped.
+"""
+
+import importlib
+
+OWNERSHIP_GENERATION = importlib.import_module("migrations.016_add_ownership_generation")
+
+CLASS_CHANGE_TRIGGERS = {
+    "trg_changes_classes_teacher": """
+        AFTER UPDATE OF teacher_id ON classes
+        WHEN OLD.teacher_id IS NOT NEW.teacher_id
+        BEGIN
+            INSERT INTO change_log (kind, key) VALUES ('class', NEW.id);
+        END""",
+    "trg_changes_classes_delete": """
+        AFTER DELETE ON classes
+        BEGIN
+            INSERT INTO change_log (kind, key) VALUES ('class', OLD.id);
+        END""",
+}
+
+def up(conn):
+    """Apply the migration"""
+    cursor = conn.cursor()
+    for name, body in CLASS_CHANGE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    OWNERSHIP_GENERATION.down(conn)
+    conn.commit()
+
+def down(conn):
+    """Rollback the migration"""
+    cursor = conn.cursor()
+    for name in CLASS_CHANGE_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    OWNERSHIP_GENERATION.up(conn)
+    conn.commit()
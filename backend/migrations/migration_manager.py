@@ -1,15 +1,32 @@
 import sqlite3
 import os
+import re
+import zlib
 from pathlib import Path
 from datetime import datetime
 import importlib.util
 
+# Only numbered files such as 001_enhance_user_system.py are migrations
+MIGRATION_PATTERN = re.compile(r"^\d{3}_.*\.py$")
+
+
+class MigrationConnection(sqlite3.Connection):
+    """Connection handed to migrations while they share one transaction.
+
+    Migrations call ``conn.commit()`` themselves; here that is a no-op and the
+    manager commits (or rolls back) the whole batch once at the end.
+    """
+
+    def commit(self):
+        pass
+
+
 class MigrationManager:
     def __init__(self, db_path, migrations_dir):
         self.db_path = Path(db_path)
         self.migrations_dir = Path(migrations_dir)
         self.init_migrations_table()
-    
+
     def init_migrations_table(self):
         """Initialize the migrations tracking table"""
         with sqlite3.connect(self.db_path) as conn:
@@ -21,58 +38,133 @@ class MigrationManager:
                 )
             """)
             conn.commit()
-    
-    def get_applied_migrations(self):
+
+    @staticmethod
+    def list_migrations(migrations_dir):
+        """Get migration filenames in the order they apply"""
+        migrations_dir = Path(migrations_dir)
+        if not migrations_dir.exists():
+            return []
+        return sorted(name for name in os.listdir(migrations_dir) if MIGRATION_PATTERN.match(name))
+
+    @staticmethod
+    def checksum(migrations_dir, *extra):
+        """Checksum of every migration's name and source, plus ``extra`` values"""
+        migrations_dir = Path(migrations_dir)
+        crc = zlib.crc32(repr(extra).encode())
+        for name in MigrationManager.list_migrations(migrations_dir):
+            crc = zlib.crc32(name.encode(), crc)
+            crc = zlib.crc32((migrations_dir / name).read_bytes(), crc)
+        return crc
+
+    def get_applied_migrations(self, conn=None):
         """Get list of already applied migrations"""
+        if conn is not None:
+            cursor = conn.execute("SELECT filename FROM migrations ORDER BY filename")
+            return [row[0] for row in cursor.fetchall()]
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.execute("SELECT filename FROM migrations ORDER BY filename")
             return [row[0] for row in cursor.fetchall()]
-    
-    def get_pending_migrations(self):
+
+    def get_pending_migrations(self, conn=None):
         """Get list of migrations that need to be applied"""
-        applied = set(self.get_applied_migrations())
-        all_migrations = []
-        
-        if self.migrations_dir.exists():
-            for file in sorted(self.migrations_dir.glob("*.py")):
-                if file.name != "__init__.py" and file.name not in applied:
-                    all_migrations.append(file.name)
-        
-        return all_migrations
-    
-    def apply_migration(self, filename):
-        """Apply a single migration"""
+        applied = set(self.get_applied_migrations(conn))
+        return [name for name in self.list_migrations(self.migrations_dir) if name not in applied]
+
+    def get_schema_version(self):
+        """Get the number of the latest applied migration (0 if none)"""
+        applied = [name for name in self.get_applied_migrations() if MIGRATION_PATTERN.match(name)]
+        return int(applied[-1][:3]) if applied else 0
+
+    def load_migration(self, filename):
+        """Load a migration module"""
         migration_path = self.migrations_dir / filename
-        
-        # Load the migration module
         spec = importlib.util.spec_from_file_location("migration", migration_path)
         migration_module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(migration_module)
-        
+        return migration_module
+
+    def record_migration(self, conn, filename):
+        """Record a migration as applied"""
+        conn.execute(
+            "INSERT INTO migrations (filename, applied_at) VALUES (?, ?)",
+            (filename, datetime.utcnow().isoformat())
+        )
+
+    def apply_migration(self, filename, conn=None, migration_module=None):
+        """Apply a single migration (inside ``conn``'s transaction when given)"""
+        if migration_module is None:
+            migration_module = self.load_migration(filename)
+
+        if conn is not None:
+            if hasattr(migration_module, 'up'):
+                migration_module.up(conn)
+            self.record_migration(conn, filename)
+            print(f"Applied migration: {filename}")
+            return
+
         # Apply the migration
         with sqlite3.connect(self.db_path) as conn:
             if hasattr(migration_module, 'up'):
                 migration_module.up(conn)
-            
+
             # Record the migration as applied
-            conn.execute(
-                "INSERT INTO migrations (filename, applied_at) VALUES (?, ?)",
-                (filename, datetime.utcnow().isoformat())
-            )
+            self.record_migration(conn, filename)
             conn.commit()
-        
+
         print(f"Applied migration: {filename}")
-    
+
     def run_migrations(self):
-        """Run all pending migrations"""
-        pending = self.get_pending_migrations()
-        
-        if not pending:
-            print("No pending migrations")
-            return
-        
-        print(f"Applying {len(pending)} migrations...")
-        for migration in pending:
-            self.apply_migration(migration)
-        
-        print("All migrations applied successfully")
\ No newline at end of file
+        """Run all pending migrations.
+
+        Regular migrations share a single transaction. A migration that
+        defines ``ONLINE_STEPS`` (see migrations/online.py) commits the batch
+        so far together with its own ``up()``, runs its steps in short chunked
+        transactions, and is recorded as applied only once they finish, so an
+        interrupted online step is resumed on the next start.
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None, factory=MigrationConnection)
+        try:
+            # Take the write lock before looking at pending migrations so
+            # workers booting at the same time apply them only once
+            conn.execute("BEGIN IMMEDIATE")
+            pending = self.get_pending_migrations(conn)
+
+            if not pending:
+                conn.execute("ROLLBACK")
+                print("No pending migrations")
+                return
+
+            print(f"Applying {len(pending)} migrations...")
+            try:
+                for migration in pending:
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN IMMEDIATE")
+                        if migration not in self.get_pending_migrations(conn):
+                            continue
+
+                    migration_module = self.load_migration(migration)
+                    online_steps = getattr(migration_module, 'ONLINE_STEPS', None)
+                    if not online_steps:
+                        self.apply_migration(migration, conn, migration_module)
+                        continue
+
+                    if hasattr(migration_module, 'up'):
+                        migration_module.up(conn)
+                    conn.execute("COMMIT")
+                    for step in online_steps:
+                        step.run(self.db_path)
+                    conn.execute("BEGIN IMMEDIATE")
+                    self.record_migration(conn, migration)
+                    print(f"Applied migration: {migration}")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                print("Migration failed, pending migrations in the current batch rolled back")
+                raise
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        print("All migrations applied successfully")
@@ -0,0 +1,294 @@
+"""
+Online migrations for large tables.
+
+A migration module may define ``ONLINE_STEPS``, a list of the steps below.
+MigrationManager runs them outside the main migration transaction: every
+chunk is its own short ``BEGIN IMMEDIATE`` transaction followed by a pause,
+so the API keeps reading and writing while a large table is migrated.
+Progress is stored in the ``online_migrations`` table and an interrupted
+step resumes from its last chunk on the next start.
+
+    from migrations.online import OnlineTableRebuild, BatchedBackfill
+
+    ONLINE_STEPS = [
+        BatchedBackfill(
+            "010_backfill_progress_ts", "progress",
+            "updated_ts = CAST(strftime('%s', updated_at) AS INTEGER)",
+            where="updated_ts IS NULL"
+        ),
+    ]
+"""
+
+import sqlite3
+import time
+from datetime import datetime
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_PAUSE = 0.05          # seconds between chunks, leaves room for the API
+MAX_LOCK_TIME = 0.1           # chunks holding the write lock longer are shrunk
+REPORT_INTERVAL = 1.0         # seconds between progress lines
+
+
+def print_progress(name, phase, done, total):
+    """Default progress reporter"""
+    percent = f" ({done * 100 // total}%)" if total else ""
+    print(f"{name}: {phase} {done}/{total} rows{percent}")
+
+
+class OnlineStep:
+    """Base class: runs ``_<phase>()`` one chunk at a time until done.
+
+    Each phase method does one chunk inside the caller's transaction and
+    returns the progress to report once that chunk is committed.
+    """
+
+    def __init__(self, name, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE, progress=print_progress):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.batch_size = chunk_size
+        self.pause = pause
+        self.progress = progress
+        self._last_report = 0.0
+
+    def run(self, db_path):
+        """Run (or resume) the step against ``db_path``"""
+        conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS online_migrations (
+                    name TEXT PRIMARY KEY,
+                    phase TEXT NOT NULL,
+                    last_rowid INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            while True:
+                start = time.perf_counter()
+                # State is re-read under the write lock, so two workers
+                # running the same step interleave chunks instead of racing
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    state = self.load_state(conn)
+                    if state['phase'] == 'done':
+                        conn.execute("COMMIT")
+                        return state
+                    progress = getattr(self, f"_{state['phase']}")(conn, state)
+                    conn.execute("COMMIT")
+                except Exception:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                if progress:
+                    self.report(*progress)
+                self._pace(time.perf_counter() - start)
+        finally:
+            conn.close()
+
+    def load_state(self, conn):
+        row = conn.execute(
+            "SELECT phase, last_rowid, done, total FROM online_migrations WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row is None:
+            return {'phase': 'start', 'last_rowid': 0, 'done': 0, 'total': 0}
+        return dict(zip(('phase', 'last_rowid', 'done', 'total'), row))
+
+    def save_state(self, conn, phase, last_rowid=0, done=0, total=0):
+        conn.execute("""
+            INSERT OR REPLACE INTO online_migrations (name, phase, last_rowid, done, total, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (self.name, phase, last_rowid, done, total, datetime.utcnow().isoformat()))
+
+    def report(self, phase, done, total, force=False):
+        now = time.monotonic()
+        if self.progress and (force or now - self._last_report >= REPORT_INTERVAL):
+            self._last_report = now
+            self.progress(self.name, phase, done, total)
+
+    def _pace(self, elapsed):
+        """Keep each chunk's write lock short and give other writers a turn"""
+        if elapsed > MAX_LOCK_TIME and self.batch_size > 100:
+            self.batch_size //= 2
+        elif elapsed < MAX_LOCK_TIME / 4 and self.batch_size < self.chunk_size:
+            self.batch_size = min(self.chunk_size, self.batch_size * 2)
+        if self.pause:
+            time.sleep(self.pause)
+
+    def _next_upper_rowid(self, conn, table, last_rowid):
+        """Highest rowid of the next chunk after ``last_rowid`` (None when finished)"""
+        return conn.execute(
+            f"SELECT MAX(rowid) FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (last_rowid, self.batch_size)
+        ).fetchone()[0]
+
+
+class BatchedBackfill(OnlineStep):
+    """UPDATE a large table in rowid-ordered chunks.
+
+    ``assignments`` is the SET clause, ``where`` an optional filter such as
+    ``"new_column IS NULL"``.
+    """
+
+    def __init__(self, name, table, assignments, where=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+
+    def _start(self, conn, state):
+        filter_sql = f" WHERE {self.where}" if self.where else ""
+        total = conn.execute(f"SELECT COUNT(*) FROM {self.table}{filter_sql}").fetchone()[0]
+        self.save_state(conn, 'backfill', total=total)
+
+    def _backfill(self, conn, state):
+        upper = self._next_upper_rowid(conn, self.table, state['last_rowid'])
+        if upper is None:
+            self.save_state(conn, 'done', state['last_rowid'], state['done'], state['total'])
+            return ('backfilled', state['done'], state['total'], True)
+
+        filter_sql = f" AND ({self.where})" if self.where else ""
+        cursor = conn.execute(
+            f"UPDATE {self.table} SET {self.assignments} WHERE rowid > ? AND rowid <= ?{filter_sql}",
+            (state['last_rowid'], upper)
+        )
+        done = state['done'] + max(cursor.rowcount, 0)
+        self.save_state(conn, 'backfill', upper, done, state['total'])
+        return ('backfilling', done, state['total'])
+
+
+class OnlineTableRebuild(OnlineStep):
+    """Rebuild ``table`` with a new definition while it stays writable.
+
+    ``create_sql`` is the new CREATE TABLE statement with ``{table}`` in
+    place of the name. Rows are copied into a shadow table in chunks while
+    triggers record the rowids changed meanwhile; those are replayed, and
+    the final catch-up, the swap and the index rebuild happen in one short
+    transaction. ``select`` maps new columns to SQL expressions over the old
+    row (columns with the same name are copied as-is), and ``indexes`` lists
+    extra CREATE INDEX statements to run after the swap. Existing indexes
+    and triggers on the table are recreated.
+    """
+
+    def __init__(self, name, table, create_sql, select=None, indexes=(), **kwargs):
+        super().__init__(name, **kwargs)
+        self.table = table
+        self.create_sql = create_sql
+        self.select = select or {}
+        self.indexes = list(indexes)
+        self.shadow = f"_{table}_new"
+        self.changes = f"_{table}_changes"
+
+    def _columns(self, conn):
+        """Shadow columns to fill and the expressions that fill them"""
+        source = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+        shadow = conn.execute(f"PRAGMA table_info({self.shadow})").fetchall()
+        primary = [row for row in shadow if row[5]]
+        # An INTEGER PRIMARY KEY is the rowid, which is copied explicitly
+        alias = primary[0][1] if len(primary) == 1 and primary[0][2].upper() == "INTEGER" else None
+
+        columns = [row[1] for row in shadow if row[1] != alias and (row[1] in self.select or row[1] in source)]
+        expressions = [self.select.get(column, column) for column in columns]
+        return ", ".join(["rowid"] + columns), ", ".join(["rowid"] + expressions)
+
+    def _copy_rows(self, conn, condition, params):
+        columns, expressions = self._columns(conn)
+        cursor = conn.execute(
+            f"INSERT OR REPLACE INTO {self.shadow} ({columns}) SELECT {expressions} FROM {self.table} WHERE {condition}",
+            params
+        )
+        return cursor.rowcount
+
+    def _start(self, conn, state):
+        conn.execute(f"DROP TABLE IF EXISTS {self.shadow}")
+        conn.execute(f"DROP TABLE IF EXISTS {self.changes}")
+        conn.execute(self.create_sql.replace("{table}", self.shadow))
+        conn.execute(f"CREATE TABLE {self.changes} (row_id INTEGER PRIMARY KEY)")
+
+        # Record every rowid touched while the copy runs
+        conn.execute(f"""
+            CREATE TRIGGER {self.changes}_insert AFTER INSERT ON {self.table}
+            BEGIN INSERT OR IGNORE INTO {self.changes} (row_id) VALUES (NEW.rowid); END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {self.changes}_update AFTER UPDATE ON {self.table}
+            BEGIN
+                INSERT OR IGNORE INTO {self.changes} (row_id) VALUES (OLD.rowid);
+                INSERT OR IGNORE INTO {self.changes} (row_id) VALUES (NEW.rowid);
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {self.changes}_delete AFTER DELETE ON {self.table}
+            BEGIN INSERT OR IGNORE INTO {self.changes} (row_id) VALUES (OLD.rowid); END
+        """)
+
+        total = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        self.save_state(conn, 'copy', total=total)
+
+    def _copy(self, conn, state):
+        upper = self._next_upper_rowid(conn, self.table, state['last_rowid'])
+        if upper is None:
+            self.save_state(conn, 'catchup', state['last_rowid'], state['done'], state['total'])
+            return ('copied', state['done'], state['total'], True)
+
+        copied = self._copy_rows(conn, "rowid > ? AND rowid <= ?", (state['last_rowid'], upper))
+        done = state['done'] + copied
+        self.save_state(conn, 'copy', upper, done, state['total'])
+        return ('copying', done, state['total'])
+
+    def _replay_changes(self, conn, limit=None):
+        """Re-copy rows changed since they were copied; returns how many were replayed"""
+        sql = f"SELECT row_id FROM {self.changes} ORDER BY row_id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        row_ids = [row[0] for row in conn.execute(sql)]
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            conn.execute(f"DELETE FROM {self.shadow} WHERE rowid IN ({placeholders})", chunk)
+            self._copy_rows(conn, f"rowid IN ({placeholders})", chunk)
+            conn.execute(f"DELETE FROM {self.changes} WHERE row_id IN ({placeholders})", chunk)
+        return len(row_ids)
+
+    def _catchup(self, conn, state):
+        replayed = self._replay_changes(conn, self.batch_size)
+        if replayed >= self.batch_size:
+            remaining = conn.execute(f"SELECT COUNT(*) FROM {self.changes}").fetchone()[0]
+            return ('catching up', replayed, replayed + remaining)
+        return self._swap(conn, state)
+
+    def _swap(self, conn, state):
+        # Anything changed since the last chunk is replayed under this lock
+        self._replay_changes(conn)
+
+        ours = {f"{self.changes}_insert", f"{self.changes}_update", f"{self.changes}_delete"}
+        existing = [
+            (name, sql) for name, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                (self.table,)
+            )
+            if name not in ours
+        ]
+
+        # Triggers on other tables that name this table would fail the
+        # schema re-check of a modern RENAME while the table is dropped
+        legacy = conn.execute("PRAGMA legacy_alter_table").fetchone()[0]
+        conn.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            conn.execute(f"DROP TABLE {self.table}")
+            conn.execute(f"ALTER TABLE {self.shadow} RENAME TO {self.table}")
+        finally:
+            conn.execute(f"PRAGMA legacy_alter_table={'ON' if legacy else 'OFF'}")
+        conn.execute(f"DROP TABLE {self.changes}")
+
+        for name, sql in existing:
+            try:
+                conn.execute(sql)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not recreate {name} on {self.table}: {e}")
+        for sql in self.indexes:
+            conn.execute(sql)
+
+        total = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        self.save_state(conn, 'done', state['last_rowid'], total, total)
+        return ('swapped', total, total, True)
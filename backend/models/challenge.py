@@ -5,7 +5,9 @@ Enhanced Challenge model with advanced simulation properties
 import json
 from datetime import datetime
 from enum import Enum
-from database import get_conn, row_to_dict
+from database import get_conn, fetch_models, map_row, unique_errors
+from models.fields import JsonField, raw_json, model_slots, projection
+from services.prerequisite_graph import prerequisite_graph, GENERATION_SQL
 
 class DifficultyLevel(Enum):
     """Challenge difficulty levels"""
@@ -24,6 +26,40 @@ class SimulationType(Enum):
     SCENARIO = "scenario"     # Story-based scenario
 
 class Challenge:
+    # (attribute, column, default when the column is absent, converter)
+    FIELDS = (
+        ('id', 'id', None, None),
+        ('module_id', 'module_id', None, None),
+        ('title', 'title', None, None),
+        ('description', 'description', None, None),
+        ('tasks_json', 'tasks_json', None, None),
+        ('difficulty', 'difficulty', DifficultyLevel.BEGINNER.value, None),
+        ('simulation_type', 'simulation_type', SimulationType.VISUAL.value, None),
+        raw_json('simulation_config'),
+        raw_json('hints'),
+        raw_json('solution'),
+        ('points', 'points', 50, None),
+        ('time_limit', 'time_limit', None, None),
+        raw_json('prerequisites'),
+        ('created_at', 'created_at', None, None),
+        ('updated_at', 'updated_at', None, None),
+        ('is_active', 'is_active', True, bool),
+        raw_json('tags'),
+        ('estimated_duration', 'estimated_duration', None, None),
+    )
+    __slots__ = model_slots(FIELDS, extra=('_tasks_cache',))
+
+    # JSON columns are decoded on first access (see models/fields.py)
+    simulation_config = JsonField(dict)
+    hints = JsonField(list)
+    solution = JsonField(dict)
+    prerequisites = JsonField(list)
+    tags = JsonField(list)
+
+    # Columns needed by catalog and prerequisite views
+    SUMMARY_COLUMNS = ('id', 'module_id', 'title', 'difficulty', 'simulation_type',
+                       'points', 'prerequisites', 'is_active', 'estimated_duration')
+
     def __init__(self, id=None, module_id=None, title=None, description=None,
                  tasks_json=None, difficulty=DifficultyLevel.BEGINNER.value,
                  simulation_type=SimulationType.VISUAL.value, simulation_config=None,
@@ -61,27 +97,24 @@ class Challenge:
         return None
     
     @classmethod
-    def find_by_module(cls, module_id, active_only=True):
-        """Find all challenges for a specific module"""
+    def find_by_module(cls, module_id, active_only=True, columns=None):
+        """Find all challenges for a specific module (``columns``: see get_all_challenges)"""
+        select, fields = projection(cls.FIELDS, columns)
         with get_conn() as conn:
             cursor = conn.cursor()
             if active_only:
-                cursor.execute("""
-                    SELECT * FROM challenges 
+                cursor.execute(f"""
+                    SELECT {select} FROM challenges 
                     WHERE module_id = ? AND is_active = 1
                     ORDER BY id
                 """, (module_id,))
             else:
-                cursor.execute("""
-                    SELECT * FROM challenges 
+                cursor.execute(f"""
+                    SELECT {select} FROM challenges 
                     WHERE module_id = ?
                     ORDER BY id
                 """, (module_id,))
-            
-            challenges = []
-            for row in cursor.fetchall():
-                challenges.append(cls.from_db_row(row))
-            return challenges
+            return fetch_models(cursor, cls, fields)
     
     @classmethod
     def find_by_difficulty(cls, difficulty):
@@ -93,11 +126,7 @@ class Challenge:
                 WHERE difficulty = ? AND is_active = 1
                 ORDER BY module_id, id
             """, (difficulty,))
-            
-            challenges = []
-            for row in cursor.fetchall():
-                challenges.append(cls.from_db_row(row))
-            return challenges
+            return fetch_models(cursor, cls)
     
     @classmethod
     def find_by_simulation_type(cls, simulation_type):
@@ -109,149 +138,77 @@ class Challenge:
                 WHERE simulation_type = ? AND is_active = 1
                 ORDER BY module_id, id
             """, (simulation_type,))
-            
-            challenges = []
-            for row in cursor.fetchall():
-                challenges.append(cls.from_db_row(row))
-            return challenges
+            return fetch_models(cursor, cls)
     
     @classmethod
-    def get_all_challenges(cls, active_only=True):
-        """Get all challenges"""
+    def get_all_challenges(cls, active_only=True, columns=None):
+        """Get all challenges.
+
+        ``columns`` (e.g. ``SUMMARY_COLUMNS``) loads only those columns; such
+        projections are for reading and must not be saved.
+        """
+        select, fields = projection(cls.FIELDS, columns)
         with get_conn() as conn:
             cursor = conn.cursor()
             if active_only:
-                cursor.execute("SELECT * FROM challenges WHERE is_active = 1 ORDER BY module_id, id")
+                cursor.execute(f"SELECT {select} FROM challenges WHERE is_active = 1 ORDER BY module_id, id")
             else:
-                cursor.execute("SELECT * FROM challenges ORDER BY module_id, id")
-            
-            challenges = []
-            for row in cursor.fetchall():
-                challenges.append(cls.from_db_row(row))
-            return challenges
+                cursor.execute(f"SELECT {select} FROM challenges ORDER BY module_id, id")
+            return fetch_models(cursor, cls, fields)
     
     @classmethod
     def from_db_row(cls, row):
         """Create Challenge instance from database row"""
-        data = row_to_dict(row)
-        
-        # Parse JSON fields
-        simulation_config = {}
-        if data.get('simulation_config'):
-            try:
-                simulation_config = json.loads(data['simulation_config'])
-            except:
-                simulation_config = {}
-        
-        hints = []
-        if data.get('hints'):
-            try:
-                hints = json.loads(data['hints'])
-            except:
-                hints = []
-        
-        solution = {}
-        if data.get('solution'):
-            try:
-                solution = json.loads(data['solution'])
-            except:
-                solution = {}
+        return map_row(row, cls.FIELDS, cls)
+    
+    def save(self, create=False):
+        """Save challenge to database in one upsert (``create=True`` refuses to overwrite an existing ID)"""
+        # Serialize JSON fields
+        simulation_config_json = json.dumps(self.simulation_config) if self.simulation_config else None
+        hints_json = json.dumps(self.hints) if self.hints else None
+        solution_json = json.dumps(self.solution) if self.solution else None
+        prerequisites_json = json.dumps(self.prerequisites) if self.prerequisites else None
+        tags_json = json.dumps(self.tags) if self.tags else None
         
-        prerequisites = []
-        if data.get('prerequisites'):
-            try:
-                prerequisites = json.loads(data['prerequisites'])
-            except:
-                prerequisites = []
+        # A new row keeps updated_at == created_at; an update stamps now
+        now = datetime.utcnow().isoformat()
+        created_at = self.created_at or now
         
-        tags = []
-        if data.get('tags'):
-            try:
-                tags = json.loads(data['tags'])
-            except:
-                tags = []
+        upsert = "" if create else """
+                ON CONFLICT(id) DO UPDATE SET
+                    module_id = excluded.module_id, title = excluded.title,
+                    description = excluded.description, tasks_json = excluded.tasks_json,
+                    difficulty = excluded.difficulty, simulation_type = excluded.simulation_type,
+                    simulation_config = excluded.simulation_config, hints = excluded.hints,
+                    solution = excluded.solution, points = excluded.points,
+                    time_limit = excluded.time_limit, prerequisites = excluded.prerequisites,
+                    updated_at = ?, is_active = excluded.is_active,
+                    tags = excluded.tags, estimated_duration = excluded.estimated_duration"""
         
-        return cls(
-            id=data.get('id'),
-            module_id=data.get('module_id'),
-            title=data.get('title'),
-            description=data.get('description'),
-            tasks_json=data.get('tasks_json'),
-            difficulty=data.get('difficulty', DifficultyLevel.BEGINNER.value),
-            simulation_type=data.get('simulation_type', SimulationType.VISUAL.value),
-            simulation_config=simulation_config,
-            hints=hints,
-            solution=solution,
-            points=data.get('points', 50),
-            time_limit=data.get('time_limit'),
-            prerequisites=prerequisites,
-            created_at=data.get('created_at'),
-            updated_at=data.get('updated_at'),
-            is_active=bool(data.get('is_active', True)),
-            tags=tags,
-            estimated_duration=data.get('estimated_duration')
-        )
-    
-    def save(self):
-        """Save challenge to database"""
-        conn = get_conn()
-        try:
+        with get_conn() as conn:
             cursor = conn.cursor()
-            
-            # Serialize JSON fields
-            simulation_config_json = json.dumps(self.simulation_config) if self.simulation_config else None
-            hints_json = json.dumps(self.hints) if self.hints else None
-            solution_json = json.dumps(self.solution) if self.solution else None
-            prerequisites_json = json.dumps(self.prerequisites) if self.prerequisites else None
-            tags_json = json.dumps(self.tags) if self.tags else None
-            
-            # Check if challenge exists
-            cursor.execute("SELECT id FROM challenges WHERE id = ?", (self.id,))
-            exists = cursor.fetchone()
-            
-            if exists:
-                # Update existing challenge
-                self.updated_at = datetime.utcnow().isoformat()
-                cursor.execute("""
-                    UPDATE challenges SET 
-                        module_id = ?, title = ?, description = ?, tasks_json = ?,
-                        difficulty = ?, simulation_type = ?, simulation_config = ?,
-                        hints = ?, solution = ?, points = ?, time_limit = ?,
-                        prerequisites = ?, updated_at = ?, is_active = ?,
-                        tags = ?, estimated_duration = ?
-                    WHERE id = ?
-                """, (
-                    self.module_id, self.title, self.description, self.tasks_json,
-                    self.difficulty, self.simulation_type, simulation_config_json,
-                    hints_json, solution_json, self.points, self.time_limit,
-                    prerequisites_json, self.updated_at, self.is_active,
-                    tags_json, self.estimated_duration, self.id
-                ))
-            else:
-                # Create new challenge
-                if not self.created_at:
-                    self.created_at = datetime.utcnow().isoformat()
-                self.updated_at = self.created_at
-                
-                cursor.execute("""
+            with unique_errors({'challenges.id': f"Challenge with ID '{self.id}' already exists"}):
+                cursor.execute(f"""
                     INSERT INTO challenges (id, module_id, title, description, tasks_json,
                                           difficulty, simulation_type, simulation_config,
                                           hints, solution, points, time_limit,
                                           prerequisites, created_at, updated_at, is_active,
                                           tags, estimated_duration)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?){upsert}
+                    RETURNING created_at, updated_at, ({GENERATION_SQL}) + 1
                 """, (
                     self.id, self.module_id, self.title, self.description, self.tasks_json,
                     self.difficulty, self.simulation_type, simulation_config_json,
                     hints_json, solution_json, self.points, self.time_limit,
-                    prerequisites_json, self.created_at, self.updated_at, self.is_active,
+                    prerequisites_json, created_at, created_at, self.is_active,
                     tags_json, self.estimated_duration
-                ))
+                ) + (() if create else (now,)))
+                # RETURNING sees the generation before the trigger bumps it for this row
+                self.created_at, self.updated_at, generation = cursor.fetchone()
             
             conn.commit()
-        finally:
-            conn.close()
-            
+        
+        prerequisite_graph.challenge_saved(self, generation)
         return self
     
     def delete(self):
@@ -261,9 +218,13 @@ class Challenge:
         
         with get_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM challenges WHERE id = ?", (self.id,))
+            cursor.execute(f"DELETE FROM challenges WHERE id = ? RETURNING ({GENERATION_SQL}) + 1", (self.id,))
+            row = cursor.fetchone()
             conn.commit()
-            return cursor.rowcount > 0
+            if row is None:
+                return False
+            prerequisite_graph.challenge_deleted(self.id, row[0])
+            return True
     
     def deactivate(self):
         """Deactivate challenge instead of deleting"""
@@ -271,14 +232,20 @@ class Challenge:
         return self.save()
     
     def get_tasks(self):
-        """Get parsed tasks list"""
+        """Get parsed tasks list (parsed once per tasks_json value)"""
         if not self.tasks_json:
             return []
         
+        cached = getattr(self, '_tasks_cache', None)
+        if cached is not None and cached[0] is self.tasks_json:
+            return cached[1]
+        
         try:
-            return json.loads(self.tasks_json)
+            tasks = json.loads(self.tasks_json)
         except:
-            return []
+            tasks = []
+        self._tasks_cache = (self.tasks_json, tasks)
+        return tasks
     
     def set_tasks(self, tasks):
         """Set tasks from list"""
@@ -476,11 +443,6 @@ class Challenge:
         if time_limit is not None and time_limit <= 0:
             raise ValueError("Time limit must be positive")
         
-        # Check if challenge ID already exists
-        existing = cls.find_by_id(id)
-        if existing:
-            raise ValueError(f"Challenge with ID '{id}' already exists")
-        
         # Create challenge
         challenge = cls(
             id=id.strip(),
@@ -503,4 +465,5 @@ class Challenge:
         else:
             challenge.tasks_json = "[]"  # Default empty tasks
         
-        return challenge.save()
\ No newline at end of file
+        # An existing ID is rejected by the primary key
+        return challenge.save(create=True)
\ No newline at end of file
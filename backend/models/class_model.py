@@ -4,9 +4,221 @@ Class model for managing student groups and teacher assignments
 
 import json
 from datetime import datetime
-from database import get_conn, row_to_dict
+from database import get_conn, run_write, epoch_seconds, fetch_models, map_row, unique_errors
+from models.fields import model_slots, projection
+
+# Seats left in the class bound as the only parameter (-1 when unlimited)
+FREE_SEATS_SQL = """
+    SELECT CASE WHEN COALESCE(max_students, 0) = 0 THEN -1
+                ELSE MAX(0, max_students - COALESCE(
+                    (SELECT student_count FROM class_stats WHERE class_id = classes.id), 0))
+           END
+    FROM classes WHERE id = ?
+"""
+
+def _add_student(conn, class_id, max_students, student_id):
+    """Write unit: enroll a student, checking capacity in the same transaction.
+
+    Like the bulk path, a student already in another (live) class is not
+    moved; they have to be removed from that class first.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT u.role, u.class_id, c.id IS NOT NULL as in_class, c.name as class_name
+        FROM users u LEFT JOIN classes c ON c.id = u.class_id
+        WHERE u.id = ?
+    """, (student_id,))
+    row = cursor.fetchone()
+    if row is None or row['role'] != 'student':
+        return False
+    if row['class_id'] == class_id:
+        return True
+    if row['in_class']:
+        raise ValueError(f"Student is already enrolled in class '{row['class_name']}'")
+    
+    if max_students:
+        cursor.execute("""
+            SELECT COUNT(*) as count FROM users 
+            WHERE class_id = ? AND role = 'student'
+        """, (class_id,))
+        if cursor.fetchone()['count'] >= max_students:
+            raise ValueError("Class is at maximum capacity")
+    
+    cursor.execute("""
+        UPDATE users SET class_id = ? 
+        WHERE id = ? AND role = 'student'
+    """, (class_id, student_id))
+    return cursor.rowcount > 0
+
+def _add_students(conn, class_id, student_ids):
+    """Write unit: enroll many students with one capacity-bounded UPDATE.
+
+    Returns ``{student_id: status}``; eligible students are enrolled in the
+    given order until the class is full.
+    """
+    ids = json.dumps(student_ids)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT u.id, u.role, u.class_id, c.id IS NOT NULL as in_class
+        FROM users u LEFT JOIN classes c ON c.id = u.class_id
+        WHERE u.id IN (SELECT value FROM json_each(?))
+    """, (ids,))
+    existing = {row['id']: row for row in cursor.fetchall()}
+    
+    # Students without a (live) class fill the remaining seats in order
+    cursor.execute(f"""
+        UPDATE users SET class_id = ?
+        WHERE id IN (
+            SELECT u.id FROM json_each(?) j
+            JOIN users u ON u.id = j.value
+            LEFT JOIN classes c ON c.id = u.class_id
+            WHERE u.role = 'student' AND c.id IS NULL
+            ORDER BY j.key
+            LIMIT ({FREE_SEATS_SQL})
+        )
+        RETURNING id
+    """, (class_id, ids, class_id))
+    enrolled = {row['id'] for row in cursor.fetchall()}
+    
+    results = {}
+    for student_id in student_ids:
+        row = existing.get(student_id)
+        if student_id in enrolled:
+            results[student_id] = 'enrolled'
+        elif row is None:
+            results[student_id] = 'not_found'
+        elif row['role'] != 'student':
+            results[student_id] = 'not_student'
+        elif row['class_id'] == class_id:
+            results[student_id] = 'already_enrolled'
+        elif row['in_class']:
+            results[student_id] = 'in_other_class'
+        else:
+            results[student_id] = 'class_full'
+    return results
+
+def _remove_students(conn, class_id, student_ids):
+    """Write unit: remove many students from a class; returns ``{student_id: status}``"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE users SET class_id = NULL
+        WHERE class_id = ? AND id IN (SELECT value FROM json_each(?))
+        RETURNING id
+    """, (class_id, json.dumps(student_ids)))
+    removed = {row['id'] for row in cursor.fetchall()}
+    return {student_id: 'removed' if student_id in removed else 'not_enrolled' for student_id in student_ids}
+
+class ClassLoader:
+    """Batch loader for the relations Class.to_dict() needs.
+
+    Each relation (student counts, teachers, rosters, progress) is loaded for
+    all collected classes with one query the first time any class asks for
+    it, so serializing N classes costs a constant number of queries.
+    """
+
+    TEACHER_COLUMNS = ('id', 'name', 'email')
+
+    def __init__(self, classes):
+        self.classes = list(classes)
+        self._loaded = {}
+
+    def _ids(self, ids):
+        # One JSON array parameter keeps the statement the same for any count
+        return json.dumps(sorted(set(i for i in ids if i)))
+
+    def _load(self, relation):
+        if relation not in self._loaded:
+            self._loaded[relation] = getattr(self, f"_load_{relation}")()
+        return self._loaded[relation]
+
+    def _load_student_counts(self):
+        # class_stats is kept current by triggers (see stats.py)
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT class_id, student_count FROM class_stats
+                WHERE class_id IN (SELECT value FROM json_each(?))
+            """, (self._ids(c.id for c in self.classes),))
+            return {row['class_id']: row['student_count'] for row in cursor.fetchall()}
+
+    def _load_teachers(self):
+        from models.user import User
+        select, fields = projection(User.FIELDS, self.TEACHER_COLUMNS)
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {select} FROM users
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, (self._ids(c.teacher_id for c in self.classes),))
+            return {teacher.id: teacher for teacher in fetch_models(cursor, User, fields)}
+
+    def _load_students(self):
+        from models.user import User
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM users
+                WHERE class_id IN (SELECT value FROM json_each(?)) AND role = 'student'
+                ORDER BY class_id, name
+            """, (self._ids(c.id for c in self.classes),))
+            students = {}
+            for student in fetch_models(cursor, User):
+                students.setdefault(student.class_id, []).append(student)
+            return students
+
+    def _load_progress(self):
+        with get_conn(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.class_id as class_id, s.student_count, s.completed_challenges, s.total_points,
+                       (SELECT json_group_object(m.module_id, m.completed) FROM class_module_stats m
+                        WHERE m.class_id = s.class_id AND m.completed > 0) as modules
+                FROM class_stats s
+                WHERE s.class_id IN (SELECT value FROM json_each(?))
+            """, (self._ids(c.id for c in self.classes),))
+            return {row['class_id']: dict(row, modules=json.loads(row['modules'])) for row in cursor.fetchall()}
+
+    def student_count(self, class_obj):
+        """Number of students in ``class_obj``"""
+        return self._load('student_counts').get(class_obj.id, 0)
+
+    def teacher(self, class_obj):
+        """Teacher of ``class_obj`` (only id, name and email are loaded)"""
+        return self._load('teachers').get(class_obj.teacher_id)
+
+    def students(self, class_obj):
+        """Students of ``class_obj`` ordered by name"""
+        return self._load('students').get(class_obj.id, [])
+
+    def progress(self, class_obj):
+        """Progress statistics of ``class_obj`` (same shape as get_class_progress())"""
+        stats = self._load('progress').get(class_obj.id, {})
+        total_students = stats.get('student_count', 0)
+        completed_challenges = stats.get('completed_challenges', 0)
+        avg_progress = completed_challenges / total_students if total_students > 0 else 0
+        return {
+            'total_students': total_students,
+            'completed_challenges': completed_challenges,
+            'total_points': stats.get('total_points', 0),
+            'average_progress': round(avg_progress, 2),
+            'module_completion': stats.get('modules', {})
+        }
 
 class Class:
+    # (attribute, column, default when the column is absent, converter)
+    FIELDS = (
+        ('id', 'id', None, None),
+        ('name', 'name', None, None),
+        ('teacher_id', 'teacher_id', None, None),
+        ('semester', 'semester', None, None),
+        ('created_at', 'created_at', None, None),
+        ('is_active', 'is_active', True, bool),
+        ('description', 'description', None, None),
+        ('max_students', 'max_students', None, None),
+        ('class_code', 'class_code', None, None),
+    )
+    __slots__ = model_slots(FIELDS)
+
     def __init__(self, id=None, name=None, teacher_id=None, semester=None, 
                  created_at=None, is_active=True, description=None, 
                  max_students=None, class_code=None):
@@ -39,12 +251,9 @@ class Class:
             cursor.execute("""
                 SELECT * FROM classes 
                 WHERE teacher_id = ? 
-                ORDER BY created_at DESC
+                ORDER BY created_ts DESC, id DESC
             """, (teacher_id,))
-            classes = []
-            for row in cursor.fetchall():
-                classes.append(cls.from_db_row(row))
-            return classes
+            return fetch_models(cursor, cls)
     
     @classmethod
     def find_by_code(cls, class_code):
@@ -63,67 +272,52 @@ class Class:
         with get_conn() as conn:
             cursor = conn.cursor()
             if active_only:
-                cursor.execute("SELECT * FROM classes WHERE is_active = 1 ORDER BY created_at DESC")
+                cursor.execute("SELECT * FROM classes WHERE is_active = 1 ORDER BY created_ts DESC, id DESC")
             else:
-                cursor.execute("SELECT * FROM classes ORDER BY created_at DESC")
-            
-            classes = []
-            for row in cursor.fetchall():
-                classes.append(cls.from_db_row(row))
-            return classes
+                cursor.execute("SELECT * FROM classes ORDER BY created_ts DESC, id DESC")
+            return fetch_models(cursor, cls)
     
     @classmethod
     def from_db_row(cls, row):
         """Create Class instance from database row"""
-        data = row_to_dict(row)
-        return cls(
-            id=data.get('id'),
-            name=data.get('name'),
-            teacher_id=data.get('teacher_id'),
-            semester=data.get('semester'),
-            created_at=data.get('created_at'),
-            is_active=bool(data.get('is_active', True)),
-            description=data.get('description'),
-            max_students=data.get('max_students'),
-            class_code=data.get('class_code')
-        )
+        return map_row(row, cls.FIELDS, cls)
     
     def save(self):
-        """Save class to database"""
+        """Save class to database (one upsert; class codes are unique in the schema)"""
+        if not self.created_at:
+            self.created_at = datetime.utcnow().isoformat()
+        
+        # Generate class code if not provided
+        generate_code = not self.id and not self.class_code
+        
         with get_conn() as conn:
             cursor = conn.cursor()
-            
-            if self.id:
-                # Update existing class
-                cursor.execute("""
-                    UPDATE classes SET 
-                        name = ?, teacher_id = ?, semester = ?, 
-                        is_active = ?, description = ?, max_students = ?, 
-                        class_code = ?
-                    WHERE id = ?
-                """, (
-                    self.name, self.teacher_id, self.semester,
-                    self.is_active, self.description, self.max_students,
-                    self.class_code, self.id
-                ))
-            else:
-                # Create new class
-                if not self.created_at:
-                    self.created_at = datetime.utcnow().isoformat()
-                
-                # Generate class code if not provided
-                if not self.class_code:
+            while True:
+                if generate_code:
                     self.class_code = self._generate_class_code()
-                
-                cursor.execute("""
-                    INSERT INTO classes (name, teacher_id, semester, created_at, 
-                                       is_active, description, max_students, class_code)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    self.name, self.teacher_id, self.semester, self.created_at,
-                    self.is_active, self.description, self.max_students, self.class_code
-                ))
-                self.id = cursor.lastrowid
+                try:
+                    with unique_errors({'classes.class_code': "Class with this code already exists"}):
+                        cursor.execute("""
+                            INSERT INTO classes (id, name, teacher_id, semester, created_at, created_ts,
+                                               is_active, description, max_students, class_code)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET
+                                name = excluded.name, teacher_id = excluded.teacher_id,
+                                semester = excluded.semester, is_active = excluded.is_active,
+                                description = excluded.description, max_students = excluded.max_students,
+                                class_code = excluded.class_code
+                            RETURNING id
+                        """, (
+                            self.id, self.name, self.teacher_id, self.semester, self.created_at,
+                            epoch_seconds(self.created_at),
+                            self.is_active, self.description, self.max_students, self.class_code
+                        ))
+                        self.id = cursor.fetchone()[0]
+                    break
+                except ValueError:
+                    if not generate_code:
+                        raise
+                    # The generated code is taken; draw another one
             
             conn.commit()
         return self
@@ -163,10 +357,7 @@ class Class:
             """, (self.id,))
             
             from models.user import User
-            students = []
-            for row in cursor.fetchall():
-                students.append(User.from_db_row(row))
-            return students
+            return fetch_models(cursor, User)
     
     def get_student_count(self):
         """Get number of students in this class"""
@@ -182,22 +373,29 @@ class Class:
             return cursor.fetchone()['count']
     
     def add_student(self, student_id):
-        """Add a student to this class"""
+        """Add a student to this class (raises ValueError if they are in another class or it is full)"""
         if not self.id:
             return False
         
-        # Check if class is at capacity
-        if self.max_students and self.get_student_count() >= self.max_students:
-            raise ValueError("Class is at maximum capacity")
+        return run_write(_add_student, self.id, self.max_students, student_id)
+    
+    def add_students(self, student_ids):
+        """Enroll many students in one transaction; returns ``{student_id: status}``.
+
+        Status is one of enrolled, already_enrolled, in_other_class,
+        not_student, not_found or class_full.
+        """
+        if not self.id:
+            return {}
         
-        with get_conn() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE users SET class_id = ? 
-                WHERE id = ? AND role = 'student'
-            """, (self.id, student_id))
-            conn.commit()
-            return cursor.rowcount > 0
+        return run_write(_add_students, self.id, list(dict.fromkeys(student_ids)))
+    
+    def remove_students(self, student_ids):
+        """Remove many students in one transaction; returns ``{student_id: status}``"""
+        if not self.id:
+            return {}
+        
+        return run_write(_remove_students, self.id, list(dict.fromkeys(student_ids)))
     
     def remove_student(self, student_id):
         """Remove a student from this class"""
@@ -226,44 +424,11 @@ class Class:
         if not self.id:
             return {}
         
-        with get_conn() as conn:
-            cursor = conn.cursor()
-            
-            # Get total students
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM users 
-                WHERE class_id = ? AND role = 'student'
-            """, (self.id,))
-            total_students = cursor.fetchone()['count']
-            
-            # Get total completed challenges
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM progress p
-                JOIN users u ON p.user_id = u.id
-                WHERE u.class_id = ? AND p.status = 'completed'
-            """, (self.id,))
-            completed_challenges = cursor.fetchone()['count']
-            
-            # Get total points earned
-            cursor.execute("""
-                SELECT COALESCE(SUM(p.points), 0) as total_points FROM progress p
-                JOIN users u ON p.user_id = u.id
-                WHERE u.class_id = ?
-            """, (self.id,))
-            total_points = cursor.fetchone()['total_points']
-            
-            # Get average progress per student
-            avg_progress = completed_challenges / total_students if total_students > 0 else 0
-            
-            return {
-                'total_students': total_students,
-                'completed_challenges': completed_challenges,
-                'total_points': total_points,
-                'average_progress': round(avg_progress, 2)
-            }
+        return ClassLoader([self]).progress(self)
     
-    def to_dict(self, include_students=False, include_progress=False):
-        """Convert class to dictionary"""
+    def to_dict(self, include_students=False, include_progress=False, loader=None):
+        """Convert class to dictionary (``loader`` batches relations across classes)"""
+        loader = loader or ClassLoader([self])
         data = {
             'id': self.id,
             'name': self.name,
@@ -274,17 +439,17 @@ class Class:
             'description': self.description,
             'max_students': self.max_students,
             'class_code': self.class_code,
-            'student_count': self.get_student_count() if self.id else 0
+            'student_count': loader.student_count(self) if self.id else 0
         }
         
         if include_students:
-            data['students'] = [student.to_dict() for student in self.get_students()]
+            data['students'] = [student.to_dict() for student in loader.students(self)]
         
         if include_progress:
-            data['progress'] = self.get_class_progress()
+            data['progress'] = loader.progress(self) if self.id else {}
         
         # Include teacher info
-        teacher = self.get_teacher()
+        teacher = loader.teacher(self)
         if teacher:
             data['teacher'] = {
                 'id': teacher.id,
@@ -294,19 +459,22 @@ class Class:
         
         return data
     
+    @classmethod
+    def to_dicts(cls, classes, include_students=False, include_progress=False):
+        """Convert many classes with one query per loaded relation"""
+        loader = ClassLoader(classes)
+        return [
+            class_obj.to_dict(include_students=include_students, include_progress=include_progress, loader=loader)
+            for class_obj in loader.classes
+        ]
+    
     def _generate_class_code(self):
-        """Generate a unique class code"""
+        """Generate a random class code (uniqueness is checked by save())"""
         import random
         import string
         
-        while True:
-            # Generate 6-character code (letters and numbers)
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            
-            # Check if code already exists
-            existing = self.find_by_code(code)
-            if not existing:
-                return code
+        # Generate 6-character code (letters and numbers)
+        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     
     @classmethod
     def create_class(cls, name, teacher_id, semester, description=None, max_students=None):
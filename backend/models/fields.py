@@ -0,0 +1,73 @@
+"""
+Field helpers for the __slots__ models.
+
+JSON TEXT columns are mapped raw into a ``_<name>_json`` slot and only
+decoded (and cached in ``_<name>``) the first time the attribute is read,
+so loading a table costs one attribute store per JSON column instead of a
+``json.loads``.
+
+    class Challenge:
+        FIELDS = (..., raw_json('hints'), ...)
+        __slots__ = model_slots(FIELDS)
+        hints = JsonField(list)
+"""
+
+from database import json_column
+
+RAW_SUFFIX = "_json"
+
+
+def raw_json(name, column=None):
+    """FIELDS entry that stores the undecoded column for ``JsonField`` ``name``"""
+    return (f"_{name}{RAW_SUFFIX}", column or name, None, None)
+
+
+def model_slots(fields, extra=()):
+    """``__slots__`` for a model: one slot per FIELDS attribute, plus a cache
+    slot for every raw JSON attribute"""
+    names = [field[0] for field in fields]
+    names += [name[:-len(RAW_SUFFIX)] for name in names if name.startswith('_') and name.endswith(RAW_SUFFIX)]
+    return tuple(names) + tuple(extra)
+
+
+def projection(fields, columns):
+    """SELECT list and FIELDS for loading only ``columns`` (all when None).
+
+    Attributes outside the projection are left unset on the instances.
+    """
+    if columns is None:
+        return "*", None
+    unknown = set(columns) - {field[1] for field in fields}
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    fields = tuple(field for field in fields if field[1] in columns)
+    return ", ".join(field[1] for field in fields), fields
+
+
+class JsonField:
+    """Attribute backed by a raw JSON column, decoded on first read.
+
+    Assigning a value replaces the cached one; empty or invalid JSON reads as
+    ``default()`` like ``json_column``.
+    """
+
+    def __init__(self, default):
+        self.decode = json_column(default)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.raw = f"_{name}{RAW_SUFFIX}"
+        self.cache = f"_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.cache)
+        except AttributeError:
+            value = self.decode(getattr(obj, self.raw, None))
+            setattr(obj, self.cache, value)
+            return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.cache, value)
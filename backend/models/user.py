@@ -2,15 +2,61 @@
 Enhanced User model with authentication capabilities
 """
 
-import bcrypt
 import json
 from datetime import datetime
-from database import get_conn, row_to_dict
+from database import get_conn, run_write, epoch_seconds, fetch_dicts, fetch_models, map_row, json_column, unique_errors
+from models.fields import JsonField, raw_json, model_slots
+from services.activity_service import activity_buffer
+from services.password_service import password_service
+from services.media_service import media_url
+
+_preferences = json_column(dict)
+
+# UNIQUE constraint -> error raised by save()
+UNIQUE_MESSAGES = {
+    'users.name': "User with this name already exists",
+    'users.email': "User with this email already exists",
+}
+
+def _set_password_hash(conn, user_id, old_hash, new_hash):
+    """Write unit: replace a password hash unless it was changed meanwhile (returns the new token version)"""
+    cursor = conn.execute(
+        """UPDATE users SET password_hash = ?, token_version = token_version + 1
+           WHERE id = ? AND password_hash = ? RETURNING token_version""",
+        (new_hash, user_id, old_hash)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
 
 class User:
+    # (attribute, column, default when the column is absent, converter)
+    FIELDS = (
+        ('id', 'id', None, None),
+        ('name', 'name', None, None),
+        ('email', 'email', None, None),
+        ('password_hash', 'password_hash', None, None),
+        ('role', 'role', 'student', None),
+        ('class_id', 'class_id', None, None),
+        ('profile_picture', 'profile_picture', None, None),
+        raw_json('preferences'),
+        ('created_at', 'created_at', None, None),
+        ('last_active', 'last_active', None, None),
+        ('token_version', 'token_version', 0, None),
+    )
+    __slots__ = model_slots(FIELDS)
+
+    preferences = JsonField(dict)
+
+    # Same shape as to_dict(), built straight from rows
+    JSON_FIELDS = tuple(
+        ('preferences', 'preferences', None, _preferences) if field[0] == '_preferences_json' else
+        ('profile_picture', 'profile_picture', None, media_url) if field[0] == 'profile_picture' else field
+        for field in FIELDS if field[0] not in ('password_hash', 'token_version')
+    )
+
     def __init__(self, id=None, name=None, email=None, password_hash=None, 
                  role='student', class_id=None, profile_picture=None, 
-                 preferences=None, created_at=None, last_active=None):
+                 preferences=None, created_at=None, last_active=None, token_version=0):
         self.id = id
         self.name = name
         self.email = email
@@ -21,20 +67,28 @@ class User:
         self.preferences = preferences or {}
         self.created_at = created_at
         self.last_active = last_active
+        self.token_version = token_version
     
     @staticmethod
     def hash_password(password):
-        """Hash a password using bcrypt"""
-        if not password:
-            return None
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash a password using bcrypt (on the password worker pool)"""
+        return password_service.hash(password)
     
     def check_password(self, password):
         """Check if provided password matches the stored hash"""
-        if not password or not self.password_hash:
+        return password_service.verify(password, self.password_hash)
+    
+    def rehash_password(self, password):
+        """Re-hash a verified password if the configured bcrypt cost has changed"""
+        if not self.id or not password_service.needs_rehash(self.password_hash):
             return False
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        password_hash = self.hash_password(password)
+        token_version = run_write(_set_password_hash, self.id, self.password_hash, password_hash)
+        if token_version is None:
+            return False
+        self.password_hash = password_hash
+        self.token_version = token_version
+        return True
     
     @classmethod
     def find_by_id(cls, user_id):
@@ -74,82 +128,51 @@ class User:
     @classmethod
     def from_db_row(cls, row):
         """Create User instance from database row"""
-        data = row_to_dict(row)
-        preferences = {}
-        if data.get('preferences'):
-            try:
-                preferences = json.loads(data['preferences'])
-            except:
-                preferences = {}
-        
-        return cls(
-            id=data.get('id'),
-            name=data.get('name'),
-            email=data.get('email'),
-            password_hash=data.get('password_hash'),
-            role=data.get('role', 'student'),
-            class_id=data.get('class_id'),
-            profile_picture=data.get('profile_picture'),
-            preferences=preferences,
-            created_at=data.get('created_at'),
-            last_active=data.get('last_active')
-        )
+        user = map_row(row, cls.FIELDS, cls)
+        # Activity may still be waiting in the write-behind buffer
+        user.last_active = activity_buffer.merge(user.id, user.last_active)
+        return user
     
     def save(self):
-        """Save user to database"""
+        """Save user to database (one upsert; uniqueness is enforced by the schema)"""
+        preferences_json = json.dumps(self.preferences) if self.preferences else None
+        if not self.created_at:
+            self.created_at = datetime.utcnow().isoformat()
+        
         with get_conn() as conn:
             cursor = conn.cursor()
-            preferences_json = json.dumps(self.preferences) if self.preferences else None
-            
-            # Check for email uniqueness if email is being set
-            if self.email:
-                existing_user = self.find_by_email(self.email)
-                if existing_user and existing_user.id != self.id:
-                    raise ValueError("User with this email already exists")
-            
-            if self.id:
-                # Update existing user
+            with unique_errors(UNIQUE_MESSAGES):
                 cursor.execute("""
-                    UPDATE users SET 
-                        name = ?, email = ?, password_hash = ?, role = ?, 
-                        class_id = ?, profile_picture = ?, preferences = ?, 
-                        last_active = ?
-                    WHERE id = ?
+                    INSERT INTO users (id, name, email, password_hash, role, class_id,
+                                     profile_picture, preferences, created_at, last_active,
+                                     last_active_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        name = excluded.name, email = excluded.email,
+                        password_hash = excluded.password_hash, role = excluded.role,
+                        class_id = excluded.class_id, profile_picture = excluded.profile_picture,
+                        preferences = excluded.preferences, last_active = excluded.last_active,
+                        last_active_ts = excluded.last_active_ts,
+                        token_version = users.token_version + (
+                            users.role IS NOT excluded.role OR users.class_id IS NOT excluded.class_id
+                            OR users.password_hash IS NOT excluded.password_hash)
+                    RETURNING id, created_at, token_version
                 """, (
-                    self.name, self.email, self.password_hash, self.role,
+                    self.id, self.name, self.email, self.password_hash, self.role,
                     self.class_id, self.profile_picture, preferences_json,
-                    self.last_active, self.id
+                    self.created_at, self.last_active, epoch_seconds(self.last_active)
                 ))
-            else:
-                # Create new user
-                if not self.created_at:
-                    self.created_at = datetime.utcnow().isoformat()
-                
-                cursor.execute("""
-                    INSERT INTO users (name, email, password_hash, role, class_id, 
-                                     profile_picture, preferences, created_at, last_active)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    self.name, self.email, self.password_hash, self.role,
-                    self.class_id, self.profile_picture, preferences_json,
-                    self.created_at, self.last_active
-                ))
-                self.id = cursor.lastrowid
+                self.id, self.created_at, self.token_version = cursor.fetchone()
             
             conn.commit()
         return self
     
     def update_last_active(self):
-        """Update last active timestamp"""
-        self.last_active = datetime.utcnow().isoformat()
+        """Update last active timestamp (written behind, in batches)"""
         if self.id:
-            with get_conn() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE users SET last_active = ? WHERE id = ?",
-                    (self.last_active, self.id)
-                )
-                conn.commit()
+            self.last_active = activity_buffer.record(self.id)
+        else:
+            self.last_active = datetime.utcnow().isoformat()
     
     def to_dict(self, include_sensitive=False):
         """Convert user to dictionary"""
@@ -159,10 +182,10 @@ class User:
             'email': self.email,
             'role': self.role,
             'class_id': self.class_id,
-            'profile_picture': self.profile_picture,
+            'profile_picture': media_url(self.profile_picture),
             'preferences': self.preferences,
             'created_at': self.created_at,
-            'last_active': self.last_active
+            'last_active': activity_buffer.merge(self.id, self.last_active)
         }
         
         if include_sensitive:
@@ -179,11 +202,43 @@ class User:
                 cursor.execute("SELECT * FROM users WHERE role = ? ORDER BY created_at DESC", (role,))
             else:
                 cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
-            
-            users = []
-            for row in cursor.fetchall():
-                users.append(cls.from_db_row(row))
-            return users
+            return fetch_models(cursor, cls)
+    
+    @classmethod
+    def get_all_user_dicts(cls, role=None):
+        """Get all users as to_dict() dictionaries without building User objects"""
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            if role:
+                cursor.execute("SELECT * FROM users WHERE role = ? ORDER BY created_at DESC", (role,))
+            else:
+                cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
+            users = fetch_dicts(cursor, cls.JSON_FIELDS)
+        for user in users:
+            user['last_active'] = activity_buffer.merge(user['id'], user['last_active'])
+        return users
+    
+    @staticmethod
+    def get_progress_summary(user_id):
+        """Points, completed challenge IDs and per-module completion (read from user_stats)"""
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.total_points, s.completed_count, s.completed,
+                       (SELECT json_group_object(m.module_id, m.completed) FROM user_module_stats m
+                        WHERE m.user_id = s.user_id AND m.completed > 0) as modules
+                FROM user_stats s
+                WHERE s.user_id = ?
+            """, (user_id,))
+            row = cursor.fetchone()
+        if not row:
+            return {'total_points': 0, 'completed_count': 0, 'completed': [], 'module_completion': {}}
+        return {
+            'total_points': row['total_points'],
+            'completed_count': row['completed_count'],
+            'completed': json.loads(row['completed']),
+            'module_completion': json.loads(row['modules'])
+        }
     
     @classmethod
     def create_user(cls, name, email=None, password=None, role='student', class_id=None):
@@ -194,17 +249,7 @@ class User:
         
         name = name.strip()
         
-        # Check if user already exists
-        if cls.find_by_name(name):
-            raise ValueError("User with this name already exists")
-        
-        if email:
-            email = email.strip()
-            existing_email_user = cls.find_by_email(email)
-            if existing_email_user:
-                raise ValueError("User with this email already exists")
-        
-        # Create user
+        # Duplicate names and emails are rejected by save()
         user = cls(
             name=name,
             email=email.strip() if email else None,
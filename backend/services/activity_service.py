@@ -0,0 +1,117 @@
+"""
+Write-behind buffer for users' last activity time
+"""
+
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from database import run_write, epoch_seconds
+
+FLUSH_INTERVAL = float(os.environ.get("SKJ_ACTIVITY_FLUSH_INTERVAL", "5"))  # seconds
+
+logger = logging.getLogger("skj.activity")
+
+def _write_last_active(conn, entries):
+    """Write unit: store buffered activity times, never moving one backwards"""
+    conn.executemany("""
+        UPDATE users SET last_active = ?, last_active_ts = ?
+        WHERE id = ? AND (last_active IS NULL OR last_active < ?)
+    """, [(last_active, epoch_seconds(last_active), user_id, last_active) for user_id, last_active in entries])
+
+class ActivityBuffer:
+    """Keeps the latest activity time per user in memory.
+
+    A background thread writes everything recorded since the last flush in
+    one batched UPDATE every ``interval`` seconds (and at exit), so recording
+    activity on each authenticated request costs no write transaction.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {
+            'recorded': 0,
+            'flushes': 0,
+            'flushed_users': 0,
+            'errors': 0
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="skj-activity-flush", daemon=True)
+                self._thread.start()
+
+    def record(self, user_id, last_active=None):
+        """Buffer ``user_id``'s activity time (now by default) and return it"""
+        last_active = last_active or datetime.utcnow().isoformat()
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or current < last_active:
+                self._pending[user_id] = last_active
+            self._stats['recorded'] += 1
+        self._ensure_started()
+        return last_active
+
+    def merge(self, user_id, stored):
+        """The newer of a stored last_active value and the buffered one"""
+        pending = self._pending.get(user_id)
+        if pending is not None and (stored is None or pending > stored):
+            return pending
+        return stored
+
+    def flush(self):
+        """Write all buffered activity now; returns the number of users written"""
+        with self._lock:
+            entries, self._pending = self._pending, {}
+        if not entries:
+            return 0
+        try:
+            run_write(_write_last_active, list(entries.items()))
+        except Exception:
+            # Put the entries back unless newer activity has been recorded
+            with self._lock:
+                for user_id, last_active in entries.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < last_active:
+                        self._pending[user_id] = last_active
+                self._stats['errors'] += 1
+            raise
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['flushed_users'] += len(entries)
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Activity flush failed: %s", e)
+
+    def shutdown(self):
+        """Stop the flush thread and write what is still buffered"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(self.interval + 1)
+        self.flush()
+
+    def stats(self):
+        """Get buffer statistics"""
+        with self._lock:
+            return {'pending': len(self._pending), 'interval': self.interval, **self._stats}
+
+# Global buffer instance
+activity_buffer = ActivityBuffer()
+
+# Registered after the database writer, so it runs before the writer stops
+atexit.register(activity_buffer.shutdown)
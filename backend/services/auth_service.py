@@ -3,24 +3,69 @@ Authentication service for JWT token management and user authentication
 """
 
 import jwt
+import logging
 import os
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, abort, make_response
 from models.user import User
+from services.activity_service import activity_buffer
+from services.token_cache import token_cache
+
+logger = logging.getLogger("skj.auth")
+
+# User attributes served from token claims without loading the user; a
+# change to role or class bumps token_version, so these are never stale
+CLAIMED_ATTRIBUTES = {'id': 'user_id', 'role': 'role', 'class_id': 'class_id'}
+
+class LazyUser:
+    """The authenticated user as seen by an endpoint.
+
+    ``id``, ``role`` and ``class_id`` are read from the token claims; any
+    other attribute (or assignment) loads the full user once.
+    """
+
+    def __init__(self, claims, loader):
+        object.__setattr__(self, '_claims', claims)
+        object.__setattr__(self, '_loader', loader)
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        if self._user is None:
+            user = self._loader()
+            if not user:
+                abort(make_response(jsonify({'error': 'Authentication required'}), 401))
+            object.__setattr__(self, '_user', user)
+        return self._user
+
+    def __getattr__(self, name):
+        if self._user is None and name in CLAIMED_ATTRIBUTES:
+            return self._claims.get(CLAIMED_ATTRIBUTES[name])
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        return f"<LazyUser {self.id} ({self.role})>"
 
 class AuthService:
-    def __init__(self, secret_key=None, algorithm='HS256'):
+    def __init__(self, secret_key=None, algorithm='HS256', cache=None):
         self.secret_key = secret_key or os.environ.get("SKJ_SECRET", "dev-secret-change-me")
         self.algorithm = algorithm
+        self.cache = cache or token_cache
     
     def generate_token(self, user, expires_in_hours=24):
         """Generate JWT token for user"""
+        from services.rbac_service import rbac_service
         payload = {
             'user_id': user.id,
             'name': user.name,
             'email': user.email,
             'role': user.role,
+            'class_id': user.class_id,
+            'pv': rbac_service.version,
+            'tv': user.token_version,
             'exp': datetime.utcnow() + timedelta(hours=expires_in_hours),
             'iat': datetime.utcnow()
         }
@@ -28,7 +73,13 @@ class AuthService:
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
     
     def verify_token(self, token):
-        """Verify and decode JWT token"""
+        """Verify and decode JWT token (None if invalid, expired or revoked)"""
+        payload = self._verified_claims(token)
+        if payload and self.cache.is_revoked(token):
+            return None
+        return payload
+    
+    def _decode(self, token):
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             return payload
@@ -37,25 +88,86 @@ class AuthService:
         except jwt.InvalidTokenError:
             return None
     
-    def get_current_user(self):
-        """Get current user from request headers"""
+    def _verified_claims(self, token):
+        """Claims of a correctly signed, unexpired token (cached; revocation not checked)"""
+        claims = self.cache.get(token)
+        if claims is None:
+            claims = self._decode(token)
+            if claims:
+                self.cache.put(token, claims)
+        return claims
+    
+    def _request_token(self):
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
             return None
-        
-        token = auth_header.split(' ')[1]
-        payload = self.verify_token(token)
-        
-        if not payload:
+        return auth_header.split(' ')[1]
+    
+    def _request_claims(self):
+        """Verified claims of the current request's token, None if missing or revoked in any worker"""
+        token = self._request_token()
+        claims = self._verified_claims(token) if token else None
+        if not claims or self.cache.is_revoked(token):
             return None
-        
-        # Update user's last active time
-        user = User.find_by_id(payload.get('user_id'))
+        return claims
+    
+    def _load_user(self, user_id):
+        user = User.find_by_id(user_id)
         if user:
+            # Update user's last active time
             user.update_last_active()
-        
         return user
     
+    def get_current_claims(self):
+        """Verified token claims of the current request, None if revoked or the user is gone"""
+        claims = self._request_claims()
+        if claims is None or self.cache.token_version(claims.get('user_id')) is None:
+            return None
+        return claims
+    
+    def claims_current(self, claims, token_version):
+        """Whether role and class claims can be trusted without loading the user.
+        
+        ``users.token_version`` is bumped (in the database, so every worker
+        sees it) whenever role, class or password change; a token issued
+        before that, or under an older permission matrix, is not trusted.
+        """
+        from services.rbac_service import rbac_service
+        return claims.get('pv') == rbac_service.version and claims.get('tv') == token_version
+    
+    def get_current_identity(self):
+        """Current user for authorization checks.
+        
+        A ``LazyUser`` built from the claims when they are current (checked
+        against the token version cached in memory), otherwise the stored
+        user (role or class may have changed since the token was issued), or
+        None when unauthenticated.
+        """
+        claims = self._request_claims()
+        if claims is None:
+            return None
+        user_id = claims.get('user_id')
+        token_version = self.cache.token_version(user_id)
+        if token_version is None:
+            return None
+        if not self.claims_current(claims, token_version):
+            return self._load_user(user_id)
+        activity_buffer.record(user_id)
+        return LazyUser(claims, lambda: self._load_user(user_id))
+    
+    def get_current_user(self):
+        """Get current user from request headers"""
+        claims = self._request_claims()
+        if claims is None:
+            return None
+        return self._load_user(claims.get('user_id'))
+    
+    def revoke_token(self, token):
+        """Reject ``token`` from now on, in every worker (logout)"""
+        payload = self._verified_claims(token)
+        if payload:
+            self.cache.revoke(token, payload.get('exp', 0))
+    
     def authenticate_user(self, identifier, password):
         """Authenticate user by name/email and password"""
         # Try to find user by name first, then by email
@@ -69,6 +181,12 @@ class AuthService:
         if not user.check_password(password):
             return None
         
+        # Upgrade the stored hash when the bcrypt cost factor has changed
+        try:
+            user.rehash_password(password)
+        except Exception as e:
+            logger.warning("Password rehash failed for user %s: %s", user.id, e)
+        
         return user
     
     def register_user(self, name, email=None, password=None, role='student'):
@@ -102,7 +220,7 @@ def role_required(*allowed_roles):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            user = auth_service.get_current_user()
+            user = auth_service.get_current_identity()
             if not user:
                 return jsonify({'error': 'Token is missing or invalid'}), 401
             
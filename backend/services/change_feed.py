@@ -0,0 +1,65 @@
+"""
+Shared feed of row changes recorded by triggers, for per-process caches
+"""
+
+import threading
+from flask import g, has_request_context
+from database import get_conn
+
+# Entries after the last one seen; the first poll starts at the newest
+CHANGES_SQL = """
+    SELECT seq, kind, key FROM change_log
+    WHERE seq >= COALESCE(?, (SELECT MAX(seq) FROM change_log))
+    ORDER BY seq
+"""
+
+class ChangeFeed:
+    """Tails the ``change_log`` table that triggers append to in every worker.
+
+    Caches ``subscribe`` an ``apply(keys)`` callback for a kind of entry and
+    a ``reset()`` for when this process cannot tell what changed (first poll,
+    or entries it had not seen were pruned). ``poll`` reads the new entries
+    with one primary key range query, at most once per request. ``seq``
+    lets a cache skip storing a row read while a newer change was applied.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}   # kind -> [(apply, reset)]
+        self._last_seq = None    # last entry seen (0: the log was empty)
+
+    @property
+    def seq(self):
+        return self._last_seq
+
+    def subscribe(self, kind, apply, reset):
+        with self._lock:
+            self._subscribers.setdefault(kind, []).append((apply, reset))
+
+    def poll(self):
+        """Hand entries written since the last poll to the subscribers"""
+        if has_request_context():
+            polled = g.setdefault('change_feeds_polled', set())
+            if id(self) in polled:
+                return
+            polled.add(id(self))
+        with self._lock:
+            last_seq = self._last_seq
+            with get_conn() as conn:
+                rows = conn.execute(CHANGES_SQL, (last_seq,)).fetchall()
+            if last_seq is None or (last_seq and (not rows or rows[0][0] != last_seq)):
+                for subscribers in self._subscribers.values():
+                    for _, reset in subscribers:
+                        reset()
+            else:
+                changed = {}
+                for seq, kind, key in rows:
+                    if seq > last_seq:
+                        changed.setdefault(kind, []).append(key)
+                for kind, keys in changed.items():
+                    for apply, _ in self._subscribers.get(kind, ()):
+                        apply(keys)
+            self._last_seq = rows[-1][0] if rows else 0
+
+# Global change feed instance
+change_feed = ChangeFeed()
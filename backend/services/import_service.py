@@ -0,0 +1,201 @@
+"""
+Streaming bulk user import from CSV or JSONL.
+
+Records are read and validated in batches: one set-based query finds
+names and emails that already exist, passwords are hashed on the
+password worker pool (``services/password_service.py``) and each batch is
+inserted with ``executemany`` in its own write unit.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from datetime import datetime
+from database import get_conn, run_write
+from services.password_service import password_service
+from models.class_model import FREE_SEATS_SQL
+
+IMPORT_BATCH_SIZE = int(os.environ.get("SKJ_IMPORT_BATCH_SIZE", "500"))
+
+FORMATS = ("csv", "jsonl")
+ROLES = ("student", "teacher", "admin")
+
+def _read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record, None
+
+def _read_jsonl(stream):
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, record, None
+
+def _text(value):
+    """Stripped string value of a field, or None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _insert_users(conn, rows, class_id=None):
+    """Write unit: insert a batch of validated users.
+
+    Students join ``class_id`` only while it has free seats, the capacity
+    rule of ``Class.add_students``; the others are not inserted. Returns
+    (inserted count, indexes of the rows refused because the class is full).
+    """
+    refused = []
+    if class_id is not None:
+        row = conn.execute(FREE_SEATS_SQL, (class_id,)).fetchone()
+        seats = row[0] if row else 0
+        if seats >= 0:
+            kept = []
+            for index, values in enumerate(rows):
+                if values[4] is not None:  # a student joining the class
+                    if seats == 0:
+                        refused.append(index)
+                        continue
+                    seats -= 1
+                kept.append(values)
+            rows = kept
+    conn.executemany("""
+        INSERT INTO users (name, email, password_hash, role, class_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    return len(rows), refused
+
+class UserImporter:
+    """Bulk user import with batched validation and parallel hashing"""
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def import_users(self, stream, fmt="csv", class_id=None):
+        """Import users from a text stream; returns a summary with per-line errors.
+
+        ``class_id`` is assigned to imported students while the class has
+        free seats. Lines that fail validation, collide with existing users
+        or do not fit in the class are reported and skipped.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'")
+        if class_id is not None:
+            from models.class_model import Class
+            if not Class.find_by_id(class_id):
+                raise ValueError("Class not found")
+
+        records = _read_csv(stream) if fmt == "csv" else _read_jsonl(stream)
+        summary = {"imported": 0, "skipped": 0, "batches": 0, "errors": []}
+        seen = set()
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch, class_id, seen, summary)
+                batch = []
+        if batch:
+            self._import_batch(batch, class_id, seen, summary)
+        summary["errors"].sort(key=lambda error: error["line"])
+        return summary
+
+    def _import_batch(self, batch, class_id, seen, summary):
+        """Validate, hash and insert one batch"""
+        valid = []
+        for line_no, record, error in batch:
+            user = None
+            if not error:
+                user, error = self._validate(record, seen)
+            if error:
+                summary["errors"].append({"line": line_no, "error": error})
+            else:
+                valid.append((line_no, user))
+
+        valid = self._drop_existing(valid, summary)
+        summary["skipped"] = len(summary["errors"])
+        if not valid:
+            return
+
+        hashes = password_service.hash_many([user["password"] for _, user in valid])
+        for (_, user), password_hash in zip(valid, hashes):
+            user["password_hash"] = password_hash
+        try:
+            imported, refused = run_write(_insert_users, self._rows(valid, class_id), class_id)
+        except sqlite3.IntegrityError:
+            # Someone created one of these users since the check; re-check and retry once
+            valid = self._drop_existing(valid, summary)
+            imported, refused = run_write(_insert_users, self._rows(valid, class_id), class_id)
+        for index in refused:
+            summary["errors"].append({"line": valid[index][0], "error": "Class is full", "status": "class_full"})
+        summary["imported"] += imported
+        summary["skipped"] = len(summary["errors"])
+        summary["batches"] += 1
+
+    def _rows(self, valid, class_id):
+        created_at = datetime.utcnow().isoformat()
+        return [
+            (user["name"], user["email"], user["password_hash"], user["role"],
+             class_id if user["role"] == "student" else None, created_at)
+            for _, user in valid
+        ]
+
+    def _validate(self, record, seen):
+        """Normalize one record; returns (user, error)"""
+        name = _text(record.get("name"))
+        if not name:
+            return None, "Name is required"
+        email = _text(record.get("email"))
+        role = _text(record.get("role")) or "student"
+        if role not in ROLES:
+            return None, f"Invalid role '{role}'"
+        password = record.get("password")
+        if password is not None and not isinstance(password, str):
+            return None, "Password must be a string"
+
+        if ("name", name) in seen:
+            return None, f"Duplicate name '{name}' in file"
+        if email and ("email", email) in seen:
+            return None, f"Duplicate email '{email}' in file"
+        seen.add(("name", name))
+        if email:
+            seen.add(("email", email))
+        return {"name": name, "email": email, "role": role, "password": password or None}, None
+
+    def _drop_existing(self, valid, summary):
+        """Remove users whose name or email already exists (one query per batch)"""
+        if not valid:
+            return valid
+        names = json.dumps([user["name"] for _, user in valid])
+        emails = json.dumps([user["email"] for _, user in valid if user["email"]])
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT name, email FROM users
+                WHERE name IN (SELECT value FROM json_each(?))
+                   OR email IN (SELECT value FROM json_each(?))
+            """, (names, emails))
+            rows = cursor.fetchall()
+        taken_names = {row["name"] for row in rows}
+        taken_emails = {row["email"] for row in rows if row["email"]}
+
+        remaining = []
+        for line_no, user in valid:
+            if user["name"] in taken_names:
+                summary["errors"].append({"line": line_no, "error": "User with this name already exists"})
+            elif user["email"] and user["email"] in taken_emails:
+                summary["errors"].append({"line": line_no, "error": "User with this email already exists"})
+            else:
+                remaining.append((line_no, user))
+        return remaining
+
+# Global importer instance
+user_importer = UserImporter()
@@ -0,0 +1,167 @@
+"""
+Content-addressed store for uploaded images (profile pictures)
+
+Each image is stored once under its SHA-256 (``media/ab/abcd....png``) and
+referenced from the database by that short name. Resized variants are
+generated next to the original on first request when Pillow is installed;
+without it, or for images over ``SKJ_MEDIA_MAX_PIXELS``, the original is
+served for every size.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # optional: variants fall back to the original
+    Image = None
+
+MEDIA_DIR = Path(os.environ.get("SKJ_MEDIA_DIR", Path(__file__).parent.parent / "media"))
+MEDIA_MAX_BYTES = int(os.environ.get("SKJ_MEDIA_MAX_BYTES", str(2 * 1024 * 1024)))
+# Largest image (width x height) Pillow is asked to decode for a variant
+MEDIA_MAX_PIXELS = int(os.environ.get("SKJ_MEDIA_MAX_PIXELS", str(4096 * 4096)))
+MEDIA_URL = "/api/media/"
+
+# variant name -> longest side in pixels
+VARIANTS = {"thumb": 64, "small": 256}
+
+MIME_TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+PIL_FORMATS = {"png": "PNG", "jpg": "JPEG", "gif": "GIF", "webp": "WEBP"}
+
+_REF = re.compile(r"^[0-9a-f]{64}\.(png|jpg|gif|webp)$")
+
+def image_type(data):
+    """Extension for PNG/JPEG/GIF/WebP bytes, sniffed from the header, or None"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def is_media_ref(value):
+    """Whether ``value`` names an object in the media store"""
+    return isinstance(value, str) and bool(_REF.match(value))
+
+def media_url(value):
+    """Public URL for a stored reference; other values are returned unchanged"""
+    if is_media_ref(value):
+        return MEDIA_URL + value
+    return value
+
+class MediaStore:
+    """Images on disk, named by the SHA-256 of their content"""
+
+    def __init__(self, root=MEDIA_DIR, max_bytes=MEDIA_MAX_BYTES, max_pixels=MEDIA_MAX_PIXELS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+
+    def _path(self, ref, variant=None):
+        digest, ext = ref.split(".")
+        name = f"{digest}_{variant}.{ext}" if variant else ref
+        return self.root / digest[:2] / name
+
+    def _write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def put(self, data):
+        """Store image bytes (deduplicated); returns the reference"""
+        if len(data) > self.max_bytes:
+            raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+        ext = image_type(data)
+        if not ext:
+            raise ValueError("Unsupported image type (use PNG, JPEG, GIF or WebP)")
+        ref = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self._path(ref)
+        if not path.exists():
+            self._write(path, data)
+        return ref
+
+    def put_data_url(self, data_url):
+        """Store a ``data:image/...;base64,`` URL; returns the reference"""
+        header, _, payload = data_url.partition(",")
+        if not header.startswith("data:") or not header.endswith(";base64"):
+            raise ValueError("Profile picture must be a base64 data URL")
+        if len(payload) > self.max_bytes * 4 // 3 + 4:
+            raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+        try:
+            data = base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Invalid base64 image data")
+        return self.put(data)
+
+    def _variant(self, ref, variant):
+        """Path of a resized variant, generated on first use; None without Pillow"""
+        path = self._path(ref, variant)
+        if path.exists():
+            return path
+        if Image is None:
+            return None
+        ext = ref.split(".")[1]
+        try:
+            with Image.open(self._path(ref)) as image:
+                # Only the header is read so far; refuse to decode huge images
+                width, height = image.size
+                if width * height > self.max_pixels:
+                    return None
+                image.thumbnail((VARIANTS[variant], VARIANTS[variant]))
+                if ext == "jpg" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                out = io.BytesIO()
+                image.save(out, PIL_FORMATS[ext])
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Unreadable image: serve the original
+            return None
+        self._write(path, out.getvalue())
+        return path
+
+    def open(self, ref, variant=None):
+        """(path, mimetype) of a stored image or one of its variants, or None"""
+        if not is_media_ref(ref) or (variant and variant not in VARIANTS):
+            return None
+        path = self._path(ref)
+        if not path.exists():
+            return None
+        if variant:
+            path = self._variant(ref, variant) or path
+        return path, MIME_TYPES[ref.split(".")[1]]
+
+    def profile_picture(self, value):
+        """Normalize a submitted profile picture into what the users row stores.
+
+        Data URLs are moved into the store, other short values (references,
+        URLs) are kept and empty values clear the picture.
+        """
+        if not value:
+            return None
+        if not isinstance(value, str):
+            raise ValueError("Invalid profile picture")
+        if value.startswith("data:"):
+            return self.put_data_url(value)
+        if value.startswith(MEDIA_URL) and is_media_ref(value[len(MEDIA_URL):]):
+            return value[len(MEDIA_URL):]
+        if len(value) > 500:
+            raise ValueError("Profile picture is too long; upload the image instead")
+        return value
+
+# Global media store instance
+media_store = MediaStore()
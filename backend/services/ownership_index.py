@@ -0,0 +1,111 @@
+"""
+In-memory class ownership index for scoped RBAC checks
+"""
+
+import threading
+from database import get_conn
+from services.change_feed import change_feed
+
+class OwnershipIndex:
+    """Teacher of every class and (role, class) of every user.
+
+    Loaded from the database on first use. Triggers append to the shared
+    change log the users whose role or class changed (their token version
+    moves with it) or who were deleted, and the classes that changed
+    teacher or were deleted, no matter which worker process wrote them. On
+    the ``change_feed`` poll (at most once per request) just those entries
+    are dropped and read again on next use; rows inserted since the load
+    are looked up on first miss too. ``invalidate`` forces a reload.
+    """
+
+    def __init__(self, feed=None):
+        self.feed = feed or change_feed
+        self._class_teacher = None
+        self._users = None
+        self._lock = threading.Lock()
+        self.feed.subscribe('user', self._apply_users, self.invalidate)
+        self.feed.subscribe('class', self._apply_classes, self.invalidate)
+
+    def _apply_users(self, user_ids):
+        with self._lock:
+            if self._users is not None:
+                for user_id in user_ids:
+                    self._users.pop(user_id, None)
+
+    def _apply_classes(self, class_ids):
+        with self._lock:
+            if self._class_teacher is not None:
+                for class_id in class_ids:
+                    self._class_teacher.pop(class_id, None)
+
+    def _maps(self):
+        """(class_id -> teacher_id, user_id -> (role, class_id)), loading them on first use"""
+        self.feed.poll()
+        with self._lock:
+            if self._users is not None:
+                return self._class_teacher, self._users
+        seq = self.feed.seq
+        with get_conn() as conn:
+            class_teacher = {row[0]: row[1] for row in conn.execute("SELECT id, teacher_id FROM classes")}
+            users = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT id, role, class_id FROM users")}
+        with self._lock:
+            # Keep the maps only if no change was applied while they were read
+            if self.feed.seq == seq:
+                self._class_teacher, self._users = class_teacher, users
+        return class_teacher, users
+
+    def _teacher_of(self, class_teacher, class_id):
+        with self._lock:
+            if class_id in class_teacher:
+                return class_teacher[class_id]
+        seq = self.feed.seq
+        with get_conn() as conn:
+            row = conn.execute("SELECT teacher_id FROM classes WHERE id = ?", (class_id,)).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            if self.feed.seq == seq:
+                class_teacher[class_id] = row[0]
+        return row[0]
+
+    def _user(self, users, user_id):
+        with self._lock:
+            if user_id in users:
+                return users[user_id]
+        seq = self.feed.seq
+        with get_conn() as conn:
+            row = conn.execute("SELECT role, class_id FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None, None
+        with self._lock:
+            if self.feed.seq == seq:
+                users[user_id] = (row[0], row[1])
+        return row[0], row[1]
+
+    def teacher_of(self, class_id):
+        """Teacher ID of ``class_id``, or None if the class does not exist"""
+        return self._teacher_of(self._maps()[0], class_id)
+
+    def user(self, user_id):
+        """(role, class_id) of ``user_id``, or (None, None) if the user does not exist"""
+        return self._user(self._maps()[1], user_id)
+
+    def user_scope(self, user_id):
+        """(role, class_id, teacher of that class) of ``user_id`` from one snapshot"""
+        class_teacher, users = self._maps()
+        role, class_id = self._user(users, user_id)
+        teacher_id = self._teacher_of(class_teacher, class_id) if class_id is not None else None
+        return role, class_id, teacher_id
+
+    def teaches(self, teacher_id, student_id):
+        """Whether ``student_id`` is a student in one of ``teacher_id``'s classes"""
+        role, class_id, class_teacher = self.user_scope(student_id)
+        return role == 'student' and class_id is not None and class_teacher == teacher_id
+
+    def invalidate(self):
+        """Reload everything on next use"""
+        with self._lock:
+            self._class_teacher = self._users = None
+
+# Global ownership index instance
+ownership_index = OwnershipIndex()
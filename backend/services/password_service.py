@@ -0,0 +1,164 @@
+"""
+Password hashing and verification on a dedicated process pool
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("SKJ_BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.environ.get("SKJ_PASSWORD_WORKERS", str(os.cpu_count() or 1)))  # 0 = inline
+PASSWORD_QUEUE_SIZE = int(os.environ.get("SKJ_PASSWORD_QUEUE_SIZE", "256"))
+
+class PasswordServiceBusy(RuntimeError):
+    pass
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _hash_many(passwords, rounds):
+    return [_hash(password, rounds) if password else None for password in passwords]
+
+def _verify(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def hash_rounds(password_hash):
+    """Cost factor of a bcrypt hash (``$2b$12$...``), or None if unreadable"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordService:
+    """Runs bcrypt on a bounded pool of worker processes.
+
+    Request threads only wait on a future, so a burst of logins queues in
+    the pool instead of pinning every web worker. When more than
+    ``queue_size`` operations are pending, new ones are rejected with
+    ``PasswordServiceBusy``.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_WORKERS, queue_size=PASSWORD_QUEUE_SIZE):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            'hashed': 0,
+            'verified': 0,
+            'rejected': 0,
+            'peak_pending': 0,
+            'total_ms': 0.0
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the pool starts lazily inside a threaded server
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _submit(self, kind, count, fn, *args):
+        """Queue ``fn`` on the pool (run inline without workers); returns a future"""
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._stats['rejected'] += 1
+                raise PasswordServiceBusy("Password service is busy, try again")
+            self._pending += 1
+            self._stats['peak_pending'] = max(self._stats['peak_pending'], self._pending)
+        start = time.perf_counter()
+
+        def done(_):
+            with self._lock:
+                self._pending -= 1
+                self._stats[kind] += count
+                self._stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+        try:
+            if self.workers:
+                try:
+                    future = self._get_executor().submit(fn, *args)
+                except BrokenProcessPool:
+                    # A worker died; start a fresh pool
+                    with self._lock:
+                        self._executor = None
+                    future = self._get_executor().submit(fn, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(done)
+        return future
+
+    def hash(self, password):
+        """Hash a password with the configured cost"""
+        if not password:
+            return None
+        return self._submit('hashed', 1, _hash, password, self.rounds).result()
+
+    def hash_many(self, passwords):
+        """Hash many passwords (None for empty ones), split across the workers"""
+        if not any(passwords):
+            return [None] * len(passwords)
+        size = -(-len(passwords) // max(1, self.workers)) or 1
+        futures = [
+            self._submit('hashed', len(passwords[i:i + size]), _hash_many, passwords[i:i + size], self.rounds)
+            for i in range(0, len(passwords), size)
+        ]
+        return [password_hash for future in futures for password_hash in future.result()]
+
+    def verify(self, password, password_hash):
+        """Check a password against a stored hash"""
+        if not password or not password_hash:
+            return False
+        return self._submit('verified', 1, _verify, password, password_hash).result()
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash uses a different cost than configured"""
+        return bool(password_hash) and hash_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        """Get pool statistics; ``pending`` is the current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+            pending = self._pending
+        operations = stats['hashed'] + stats['verified']
+        return {
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'pending': pending,
+            'queued': max(0, pending - self.workers),
+            'hashed': stats['hashed'],
+            'verified': stats['verified'],
+            'rejected': stats['rejected'],
+            'peak_pending': stats['peak_pending'],
+            'avg_ms': round(stats['total_ms'] / operations, 2) if operations else 0.0
+        }
+
+# Global password service instance
+password_service = PasswordService()
+
+atexit.register(password_service.shutdown)
@@ -0,0 +1,349 @@
+"""
+In-memory challenge prerequisite graph with precomputed transitive closure
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from database import get_conn
+
+# Challenge columns kept in memory for chain and learning path views
+NODE_COLUMNS = ('id', 'module_id', 'title', 'difficulty', 'points', 'estimated_duration', 'is_active')
+
+GENERATION_SQL = "SELECT generation FROM challenge_generation WHERE id = 1"
+
+def iter_bits(mask):
+    """Positions of the set bits of ``mask``, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class PrerequisiteGraph:
+    """Process-wide prerequisite DAG built from the challenges table.
+
+    Every challenge gets a bit position; ``closure`` maps a challenge to the
+    bitset of all its (transitive) prerequisites. Strongly connected
+    components are recomputed on every edit so cycles are always known, and
+    only the edited challenge and its dependents get a new closure.
+
+    Triggers bump the shared ``challenge_generation`` row on every change to
+    the challenges table, whichever worker process makes it. ``refresh``
+    reads it (one primary key query) and reloads the graph when it moved;
+    queries made inside ``current()`` share one check, other queries check
+    each time. ``Challenge.save``/``delete`` pass the generation of their
+    own write, so an edit that follows the loaded state is applied in place
+    instead of reloading.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._loaded = False
+        self._generation = None
+        self._reset()
+
+    def _reset(self):
+        self._bit = {}            # challenge id -> bit position
+        self._ids = []            # bit position -> challenge id (None once deleted)
+        self._info = {}           # challenge id -> NODE_COLUMNS dict
+        self._prereqs = {}        # challenge id -> prerequisite ids as stored (may name unknown ids)
+        self._dependents = {}     # prerequisite id -> ids listing it directly
+        self._closure = {}        # challenge id -> bitset of transitive prerequisites
+        self._rank = {}           # challenge id -> position in topological order
+        self._cycles = []
+        self._cyclic_mask = 0
+
+    # Loading and edits
+
+    def refresh(self):
+        """Reload the graph if the challenges changed since it was loaded"""
+        with get_conn() as conn:
+            generation = conn.execute(GENERATION_SQL).fetchone()[0]
+            with self._lock:
+                if self._loaded and self._generation == generation:
+                    return
+            # Read after the generation, so the rows are at least that new
+            rows = conn.execute(f"SELECT {', '.join(NODE_COLUMNS)}, prerequisites FROM challenges ORDER BY id").fetchall()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._set_node(dict(zip(NODE_COLUMNS, row)), _parse(row[len(NODE_COLUMNS)]))
+            self._recompute()
+            self._loaded = True
+            self._generation = generation
+
+    @contextmanager
+    def current(self):
+        """Check the shared generation once for all queries made inside the block"""
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            self.refresh()
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth = depth
+
+    def _ensure(self):
+        if not getattr(self._local, 'depth', 0) or not self._loaded:
+            self.refresh()
+
+    def _follows(self, generation):
+        """Whether an edit written at ``generation`` directly follows the loaded state"""
+        if not self._loaded or generation == self._generation:
+            return False
+        if generation != self._generation + 1:
+            # Another writer got in between; reload on next use
+            self._loaded = False
+            return False
+        self._generation = generation
+        return True
+
+    def _set_node(self, info, prereqs):
+        challenge_id = info['id']
+        for old in self._prereqs.get(challenge_id, ()):
+            self._dependents.get(old, set()).discard(challenge_id)
+        if challenge_id not in self._bit:
+            self._bit[challenge_id] = len(self._ids)
+            self._ids.append(challenge_id)
+        info['is_active'] = bool(info['is_active'])
+        self._info[challenge_id] = info
+        self._prereqs[challenge_id] = list(dict.fromkeys(prereqs))
+        for prereq_id in self._prereqs[challenge_id]:
+            self._dependents.setdefault(prereq_id, set()).add(challenge_id)
+
+    def _affected(self, challenge_id):
+        """``challenge_id`` and everything that (transitively) depends on it"""
+        affected = {challenge_id}
+        pending = [challenge_id]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+        return affected
+
+    def challenge_saved(self, challenge, generation):
+        """Record a created or updated challenge, written at ``generation``"""
+        with self._lock:
+            if not self._follows(generation):
+                return
+            affected = self._affected(challenge.id)
+            info = {column: getattr(challenge, column) for column in NODE_COLUMNS}
+            self._set_node(info, challenge.prerequisites or [])
+            self._recompute(affected)
+
+    def challenge_deleted(self, challenge_id, generation):
+        """Forget a deleted challenge (challenges still listing it keep an unknown prerequisite)"""
+        with self._lock:
+            if not self._follows(generation) or challenge_id not in self._bit:
+                return
+            affected = self._affected(challenge_id)
+            for prereq_id in self._prereqs.pop(challenge_id):
+                self._dependents.get(prereq_id, set()).discard(challenge_id)
+            self._ids[self._bit.pop(challenge_id)] = None
+            del self._info[challenge_id]
+            self._closure.pop(challenge_id, None)
+            self._recompute(affected - {challenge_id})
+
+    def invalidate(self):
+        """Reload the whole graph on next use"""
+        with self._lock:
+            self._loaded = False
+
+    def _known_prereqs(self, challenge_id):
+        return [prereq_id for prereq_id in self._prereqs[challenge_id] if prereq_id in self._bit]
+
+    def _components(self):
+        """Strongly connected components, prerequisites before dependents (iterative Tarjan)"""
+        index, low = {}, {}
+        stack, on_stack = [], set()
+        components = []
+        for root in self._ids:
+            if root is None or root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._known_prereqs(root)))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self._known_prereqs(child))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    def _recompute(self, affected=None):
+        """Refresh order and cycles; closures of ``affected`` (all when None)"""
+        rank = {}
+        cycles = []
+        cyclic_mask = 0
+        for component in self._components():
+            members = set(component)
+            cyclic = len(component) > 1 or component[0] in self._prereqs[component[0]]
+            if cyclic:
+                cycles.append(sorted(component))
+                for member in component:
+                    cyclic_mask |= 1 << self._bit[member]
+            for member in component:
+                rank[member] = len(rank)
+            if affected is not None and members.isdisjoint(affected):
+                continue
+            mask = 0
+            for member in component:
+                for prereq_id in self._known_prereqs(member):
+                    mask |= 1 << self._bit[prereq_id]
+                    if prereq_id not in members:
+                        mask |= self._closure[prereq_id]
+            for member in component:
+                self._closure[member] = mask
+        self._rank = rank
+        self._cycles = cycles
+        self._cyclic_mask = cyclic_mask
+
+    # Queries (in memory once the generation is checked)
+
+    def node(self, challenge_id):
+        """Stored columns of ``challenge_id`` (see NODE_COLUMNS), or None"""
+        self._ensure()
+        with self._lock:
+            info = self._info.get(challenge_id)
+            return dict(info) if info else None
+
+    def nodes(self, active_only=True):
+        """All challenges, ordered by module and ID"""
+        self._ensure()
+        with self._lock:
+            infos = [dict(info) for info in self._info.values() if info['is_active'] or not active_only]
+        return sorted(infos, key=lambda info: (info['module_id'] or '', info['id']))
+
+    def prerequisites(self, challenge_id):
+        """Direct prerequisite IDs as stored (unknown IDs included)"""
+        self._ensure()
+        with self._lock:
+            return list(self._prereqs.get(challenge_id, ()))
+
+    def dependents(self, challenge_id):
+        """IDs of challenges listing ``challenge_id`` as a direct prerequisite"""
+        self._ensure()
+        with self._lock:
+            return [dependent for dependent in self._dependents.get(challenge_id, ()) if dependent in self._info]
+
+    def bit(self, challenge_id):
+        """Bit of ``challenge_id`` in closure masks, or 0 if unknown"""
+        self._ensure()
+        with self._lock:
+            position = self._bit.get(challenge_id)
+            return 0 if position is None else 1 << position
+
+    def mask(self, challenge_ids):
+        """Bitset of the known challenges among ``challenge_ids``"""
+        self._ensure()
+        with self._lock:
+            mask = 0
+            for challenge_id in challenge_ids:
+                position = self._bit.get(challenge_id)
+                if position is not None:
+                    mask |= 1 << position
+            return mask
+
+    def ids(self, mask):
+        """Challenge IDs of the bits in ``mask``, in topological order"""
+        self._ensure()
+        with self._lock:
+            found = [self._ids[position] for position in iter_bits(mask) if position < len(self._ids)]
+            return sorted((challenge_id for challenge_id in found if challenge_id is not None), key=self._rank.__getitem__)
+
+    def closure(self, challenge_id):
+        """Bitset of all transitive prerequisites of ``challenge_id``"""
+        self._ensure()
+        with self._lock:
+            return self._closure.get(challenge_id, 0)
+
+    def depends_on(self, challenge_id, prereq_id):
+        """Whether ``challenge_id`` requires ``prereq_id``, directly or transitively"""
+        return bool(self.closure(challenge_id) & self.bit(prereq_id))
+
+    def chain(self, challenge_id):
+        """[(prerequisite id, level)] breadth first; level 1 are direct prerequisites"""
+        self._ensure()
+        with self._lock:
+            chain = []
+            seen = {challenge_id}
+            level_ids = [challenge_id]
+            level = 0
+            while level_ids:
+                level += 1
+                next_ids = []
+                for current in level_ids:
+                    for prereq_id in self._known_prereqs(current) if current in self._prereqs else ():
+                        if prereq_id not in seen:
+                            seen.add(prereq_id)
+                            chain.append((prereq_id, level))
+                            next_ids.append(prereq_id)
+                level_ids = next_ids
+            return chain
+
+    def topological(self, challenge_ids):
+        """``challenge_ids`` sorted so prerequisites come first (unknown IDs last)"""
+        self._ensure()
+        with self._lock:
+            return sorted(challenge_ids, key=lambda challenge_id: self._rank.get(challenge_id, len(self._rank)))
+
+    def cycle_edges(self, challenge_id, prereq_ids):
+        """Which of ``prereq_ids`` would close a cycle if they were ``challenge_id``'s prerequisites"""
+        self._ensure()
+        with self._lock:
+            bit = 1 << self._bit[challenge_id] if challenge_id in self._bit else 0
+            return [
+                prereq_id for prereq_id in prereq_ids
+                if prereq_id == challenge_id or (bit and self._closure.get(prereq_id, 0) & bit)
+            ]
+
+    def in_cycle(self, challenge_id, transitive=False):
+        """Whether ``challenge_id`` (or, with ``transitive``, any of its prerequisites) is on a cycle"""
+        self._ensure()
+        with self._lock:
+            mask = self._closure.get(challenge_id, 0) if transitive else 0
+            if challenge_id in self._bit:
+                mask |= 1 << self._bit[challenge_id]
+            return bool(mask & self._cyclic_mask)
+
+    def cycles(self):
+        """Strongly connected components with more than one challenge (or a self-reference)"""
+        self._ensure()
+        with self._lock:
+            return [list(cycle) for cycle in self._cycles]
+
+def _parse(value):
+    if not value:
+        return []
+    try:
+        prereqs = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return prereqs if isinstance(prereqs, list) else []
+
+# Global prerequisite graph instance
+prerequisite_graph = PrerequisiteGraph()
@@ -2,44 +2,55 @@
 Prerequisite Validation Service for challenges
 """
 
+import json
+from functools import wraps
 from models.challenge import Challenge
 from database import get_conn
+from services.prerequisite_graph import prerequisite_graph
+
+def _current_graph(method):
+    """Check the prerequisite graph against the database once per call"""
+    @wraps(method)
+    def decorated(self, *args, **kwargs):
+        with self.graph.current():
+            return method(self, *args, **kwargs)
+    return decorated
 
 class PrerequisiteService:
     """Service for managing and validating challenge prerequisites"""
     
-    def __init__(self):
-        pass
+    def __init__(self, graph=None):
+        self.graph = graph or prerequisite_graph
+    
+    def _describe(self, challenge_id):
+        """Short description of a (possibly unknown) prerequisite"""
+        node = self.graph.node(challenge_id)
+        if node:
+            return {'id': challenge_id, 'title': node['title'], 'module_id': node['module_id']}
+        return {
+            'id': challenge_id,
+            'title': f"Unknown Challenge ({challenge_id})",
+            'module_id': 'unknown'
+        }
     
+    @_current_graph
     def validate_prerequisites(self, challenge_id, user_id):
         """Validate if user has completed prerequisites for a challenge"""
-        challenge = Challenge.find_by_id(challenge_id)
-        if not challenge:
+        if not self.graph.node(challenge_id):
             return False, ["Challenge not found"]
         
-        if not challenge.prerequisites:
+        prerequisites = self.graph.prerequisites(challenge_id)
+        if not prerequisites:
             return True, []
         
         # Get user's completed challenges
-        completed_challenges = self.get_user_completed_challenges(user_id)
+        completed_challenges = set(self.get_user_completed_challenges(user_id))
         
         # Check prerequisites
-        missing_prerequisites = []
-        for prereq_id in challenge.prerequisites:
-            if prereq_id not in completed_challenges:
-                prereq_challenge = Challenge.find_by_id(prereq_id)
-                if prereq_challenge:
-                    missing_prerequisites.append({
-                        'id': prereq_id,
-                        'title': prereq_challenge.title,
-                        'module_id': prereq_challenge.module_id
-                    })
-                else:
-                    missing_prerequisites.append({
-                        'id': prereq_id,
-                        'title': f"Unknown Challenge ({prereq_id})",
-                        'module_id': 'unknown'
-                    })
+        missing_prerequisites = [
+            self._describe(prereq_id) for prereq_id in prerequisites
+            if prereq_id not in completed_challenges
+        ]
         
         return len(missing_prerequisites) == 0, missing_prerequisites
     
@@ -54,6 +65,80 @@ class PrerequisiteService:
             
             return [row[0] for row in cursor.fetchall()]
     
+    def _completion_columns(self, user_ids):
+        """{challenge_id: bitset of the positions in ``user_ids`` that completed it} in one query"""
+        position = {user_id: n for n, user_id in enumerate(user_ids)}
+        columns = {}
+        if not position:
+            return columns
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT user_id, challenge_id FROM progress
+                WHERE status = 'completed' AND user_id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(position)),))
+            for user_id, challenge_id in cursor.fetchall():
+                columns[challenge_id] = columns.get(challenge_id, 0) | (1 << position[user_id])
+        return columns
+    
+    def _unlock_rows(self, user_ids, challenge_ids, columns):
+        """Statuses of ``challenge_ids`` for each user: {user_id: [status, ...]}.
+        
+        Each challenge is tested for all users at once: one AND per
+        prerequisite over the users who completed it. A completed challenge
+        whose prerequisites are not all completed counts as locked.
+        """
+        everyone = (1 << len(user_ids)) - 1
+        rows = {user_id: [] for user_id in user_ids}
+        for challenge_id in challenge_ids:
+            unlocked = everyone
+            for prereq_id in self.graph.prerequisites(challenge_id):
+                unlocked &= columns.get(prereq_id, 0)
+            completed = columns.get(challenge_id, 0) & unlocked
+            for n, user_id in enumerate(user_ids):
+                bit = 1 << n
+                rows[user_id].append(
+                    'completed' if completed & bit else 'available' if unlocked & bit else 'locked'
+                )
+        return rows
+    
+    @_current_graph
+    def unlock_matrix(self, user_ids, challenge_ids):
+        """Status ('completed', 'available' or 'locked') of every challenge for every user.
+        
+        Returns ``{user_id: [status, ...]}`` aligned with ``challenge_ids``;
+        completions of all users are read in one query.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        return self._unlock_rows(user_ids, challenge_ids, self._completion_columns(user_ids))
+    
+    @_current_graph
+    def get_class_unlock_matrix(self, class_id, module_id=None):
+        """Unlock grid of every student in a class over the active challenges"""
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, name FROM users
+                WHERE class_id = ? AND role = 'student'
+                ORDER BY name
+            """, (class_id,))
+            students = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+        
+        challenges = [
+            {'id': node['id'], 'title': node['title'], 'module_id': node['module_id']}
+            for node in self.graph.nodes() if not module_id or node['module_id'] == module_id
+        ]
+        rows = self.unlock_matrix([student['id'] for student in students], [c['id'] for c in challenges])
+        
+        for student in students:
+            student['statuses'] = rows[student['id']]
+        return {
+            'class_id': class_id,
+            'challenges': challenges,
+            'students': students
+        }
+    
+    @_current_graph
     def get_available_challenges(self, user_id, module_id=None):
         """Get challenges available to user (prerequisites met)"""
         # Get all challenges
@@ -62,75 +147,52 @@ class PrerequisiteService:
         else:
             all_challenges = Challenge.get_all_challenges()
         
-        # Get user's completed challenges
-        completed_challenges = self.get_user_completed_challenges(user_id)
+        # Get user's completed challenges (bit 0 of each column)
+        columns = self._completion_columns([user_id])
+        statuses = self._unlock_rows([user_id], [challenge.id for challenge in all_challenges], columns)[user_id]
         
         available_challenges = []
         locked_challenges = []
         
-        for challenge in all_challenges:
-            can_access, missing_prereqs = self.validate_prerequisites(challenge.id, user_id)
-            
-            if can_access:
+        for challenge, status in zip(all_challenges, statuses):
+            if status != 'locked':
                 available_challenges.append({
                     'challenge': challenge,
-                    'status': 'completed' if challenge.id in completed_challenges else 'available'
+                    'status': status
                 })
             else:
                 locked_challenges.append({
                     'challenge': challenge,
                     'status': 'locked',
-                    'missing_prerequisites': missing_prereqs
+                    'missing_prerequisites': [
+                        self._describe(prereq_id) for prereq_id in self.graph.prerequisites(challenge.id)
+                        if not columns.get(prereq_id, 0)
+                    ]
                 })
         
         return available_challenges, locked_challenges
     
-    def get_prerequisite_chain(self, challenge_id, visited=None):
-        """Get the complete prerequisite chain for a challenge"""
-        if visited is None:
-            visited = set()
-        
-        if challenge_id in visited:
-            return []  # Circular dependency detected
-        
-        visited.add(challenge_id)
-        
-        challenge = Challenge.find_by_id(challenge_id)
-        if not challenge or not challenge.prerequisites:
-            return []
-        
+    @_current_graph
+    def get_prerequisite_chain(self, challenge_id):
+        """Get the complete prerequisite chain for a challenge (each prerequisite once, at its nearest level)"""
         chain = []
-        for prereq_id in challenge.prerequisites:
-            prereq_challenge = Challenge.find_by_id(prereq_id)
-            if prereq_challenge:
-                # Add the prerequisite
-                chain.append({
-                    'id': prereq_id,
-                    'title': prereq_challenge.title,
-                    'module_id': prereq_challenge.module_id,
-                    'level': 1
-                })
-                
-                # Recursively get prerequisites of prerequisites
-                sub_chain = self.get_prerequisite_chain(prereq_id, visited.copy())
-                for item in sub_chain:
-                    item['level'] += 1
-                    chain.append(item)
-        
+        for prereq_id, level in self.graph.chain(challenge_id):
+            item = self._describe(prereq_id)
+            item['level'] = level
+            chain.append(item)
         return chain
     
+    @_current_graph
     def validate_prerequisite_chain(self, challenge_id):
         """Validate that prerequisite chain doesn't have circular dependencies"""
-        try:
-            chain = self.get_prerequisite_chain(challenge_id)
-            return True, chain
-        except RecursionError:
+        if self.graph.in_cycle(challenge_id, transitive=True):
             return False, "Circular dependency detected in prerequisite chain"
+        return True, self.get_prerequisite_chain(challenge_id)
     
+    @_current_graph
     def suggest_learning_path(self, user_id, target_challenge_id):
         """Suggest optimal learning path to reach target challenge"""
-        target_challenge = Challenge.find_by_id(target_challenge_id)
-        if not target_challenge:
+        if not self.graph.node(target_challenge_id):
             return []
         
         # Check if user can already access the challenge
@@ -138,106 +200,67 @@ class PrerequisiteService:
         if can_access:
             return []  # No path needed, already accessible
         
-        # Get completed challenges
-        completed = set(self.get_user_completed_challenges(user_id))
-        
-        # Build learning path
-        learning_path = []
-        to_complete = set()
-        
-        # Add direct prerequisites
+        # Missing prerequisites and everything they require, minus what is done
+        completed = self.graph.mask(self.get_user_completed_challenges(user_id))
+        to_complete = 0
         for prereq in missing_prereqs:
-            to_complete.add(prereq['id'])
-        
-        # Add prerequisites of prerequisites
-        for prereq_id in list(to_complete):
-            prereq_chain = self.get_prerequisite_chain(prereq_id)
-            for item in prereq_chain:
-                if item['id'] not in completed:
-                    to_complete.add(item['id'])
+            to_complete |= self.graph.bit(prereq['id']) | self.graph.closure(prereq['id'])
         
-        # Sort by dependency order (challenges with no prerequisites first)
-        sorted_challenges = self._topological_sort(list(to_complete))
-        
-        for challenge_id in sorted_challenges:
-            challenge = Challenge.find_by_id(challenge_id)
-            if challenge:
-                learning_path.append({
-                    'id': challenge_id,
-                    'title': challenge.title,
-                    'module_id': challenge.module_id,
-                    'difficulty': challenge.difficulty,
-                    'estimated_duration': challenge.estimated_duration,
-                    'points': challenge.points
-                })
+        learning_path = []
+        for challenge_id in self.graph.ids(to_complete & ~completed):
+            node = self.graph.node(challenge_id)
+            learning_path.append({
+                'id': challenge_id,
+                'title': node['title'],
+                'module_id': node['module_id'],
+                'difficulty': node['difficulty'],
+                'estimated_duration': node['estimated_duration'],
+                'points': node['points']
+            })
         
         return learning_path
     
     def _topological_sort(self, challenge_ids):
-        """Sort challenges in dependency order using topological sort"""
-        # Build adjacency list
-        graph = {cid: [] for cid in challenge_ids}
-        in_degree = {cid: 0 for cid in challenge_ids}
-        
-        for challenge_id in challenge_ids:
-            challenge = Challenge.find_by_id(challenge_id)
-            if challenge and challenge.prerequisites:
-                for prereq_id in challenge.prerequisites:
-                    if prereq_id in graph:
-                        graph[prereq_id].append(challenge_id)
-                        in_degree[challenge_id] += 1
-        
-        # Kahn's algorithm
-        queue = [cid for cid in challenge_ids if in_degree[cid] == 0]
-        result = []
-        
-        while queue:
-            current = queue.pop(0)
-            result.append(current)
-            
-            for neighbor in graph[current]:
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    queue.append(neighbor)
-        
-        return result
+        """Sort challenges in dependency order"""
+        return self.graph.topological(challenge_ids)
     
+    @_current_graph
     def get_challenge_dependencies(self, challenge_id):
         """Get challenges that depend on this challenge"""
         dependencies = []
-        all_challenges = Challenge.get_all_challenges()
-        
-        for challenge in all_challenges:
-            if challenge.prerequisites and challenge_id in challenge.prerequisites:
+        for dependent_id in self.graph.dependents(challenge_id):
+            node = self.graph.node(dependent_id)
+            if node['is_active']:
                 dependencies.append({
-                    'id': challenge.id,
-                    'title': challenge.title,
-                    'module_id': challenge.module_id
+                    'id': dependent_id,
+                    'title': node['title'],
+                    'module_id': node['module_id']
                 })
         
+        dependencies.sort(key=lambda item: (item['module_id'] or '', item['id']))
         return dependencies
     
+    @_current_graph
     def validate_prerequisite_update(self, challenge_id, new_prerequisites):
         """Validate that updating prerequisites won't create circular dependencies"""
-        # Temporarily update prerequisites
-        challenge = Challenge.find_by_id(challenge_id)
-        if not challenge:
+        if not self.graph.node(challenge_id):
             return False, "Challenge not found"
         
-        original_prerequisites = challenge.prerequisites.copy()
-        challenge.prerequisites = new_prerequisites
-        
-        # Check for circular dependencies
-        is_valid, error = self.validate_prerequisite_chain(challenge_id)
+        unknown = [prereq_id for prereq_id in new_prerequisites if not self.graph.node(prereq_id)]
+        if unknown:
+            return False, f"Unknown prerequisites: {', '.join(map(str, unknown))}"
         
-        # Restore original prerequisites
-        challenge.prerequisites = original_prerequisites
+        # A new edge closes a cycle when the prerequisite already requires this challenge
+        cycle_edges = self.graph.cycle_edges(challenge_id, new_prerequisites)
+        if cycle_edges:
+            return False, f"Circular dependency: {', '.join(map(str, cycle_edges))} already require {challenge_id}"
         
-        return is_valid, error if not is_valid else None
+        return True, None
     
+    @_current_graph
     def get_prerequisite_statistics(self):
         """Get statistics about prerequisites across all challenges"""
-        all_challenges = Challenge.get_all_challenges()
+        all_challenges = self.graph.nodes()
         
         stats = {
             'total_challenges': len(all_challenges),
@@ -251,7 +274,7 @@ class PrerequisiteService:
         total_prerequisites = 0
         
         for challenge in all_challenges:
-            prereq_count = len(challenge.prerequisites) if challenge.prerequisites else 0
+            prereq_count = len(self.graph.prerequisites(challenge['id']))
             
             if prereq_count > 0:
                 stats['challenges_with_prerequisites'] += 1
@@ -263,10 +286,9 @@ class PrerequisiteService:
                     stats['prerequisite_distribution'][prereq_count] = 0
                 stats['prerequisite_distribution'][prereq_count] += 1
             
-            # Check for circular dependencies
-            is_valid, _ = self.validate_prerequisite_chain(challenge.id)
-            if not is_valid:
-                stats['circular_dependencies'].append(challenge.id)
+            # Challenges on a cycle (maintained by the graph)
+            if self.graph.in_cycle(challenge['id']):
+                stats['circular_dependencies'].append(challenge['id'])
         
         if stats['challenges_with_prerequisites'] > 0:
             stats['average_prerequisites'] = round(total_prerequisites / stats['challenges_with_prerequisites'], 2)
@@ -2,10 +2,12 @@
 Role-Based Access Control (RBAC) Service
 """
 
+import hashlib
 from enum import Enum
 from functools import wraps
 from flask import jsonify
 from services.auth_service import auth_service
+from services.ownership_index import ownership_index
 
 class Role(Enum):
     """User roles with hierarchy"""
@@ -59,11 +61,36 @@ class Permission(Enum):
     MANAGE_SYSTEM = "manage_system"
     VIEW_LOGS = "view_logs"
 
+# One bit per permission, looked up by enum member or value
+PERMISSION_BITS = {perm: 1 << n for n, perm in enumerate(Permission)}
+PERMISSION_BITS.update({perm.value: bit for perm, bit in list(PERMISSION_BITS.items())})
+
 class RBACService:
     """Role-Based Access Control Service"""
     
     def __init__(self):
         self.role_permissions = self._define_role_permissions()
+        self.version = self._permission_version()
+        self._compile()
+    
+    def _compile(self):
+        """Role -> permission bitmask (by enum member or value) and permission lists"""
+        self.role_masks = {}
+        self._permission_lists = {}
+        for role, perms in self.role_permissions.items():
+            mask = 0
+            for perm in perms:
+                mask |= PERMISSION_BITS[perm]
+            self.role_masks[role] = self.role_masks[role.value] = mask
+            self._permission_lists[role] = self._permission_lists[role.value] = [perm.value for perm in perms]
+    
+    def _permission_version(self):
+        """Short digest of the role permissions, carried in tokens as ``pv``"""
+        matrix = sorted(
+            (role.value, sorted(perm.value for perm in perms))
+            for role, perms in self.role_permissions.items()
+        )
+        return hashlib.sha256(repr(matrix).encode()).hexdigest()[:12]
     
     def _define_role_permissions(self):
         """Define permissions for each role"""
@@ -137,18 +164,16 @@ class RBACService:
     def has_permission(self, user_role, permission):
         """Check if a role has a specific permission"""
         try:
-            role_enum = Role(user_role)
-            permission_enum = Permission(permission) if isinstance(permission, str) else permission
-            return permission_enum in self.role_permissions.get(role_enum, set())
-        except ValueError:
+            return bool(self.role_masks.get(user_role, 0) & PERMISSION_BITS.get(permission, 0))
+        except TypeError:
+            # Unhashable role or permission
             return False
     
     def get_user_permissions(self, user_role):
         """Get all permissions for a user role"""
         try:
-            role_enum = Role(user_role)
-            return [perm.value for perm in self.role_permissions.get(role_enum, set())]
-        except ValueError:
+            return list(self._permission_lists.get(user_role, ()))
+        except TypeError:
             return []
     
     def can_access_user_data(self, current_user, target_user_id):
@@ -165,21 +190,41 @@ class RBACService:
         if current_user.role == "admin":
             return self.has_permission(current_user.role, Permission.VIEW_ALL_PROGRESS)
         
-        # Teachers can access student data but not admin data
+        # Teachers can access students in their classes or in no class, but not admin data
         if current_user.role == "teacher":
-            # Need to check if target user is a student
-            # For now, teachers can access data if they have the permission
-            # but we should add logic to prevent accessing admin data
-            from models.user import User
-            target_user = User.find_by_id(target_user_id)
-            if target_user and target_user.role == "admin":
-                return False  # Teachers cannot access admin data
+            role, class_id, class_teacher = ownership_index.user_scope(target_user_id)
+            if role == "admin":
+                return False
+            if role == "student" and class_id is not None and class_teacher != current_user.id:
+                return False  # Another teacher's student
             return self.has_permission(current_user.role, Permission.VIEW_STUDENT_PROGRESS)
         
         return False
     
+    def can_access_class(self, current_user, class_ref):
+        """Check if user may act on a class (admins: any class, teachers: their own).
+        
+        ``class_ref`` is a loaded ``Class`` (its ``teacher_id`` is compared
+        directly) or a class ID (looked up in the ownership index).
+        """
+        if not current_user:
+            return False
+        
+        if current_user.role == "admin":
+            return True
+        
+        if current_user.role == "teacher":
+            if isinstance(class_ref, int):
+                return ownership_index.teacher_of(class_ref) == current_user.id
+            return class_ref.teacher_id == current_user.id
+        
+        return False
+    
     def can_manage_class(self, current_user, class_id=None):
         """Check if user can manage a specific class"""
+        if not current_user:
+            return False
+        
         if current_user.role == "admin":
             return True
         
@@ -187,8 +232,8 @@ class RBACService:
             if class_id is None:
                 return self.has_permission(current_user.role, Permission.CREATE_CLASSES)
             
-            # Check if teacher owns this class (would need to query database)
-            return self.has_permission(current_user.role, Permission.EDIT_CLASSES)
+            return self.has_permission(current_user.role, Permission.EDIT_CLASSES) and \
+                self.can_access_class(current_user, class_id)
         
         return False
 
@@ -200,7 +245,7 @@ def require_permission(permission):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            current_user = auth_service.get_current_user()
+            current_user = auth_service.get_current_identity()
             if not current_user:
                 return jsonify({'error': 'Authentication required'}), 401
             
@@ -219,7 +264,7 @@ def require_any_permission(*permissions):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            current_user = auth_service.get_current_user()
+            current_user = auth_service.get_current_identity()
             if not current_user:
                 return jsonify({'error': 'Authentication required'}), 401
             
@@ -246,7 +291,7 @@ def require_role(*allowed_roles):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            current_user = auth_service.get_current_user()
+            current_user = auth_service.get_current_identity()
             if not current_user:
                 return jsonify({'error': 'Authentication required'}), 401
             
@@ -266,7 +311,7 @@ def require_own_resource_or_permission(resource_user_id_param, permission):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            current_user = auth_service.get_current_user()
+            current_user = auth_service.get_current_identity()
             if not current_user:
                 return jsonify({'error': 'Authentication required'}), 401
             
@@ -0,0 +1,181 @@
+"""
+Cache of verified token claims; revocations and token versions are shared between workers through the change log
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from database import get_conn, run_write
+from services.change_feed import change_feed
+
+TOKEN_CACHE_SIZE = int(os.environ.get("SKJ_TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.environ.get("SKJ_TOKEN_CACHE_TTL", "300"))  # seconds
+
+def token_digest(token):
+    """Cache key for a token (the token itself is never stored)"""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+def _revoke(conn, digest, expires_at, now):
+    """Write unit: record a revoked token and forget expired revocations"""
+    conn.execute("DELETE FROM revoked_tokens WHERE expires_ts <= ?", (int(now),))
+    conn.execute(
+        "INSERT OR REPLACE INTO revoked_tokens (digest, expires_ts) VALUES (?, ?)",
+        (digest, int(expires_at) + 1)
+    )
+
+class TokenCache:
+    """Bounded LRU of token digest -> decoded claims.
+
+    Claims never change for a given token, so caching them only saves the
+    signature check; entries live until ``ttl`` seconds pass or the token's
+    ``exp``. ``revoke`` stores the token digest in ``revoked_tokens``; a
+    trigger appends it to the shared change log, so every worker adds it to
+    its in-memory revocation set on its next ``change_feed`` poll and
+    ``is_revoked`` reads no rows while nobody logs out. ``token_version``
+    keeps ``users.token_version`` per user the same way: triggers log the
+    users whose version changed or who were deleted.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL, feed=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.feed = feed or change_feed
+        self._entries = OrderedDict()
+        self._revoked = None      # digest -> expires_ts, loaded on first use
+        self._versions = OrderedDict()   # user id -> users.token_version
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'revocations': 0
+        }
+        self.feed.subscribe('revoked', self._apply_revoked, self._reset_revoked)
+        self.feed.subscribe('user', self._apply_users, self._reset_users)
+
+    def get(self, token):
+        """Cached claims of a verified, unexpired token, or None"""
+        key = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return claims
+                del self._entries[key]
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, token, claims):
+        """Cache the claims of a verified token"""
+        expires_at = time.time() + self.ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, claims['exp'])
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _load_revoked(self, digests=None):
+        """digest -> expires_ts of unexpired revocations (all, or just ``digests``)"""
+        sql = "SELECT digest, expires_ts FROM revoked_tokens WHERE expires_ts > ?"
+        params = [int(time.time())]
+        if digests is not None:
+            sql += f" AND digest IN ({', '.join('?' * len(digests))})"
+            params += digests
+        with get_conn() as conn:
+            return dict(conn.execute(sql, params).fetchall())
+
+    def _apply_revoked(self, digests):
+        revoked = self._load_revoked(digests)
+        now = time.time()
+        with self._lock:
+            for digest in digests:
+                self._entries.pop(digest, None)
+            if self._revoked is not None:
+                for digest in [d for d, expires_ts in self._revoked.items() if expires_ts <= now]:
+                    del self._revoked[digest]
+                self._revoked.update(revoked)
+
+    def _reset_revoked(self):
+        with self._lock:
+            self._revoked = None
+
+    def is_revoked(self, token):
+        """Whether ``token`` was revoked (e.g. by logout) in any worker"""
+        self.feed.poll()
+        with self._lock:
+            revoked = self._revoked
+        if revoked is None:
+            seq = self.feed.seq
+            revoked = self._load_revoked()
+            with self._lock:
+                if self.feed.seq == seq:
+                    self._revoked = revoked
+        return token_digest(token) in revoked
+
+    def _apply_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+
+    def _reset_users(self):
+        with self._lock:
+            self._versions.clear()
+
+    def token_version(self, user_id):
+        """Stored ``token_version`` of ``user_id``, or None if the user does not exist"""
+        self.feed.poll()
+        with self._lock:
+            if user_id in self._versions:
+                self._versions.move_to_end(user_id)
+                return self._versions[user_id]
+        seq = self.feed.seq
+        with get_conn() as conn:
+            row = conn.execute("SELECT token_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            if self.feed.seq == seq:
+                self._versions[user_id] = row[0]
+                while len(self._versions) > self.max_size:
+                    self._versions.popitem(last=False)
+        return row[0]
+
+    def revoke(self, token, expires_at):
+        """Reject ``token`` in every worker until ``expires_at`` (epoch seconds)"""
+        key = token_digest(token)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._revoked is not None:
+                self._revoked[key] = int(expires_at) + 1
+            self._stats['revocations'] += 1
+        run_write(_revoke, key, expires_at, time.time())
+
+    def clear(self):
+        """Drop every cached token"""
+        with self._lock:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'revoked': len(self._revoked or ()),
+                'users': len(self._versions),
+                **self._stats
+            }
+
+# Global token cache instance
+token_cache = TokenCache()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Materialized statistics kept up to date by triggers.
+
+``class_stats`` holds per-class student count, completed challenges and
+total points, ``class_module_stats`` completed challenges per module. The
+triggers apply each progress upsert and each student joining or leaving a
+class as a delta, so reading a class's statistics is a primary key lookup.
+
+``user_stats`` holds each user's total points, completed count and the
+completed challenge IDs (a JSON array), ``user_module_stats`` completed
+challenges per module; they are updated in the same transaction as the
+progress write. Changing a challenge's module is not tracked; rebuild to
+repair.
+
+Usage:
+    python stats.py rebuild
+"""
+
+import argparse
+import sys
+
+CLASS_STATS_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS class_stats (
+        class_id INTEGER PRIMARY KEY,
+        student_count INTEGER NOT NULL DEFAULT 0,
+        completed_challenges INTEGER NOT NULL DEFAULT 0,
+        total_points INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS class_module_stats (
+        class_id INTEGER NOT NULL,
+        module_id TEXT NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (class_id, module_id)
+    ) WITHOUT ROWID
+    """,
+]
+
+def _add_progress(row):
+    """Statements adding progress ``row`` (NEW/OLD) to its user's class"""
+    return f"""
+        INSERT INTO class_stats (class_id, completed_challenges, total_points)
+        SELECT class_id, {row}.status = 'completed', {row}.points FROM users
+        WHERE id = {row}.user_id AND class_id IS NOT NULL
+        ON CONFLICT(class_id) DO UPDATE SET
+            completed_challenges = completed_challenges + excluded.completed_challenges,
+            total_points = total_points + excluded.total_points;
+        INSERT INTO class_module_stats (class_id, module_id, completed)
+        SELECT u.class_id, c.module_id, 1 FROM users u JOIN challenges c ON c.id = {row}.challenge_id
+        WHERE u.id = {row}.user_id AND u.class_id IS NOT NULL AND {row}.status = 'completed'
+        ON CONFLICT(class_id, module_id) DO UPDATE SET completed = completed + 1;
+    """
+
+def _remove_progress(row):
+    """Statements removing progress ``row`` from its user's class"""
+    return f"""
+        UPDATE class_stats SET
+            completed_challenges = completed_challenges - ({row}.status = 'completed'),
+            total_points = total_points - {row}.points
+        WHERE class_id = (SELECT class_id FROM users WHERE id = {row}.user_id);
+        UPDATE class_module_stats SET completed = completed - 1
+        WHERE {row}.status = 'completed'
+          AND class_id = (SELECT class_id FROM users WHERE id = {row}.user_id)
+          AND module_id = (SELECT module_id FROM challenges WHERE id = {row}.challenge_id);
+    """
+
+def _add_member(row):
+    """Statements adding user ``row`` and all of their progress to their class"""
+    return f"""
+        INSERT INTO class_stats (class_id, student_count, completed_challenges, total_points)
+        SELECT {row}.class_id, {row}.role = 'student',
+               (SELECT COUNT(*) FROM progress WHERE user_id = {row}.id AND status = 'completed'),
+               (SELECT COALESCE(SUM(points), 0) FROM progress WHERE user_id = {row}.id)
+        WHERE {row}.class_id IS NOT NULL
+        ON CONFLICT(class_id) DO UPDATE SET
+            student_count = student_count + excluded.student_count,
+            completed_challenges = completed_challenges + excluded.completed_challenges,
+            total_points = total_points + excluded.total_points;
+        INSERT INTO class_module_stats (class_id, module_id, completed)
+        SELECT {row}.class_id, c.module_id, COUNT(*) FROM progress p JOIN challenges c ON c.id = p.challenge_id
+        WHERE {row}.class_id IS NOT NULL AND p.user_id = {row}.id AND p.status = 'completed'
+        GROUP BY c.module_id
+        ON CONFLICT(class_id, module_id) DO UPDATE SET completed = completed + excluded.completed;
+    """
+
+def _remove_member(row):
+    """Statements removing user ``row`` and all of their progress from their class"""
+    return f"""
+        UPDATE class_stats SET
+            student_count = student_count - ({row}.role = 'student'),
+            completed_challenges = completed_challenges
+                - (SELECT COUNT(*) FROM progress WHERE user_id = {row}.id AND status = 'completed'),
+            total_points = total_points - (SELECT COALESCE(SUM(points), 0) FROM progress WHERE user_id = {row}.id)
+        WHERE class_id = {row}.class_id;
+        UPDATE class_module_stats SET completed = completed - (
+            SELECT COUNT(*) FROM progress p JOIN challenges c ON c.id = p.challenge_id
+            WHERE p.user_id = {row}.id AND p.status = 'completed' AND c.module_id = class_module_stats.module_id
+        )
+        WHERE class_id = {row}.class_id;
+    """
+
+# trigger name -> (trigger event, body)
+CLASS_STATS_TRIGGERS = {
+    "trg_class_stats_progress_insert": (
+        "AFTER INSERT ON progress",
+        _add_progress("NEW")
+    ),
+    "trg_class_stats_progress_update": (
+        "AFTER UPDATE OF user_id, challenge_id, status, points ON progress "
+        "WHEN OLD.user_id IS NOT NEW.user_id OR OLD.challenge_id IS NOT NEW.challenge_id "
+        "OR OLD.status IS NOT NEW.status OR OLD.points IS NOT NEW.points",
+        _remove_progress("OLD") + _add_progress("NEW")
+    ),
+    "trg_class_stats_progress_delete": (
+        "AFTER DELETE ON progress",
+        _remove_progress("OLD")
+    ),
+    "trg_class_stats_user_insert": (
+        "AFTER INSERT ON users WHEN NEW.class_id IS NOT NULL",
+        _add_member("NEW")
+    ),
+    "trg_class_stats_user_update": (
+        "AFTER UPDATE OF class_id, role ON users "
+        "WHEN OLD.class_id IS NOT NEW.class_id OR OLD.role IS NOT NEW.role",
+        _remove_member("OLD") + _add_member("NEW")
+    ),
+    "trg_class_stats_user_delete": (
+        "AFTER DELETE ON users WHEN OLD.class_id IS NOT NULL",
+        _remove_member("OLD")
+    ),
+    "trg_class_stats_class_delete": (
+        "AFTER DELETE ON classes",
+        """
+        DELETE FROM class_stats WHERE class_id = OLD.id;
+        DELETE FROM class_module_stats WHERE class_id = OLD.id;
+        """
+    ),
+}
+
+USER_STATS_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_points INTEGER NOT NULL DEFAULT 0,
+        completed_count INTEGER NOT NULL DEFAULT 0,
+        completed TEXT NOT NULL DEFAULT '[]'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_module_stats (
+        user_id INTEGER NOT NULL,
+        module_id TEXT NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, module_id)
+    ) WITHOUT ROWID
+    """,
+]
+
+def _add_user_progress(row):
+    """Statements adding progress ``row`` to its user's statistics"""
+    return f"""
+        INSERT INTO user_stats (user_id, total_points, completed_count, completed)
+        VALUES ({row}.user_id, {row}.points, {row}.status = 'completed',
+                CASE WHEN {row}.status = 'completed' THEN json_array({row}.challenge_id) ELSE '[]' END)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total_points = total_points + excluded.total_points,
+            completed_count = completed_count + excluded.completed_count,
+            completed = CASE WHEN excluded.completed_count
+                             THEN json_insert(completed, '$[#]', {row}.challenge_id) ELSE completed END;
+        INSERT INTO user_module_stats (user_id, module_id, completed)
+        SELECT {row}.user_id, module_id, 1 FROM challenges
+        WHERE id = {row}.challenge_id AND {row}.status = 'completed'
+        ON CONFLICT(user_id, module_id) DO UPDATE SET completed = completed + 1;
+    """
+
+def _remove_user_progress(row):
+    """Statements removing progress ``row`` from its user's statistics"""
+    return f"""
+        UPDATE user_stats SET
+            total_points = total_points - {row}.points,
+            completed_count = completed_count - ({row}.status = 'completed'),
+            completed = CASE WHEN {row}.status = 'completed'
+                             THEN (SELECT json_group_array(value) FROM json_each(user_stats.completed)
+                                   WHERE value IS NOT {row}.challenge_id)
+                             ELSE completed END
+        WHERE user_id = {row}.user_id;
+        UPDATE user_module_stats SET completed = completed - 1
+        WHERE {row}.status = 'completed' AND user_id = {row}.user_id
+          AND module_id = (SELECT module_id FROM challenges WHERE id = {row}.challenge_id);
+    """
+
+# trigger name -> (trigger event, body)
+USER_STATS_TRIGGERS = {
+    "trg_user_stats_progress_insert": (
+        "AFTER INSERT ON progress",
+        _add_user_progress("NEW")
+    ),
+    "trg_user_stats_progress_update": (
+        "AFTER UPDATE OF user_id, challenge_id, status, points ON progress "
+        "WHEN OLD.user_id IS NOT NEW.user_id OR OLD.challenge_id IS NOT NEW.challenge_id "
+        "OR OLD.status IS NOT NEW.status OR OLD.points IS NOT NEW.points",
+        _remove_user_progress("OLD") + _add_user_progress("NEW")
+    ),
+    "trg_user_stats_progress_delete": (
+        "AFTER DELETE ON progress",
+        _remove_user_progress("OLD")
+    ),
+    "trg_user_stats_user_delete": (
+        "AFTER DELETE ON users",
+        """
+        DELETE FROM user_stats WHERE user_id = OLD.id;
+        DELETE FROM user_module_stats WHERE user_id = OLD.id;
+        """
+    ),
+}
+
+def create_class_stats(conn):
+    """Create the class statistics tables and their triggers"""
+    for sql in CLASS_STATS_TABLES:
+        conn.execute(sql)
+    for name, (event, body) in CLASS_STATS_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+def rebuild_class_stats(conn):
+    """Recompute class statistics from users and progress; returns the number of classes"""
+    conn.execute("DELETE FROM class_stats")
+    conn.execute("DELETE FROM class_module_stats")
+    conn.execute("""
+        INSERT INTO class_stats (class_id, student_count)
+        SELECT class_id, SUM(role = 'student') FROM users
+        WHERE class_id IS NOT NULL
+        GROUP BY class_id
+    """)
+    conn.execute("""
+        INSERT INTO class_stats (class_id, completed_challenges, total_points)
+        SELECT u.class_id, SUM(p.status = 'completed'), SUM(p.points)
+        FROM progress p JOIN users u ON u.id = p.user_id
+        WHERE u.class_id IS NOT NULL
+        GROUP BY u.class_id
+        ON CONFLICT(class_id) DO UPDATE SET
+            completed_challenges = excluded.completed_challenges,
+            total_points = excluded.total_points
+    """)
+    conn.execute("""
+        INSERT INTO class_module_stats (class_id, module_id, completed)
+        SELECT u.class_id, c.module_id, COUNT(*)
+        FROM progress p
+        JOIN users u ON u.id = p.user_id
+        JOIN challenges c ON c.id = p.challenge_id
+        WHERE u.class_id IS NOT NULL AND p.status = 'completed'
+        GROUP BY u.class_id, c.module_id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM class_stats").fetchone()[0]
+
+def create_user_stats(conn):
+    """Create the user statistics tables and their triggers"""
+    for sql in USER_STATS_TABLES:
+        conn.execute(sql)
+    for name, (event, body) in USER_STATS_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+def rebuild_user_stats(conn):
+    """Recompute user statistics from progress; returns the number of users"""
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("DELETE FROM user_module_stats")
+    conn.execute("""
+        INSERT INTO user_stats (user_id, total_points, completed_count, completed)
+        SELECT user_id, SUM(points), SUM(status = 'completed'),
+               COALESCE(json_group_array(challenge_id) FILTER (WHERE status = 'completed'), '[]')
+        FROM (SELECT * FROM progress ORDER BY id)
+        GROUP BY user_id
+    """)
+    conn.execute("""
+        INSERT INTO user_module_stats (user_id, module_id, completed)
+        SELECT p.user_id, c.module_id, COUNT(*)
+        FROM progress p JOIN challenges c ON c.id = p.challenge_id
+        WHERE p.status = 'completed'
+        GROUP BY p.user_id, c.module_id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain materialized statistics")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+
+    from database import run_write, setup_database
+    setup_database()
+    classes = run_write(rebuild_class_stats)
+    users = run_write(rebuild_user_stats)
+    print(f"Rebuilt statistics for {classes} classes and {users} users")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for write-behind last_active updates
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, get_writer_stats, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from services.activity_service import activity_buffer, ActivityBuffer
+from app import app
+
+def _stored_last_active(user_id):
+    with get_conn() as conn:
+        return conn.execute("SELECT last_active FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+def test_activity_buffer():
+    """Test buffering, read merging and batched flushes of last_active"""
+    print("Testing Activity Buffer...")
+
+    setup_database()
+    seed_if_empty()
+
+    users = [
+        User.find_by_name(f"activity_user_{n}") or User.create_user(f"activity_user_{n}", f"activity_user_{n}@test.com", "pass")
+        for n in range(5)
+    ]
+    activity_buffer.flush()
+
+    # Test 1: Authenticated GETs do not write
+    print("\n1. Testing write-free requests...")
+    client = app.test_client()
+    submitted = get_writer_stats()['submitted']
+    for user in users:
+        headers = {"Authorization": f"Bearer {auth_service.generate_token(user)}"}
+        for _ in range(4):
+            response = client.get("/api/auth/me", headers=headers)
+    if response.status_code == 200 and get_writer_stats()['submitted'] == submitted:
+        print(f"   ✓ {len(users) * 4} authenticated requests, no write units")
+    else:
+        print(f"   ✗ Writes during GETs: {get_writer_stats()['submitted'] - submitted}")
+        return False
+
+    # Test 2: Reads merge the buffered value
+    print("\n2. Testing read merging...")
+    buffered = activity_buffer.merge(users[0].id, None)
+    reloaded = User.find_by_id(users[0].id)
+    listed = next(u for u in User.get_all_user_dicts() if u['id'] == users[0].id)
+    if buffered and reloaded.last_active == buffered and listed['last_active'] == buffered and response.get_json()['user']['last_active']:
+        print(f"   ✓ Buffered activity visible before the flush ({buffered})")
+    else:
+        print(f"   ✗ Buffered value not merged: {reloaded.last_active} vs {buffered}")
+        return False
+
+    # Test 3: One batched write per flush
+    print("\n3. Testing batched flush...")
+    submitted = get_writer_stats()['submitted']
+    flushed = activity_buffer.flush()
+    stored = [_stored_last_active(user.id) for user in users]
+    if flushed >= len(users) and get_writer_stats()['submitted'] == submitted + 1 and stored[0] == buffered:
+        print(f"   ✓ {flushed} users written in one unit")
+    else:
+        print(f"   ✗ Unexpected flush: {flushed} users, {get_writer_stats()['submitted'] - submitted} units")
+        return False
+
+    # Test 4: Older activity never overwrites newer values
+    print("\n4. Testing ordering...")
+    activity_buffer.record(users[1].id, "2000-01-01T00:00:00")
+    activity_buffer.flush()
+    if _stored_last_active(users[1].id) == stored[1]:
+        print("   ✓ Stale activity ignored")
+    else:
+        print("   ✗ last_active moved backwards")
+        return False
+
+    # Test 5: The background thread flushes on its own
+    print("\n5. Testing periodic flush...")
+    buffer = ActivityBuffer(interval=0.05)
+    last_active = buffer.record(users[2].id)
+    for _ in range(100):
+        if _stored_last_active(users[2].id) == last_active:
+            break
+        time.sleep(0.02)
+    buffer.shutdown()
+    if _stored_last_active(users[2].id) == last_active and buffer.stats()['pending'] == 0:
+        print("   ✓ Flushed by the background thread")
+    else:
+        print("   ✗ Background flush did not run")
+        return False
+
+    print("\n✅ Activity buffer test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_activity_buffer()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for online database backups
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import (
+    get_conn, run_write, create_backup, start_backup, list_backups, get_backup_status,
+    BackupInProgress, setup_database, seed_if_empty
+)
+from models.user import User
+from services.auth_service import auth_service
+from app import app
+
+def _insert_rows(conn, start, count):
+    conn.executemany(
+        "INSERT INTO detailed_progress (user_id, challenge_id, action, payload, created_at) VALUES (?, 'c1', 'backup_test', ?, '2024-01-01T00:00:00')",
+        [(1, f"payload {i}" * 20) for i in range(start, start + count)]
+    )
+
+def test_backup():
+    """Test verified, rotating online backups"""
+    print("Testing Online Backups...")
+
+    setup_database()
+    seed_if_empty()
+    run_write(_insert_rows, 0, 3000)
+
+    with tempfile.TemporaryDirectory() as backup_dir:
+        # Test 1: Backup is created and verified
+        print("\n1. Testing backup creation...")
+        backup = create_backup(backup_dir, pages=16, sleep=0)
+        copy = sqlite3.connect(backup['path'])
+        modules = copy.execute("SELECT COUNT(*) FROM modules").fetchone()[0]
+        integrity = copy.execute("PRAGMA integrity_check").fetchone()[0]
+        copy.close()
+        if modules == 12 and integrity == "ok" and not backup['name'].endswith(".part"):
+            print(f"   ✓ Created {backup['name']} ({backup['size']} bytes)")
+        else:
+            print(f"   ✗ Backup incomplete: modules={modules}, integrity={integrity}")
+            return False
+
+        # Test 2: Writers keep committing while a backup runs
+        print("\n2. Testing writes during backup...")
+        latencies = []
+        stop = threading.Event()
+
+        def writer():
+            offset = 10000
+            while not stop.is_set():
+                start = time.perf_counter()
+                run_write(_insert_rows, offset, 5)
+                latencies.append(time.perf_counter() - start)
+                offset += 5
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(0.05)
+        backup = create_backup(backup_dir, pages=4, sleep=0.005)
+        stop.set()
+        thread.join()
+
+        if latencies and max(latencies) < 1.0 and get_backup_status()['error'] is None:
+            print(f"   ✓ {len(latencies)} writes during backup, slowest {max(latencies) * 1000:.1f} ms")
+        else:
+            print(f"   ✗ Writes stalled during backup: {len(latencies)} writes")
+            return False
+
+        # Test 3: Old snapshots are rotated
+        print("\n3. Testing rotation...")
+        for _ in range(3):
+            create_backup(backup_dir, sleep=0, keep=2)
+        backups = list_backups(backup_dir)
+        if len(backups) == 2 and backups[0]['name'] > backups[1]['name']:
+            print(f"   ✓ Kept newest {len(backups)} snapshots")
+        else:
+            print(f"   ✗ Unexpected snapshots: {[b['name'] for b in backups]}")
+            return False
+
+        # Test 4: Only one backup runs at a time
+        print("\n4. Testing concurrent backup guard...")
+        thread = start_backup(backup_dir, pages=1, sleep=0.01, keep=2)
+        try:
+            create_backup(backup_dir)
+            print("   ✗ Second backup was allowed")
+            return False
+        except BackupInProgress:
+            print("   ✓ Second backup rejected while one is running")
+        thread.join()
+
+    # Test 5: Admin endpoints
+    print("\n5. Testing admin endpoints...")
+    with tempfile.TemporaryDirectory() as backup_dir:
+        default_dir = database.BACKUP_DIR
+        database.BACKUP_DIR = backup_dir
+        try:
+            admin = User.find_by_name("backup_admin") or User.create_user("backup_admin", "backup_admin@test.com", "pass", "admin")
+            student = User.find_by_name("backup_student") or User.create_user("backup_student", "backup_student@test.com", "pass", "student")
+            client = app.test_client()
+            headers = {"Authorization": f"Bearer {auth_service.generate_token(admin)}"}
+
+            response = client.post("/api/admin/backups", headers=headers)
+            if response.status_code != 202:
+                print(f"   ✗ Backup not started: {response.status_code}")
+                return False
+            for _ in range(200):
+                if not get_backup_status()['running']:
+                    break
+                time.sleep(0.05)
+
+            response = client.get("/api/admin/backups", headers=headers)
+            data = response.get_json()
+            if response.status_code == 200 and len(data['backups']) == 1 and data['status']['error'] is None:
+                print(f"   ✓ Endpoint lists {data['backups'][0]['name']}")
+            else:
+                print(f"   ✗ Unexpected listing: {response.status_code} {data}")
+                return False
+
+            student_headers = {"Authorization": f"Bearer {auth_service.generate_token(student)}"}
+            if client.post("/api/admin/backups", headers=student_headers).status_code == 403:
+                print("   ✓ Students cannot trigger backups")
+            else:
+                print("   ✗ Student was allowed to trigger a backup")
+                return False
+        finally:
+            database.BACKUP_DIR = default_dir
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM detailed_progress WHERE action = 'backup_test'")
+        conn.commit()
+
+    print("\n✅ Online backup test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_backup()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for claims-based authorization in the RBAC decorators
+"""
+
+import sys
+import os
+import jwt
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, track_queries, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from services.rbac_service import rbac_service
+from app import app
+
+def _headers(token):
+    return {"Authorization": f"Bearer {token}"}
+
+def test_claims_auth():
+    """Test that permission checks use token claims and fall back to the database when stale"""
+    print("Testing Claims-Based Authorization...")
+
+    setup_database()
+    seed_if_empty()
+
+    admin = User.find_by_name("claims_admin") or User.create_user("claims_admin", "claims_admin@test.com", "pass", "admin")
+    student = User.find_by_name("claims_student") or User.create_user("claims_student", "claims_student@test.com", "pass", "student")
+    admin_token = auth_service.generate_token(admin)
+    student_token = auth_service.generate_token(student)
+    client = app.test_client()
+
+    # Test 1: Token carries role, class and permission version
+    print("\n1. Testing token claims...")
+    claims = auth_service.verify_token(student_token)
+    if claims['role'] == "student" and 'class_id' in claims and claims['pv'] == rbac_service.version \
+            and claims['tv'] == User.find_by_id(student.id).token_version:
+        print(f"   ✓ Claims: role={claims['role']}, class_id={claims['class_id']}, pv={claims['pv']}, tv={claims['tv']}")
+    else:
+        print(f"   ✗ Missing claims: {claims}")
+        return False
+
+    # Test 2: Permission checks from claims plus the token version kept in memory
+    print("\n2. Testing claims-only authorization...")
+    for token in (admin_token, student_token):
+        client.get("/api/admin/system/stats", headers=_headers(token))
+    with track_queries() as log:
+        allowed = client.get("/api/admin/system/stats", headers=_headers(admin_token))
+        denied = client.get("/api/admin/system/stats", headers=_headers(student_token))
+    if allowed.status_code == 200 and denied.status_code == 403 and log.count == 2 \
+            and not any("users" in record.sql for record in log.records):
+        print("   ✓ Allowed and denied with only the change log poll each")
+    else:
+        print(f"   ✗ Unexpected: {allowed.status_code} {denied.status_code}, {log.count} queries")
+        return False
+
+    # Test 3: The user is loaded only when the endpoint touches it
+    print("\n3. Testing lazy user...")
+    renamed = User.find_by_id(student.id)
+    renamed.name = "claims_student_renamed"
+    renamed.save()
+    data = client.get("/api/dashboard/student", headers=_headers(student_token)).get_json()
+    if data['user']['name'] == "claims_student_renamed" and data['user']['email'] == "claims_student@test.com":
+        print("   ✓ Full user loaded for the dashboard, name not taken from the token")
+    else:
+        print(f"   ✗ Unexpected user: {data.get('user')}")
+        return False
+
+    # Test 4: Role changes after issue fall back to the stored user
+    print("\n4. Testing stale claims...")
+    user = User.find_by_id(admin.id)
+    user.role = "student"
+    user.save()
+    demoted = client.get("/api/admin/system/stats", headers=_headers(admin_token))
+    user.role = "admin"
+    user.save()
+    old = jwt.encode(dict(auth_service.verify_token(student_token), pv="old"), auth_service.secret_key,
+                     algorithm=auth_service.algorithm)
+    with track_queries() as log:
+        outdated = client.get("/api/admin/system/stats", headers=_headers(old))
+    if demoted.status_code == 403 and outdated.status_code == 403 and log.count == 2:
+        print("   ✓ Demoted admin rejected, old permission version re-checked")
+    else:
+        print(f"   ✗ Unexpected: {demoted.status_code} {outdated.status_code}, {log.count} queries")
+        return False
+
+    # Test 5: Changes written by another worker process
+    print("\n5. Testing changes from another worker...")
+    admin_token = auth_service.generate_token(User.find_by_id(admin.id))
+    client.get("/api/admin/system/stats", headers=_headers(admin_token))
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET role = 'student' WHERE id = ?", (admin.id,))
+        conn.commit()
+    demoted = client.get("/api/admin/system/stats", headers=_headers(admin_token))
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET role = 'admin' WHERE id = ?", (admin.id,))
+        conn.commit()
+    restored = client.get("/api/admin/system/stats", headers=_headers(admin_token))
+    doomed = User.create_user("claims_doomed", "claims_doomed@test.com", "pass", "admin")
+    doomed_token = auth_service.generate_token(doomed)
+    client.get("/api/admin/system/stats", headers=_headers(doomed_token))
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (doomed.id,))
+        conn.commit()
+    deleted = client.get("/api/admin/system/stats", headers=_headers(doomed_token))
+    if demoted.status_code == 403 and restored.status_code == 200 and deleted.status_code == 401:
+        print("   ✓ Demoted admin rejected, deleted admin unauthenticated despite cached claims")
+    else:
+        print(f"   ✗ Unexpected: {demoted.status_code} {restored.status_code} {deleted.status_code}")
+        return False
+
+    # Test 6: Progress upsert takes the user from the same token
+    print("\n6. Testing progress with token...")
+    with get_conn() as conn:
+        challenge_id = conn.execute("SELECT id FROM challenges LIMIT 1").fetchone()[0]
+    response = client.post("/api/progress", json={"challenge_id": challenge_id, "status": "started"},
+                           headers=_headers(student_token))
+    anonymous = client.get("/api/admin/system/stats", headers=_headers("not-a-token"))
+    with get_conn() as conn:
+        row = conn.execute("SELECT status FROM progress WHERE user_id = ? AND challenge_id = ?",
+                           (student.id, challenge_id)).fetchone()
+    if response.status_code == 200 and row and anonymous.status_code == 401:
+        print("   ✓ Progress stored for the token's user, invalid token rejected")
+    else:
+        print(f"   ✗ Unexpected: {response.status_code} {anonymous.status_code}, row={row}")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE user_id IN (SELECT id FROM users WHERE name LIKE 'claims_%')")
+        conn.execute("DELETE FROM users WHERE name LIKE 'claims_%'")
+        conn.commit()
+
+    print("\n✅ Claims authorization test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_claims_auth()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk class enrollment and removal
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from services.auth_service import auth_service
+from app import app
+
+def test_class_bulk_enroll():
+    """Test bulk roster changes, capacity and per-student results"""
+    print("Testing Bulk Class Enrollment...")
+
+    setup_database()
+    seed_if_empty()
+
+    teacher = User.find_by_name("bulk_teacher") or User.create_user("bulk_teacher", "bulk_teacher@test.com", "pass", "teacher")
+    other = User.find_by_name("bulk_other_teacher") or User.create_user("bulk_other_teacher", "bulk_other_teacher@test.com", "pass", "teacher")
+    class_obj = Class.create_class("Bulk Class", teacher.id, 1, max_students=5)
+    other_class = Class.create_class("Bulk Other Class", other.id, 1)
+    students = [
+        User.find_by_name(f"bulk_student_{n}") or User.create_user(f"bulk_student_{n}", f"bulk_student_{n}@test.com", "pass", "student")
+        for n in range(8)
+    ]
+    other_class.add_student(students[7].id)
+
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(teacher)}"}
+    url = f"/api/classes/{class_obj.id}/students/bulk"
+
+    # Test 1: Capacity is enforced in input order
+    print("\n1. Testing enrollment up to capacity...")
+    ids = [s.id for s in students[:7]] + [students[7].id, teacher.id, 999999, students[0].id]
+    with track_queries() as log:
+        response = client.post(url, json={"student_ids": ids}, headers=headers)
+    data = response.get_json()
+    statuses = {r['student_id']: r['status'] for r in data['results']}
+    expected = {s.id: 'enrolled' for s in students[:5]}
+    expected.update({students[5].id: 'class_full', students[6].id: 'class_full',
+                     students[7].id: 'in_other_class', teacher.id: 'not_student', 999999: 'not_found'})
+    if response.status_code == 200 and statuses == expected and data['enrolled'] == 5 and len(data['results']) == 10:
+        print(f"   ✓ {data['enrolled']} enrolled, {data['skipped']} skipped ({data['counts']}) in {log.count} queries")
+    else:
+        print(f"   ✗ Unexpected result: {response.status_code} {data}")
+        return False
+
+    # Test 2: Re-enrolling reports already enrolled
+    print("\n2. Testing idempotence...")
+    data = client.post(url, json={"student_ids": [students[0].id]}, headers=headers).get_json()
+    if data['results'] == [{"student_id": students[0].id, "status": "already_enrolled"}]:
+        print("   ✓ Existing members reported as already_enrolled")
+    else:
+        print(f"   ✗ Unexpected result: {data}")
+        return False
+
+    # Test 3: Bulk removal
+    print("\n3. Testing bulk removal...")
+    response = client.post(f"/api/classes/{class_obj.id}/students/bulk-remove",
+                           json={"student_ids": [students[0].id, students[1].id, students[7].id]}, headers=headers)
+    data = response.get_json()
+    if response.status_code == 200 and data['removed'] == 2 and data['results'][2]['status'] == 'not_enrolled' \
+            and class_obj.get_student_count() == 3 and User.find_by_id(students[7].id).class_id == other_class.id:
+        print("   ✓ Members removed, other classes untouched")
+    else:
+        print(f"   ✗ Unexpected result: {response.status_code} {data}")
+        return False
+
+    # Test 4: Freed seats can be refilled
+    print("\n4. Testing refill...")
+    data = client.post(url, json={"student_ids": [s.id for s in students[5:7]]}, headers=headers).get_json()
+    if data['enrolled'] == 2 and class_obj.get_student_count() == 5:
+        print("   ✓ Freed seats refilled")
+    else:
+        print(f"   ✗ Unexpected result: {data}")
+        return False
+
+    # Test 5: Validation and ownership
+    print("\n5. Testing validation...")
+    bad = [
+        client.post(url, json={"student_ids": "1,2"}, headers=headers).status_code,
+        client.post(url, json={"student_ids": []}, headers=headers).status_code,
+        client.post(url, json={"student_ids": list(range(1, 1002))}, headers=headers).status_code,
+        client.post(f"/api/classes/{other_class.id}/students/bulk", json={"student_ids": [students[0].id]}, headers=headers).status_code,
+    ]
+    if bad == [400, 400, 400, 403]:
+        print("   ✓ Invalid requests rejected")
+    else:
+        print(f"   ✗ Unexpected status codes: {bad}")
+        return False
+
+    # Test 6: Single enrollment follows the same policy
+    print("\n6. Testing single enrollment policy...")
+    single = client.post(f"/api/classes/{class_obj.id}/students", json={"student_id": students[7].id}, headers=headers)
+    try:
+        class_obj.add_student(students[7].id)
+        moved = True
+    except ValueError:
+        moved = False
+    if single.status_code == 400 and single.get_json()['status'] == 'in_other_class' and not moved \
+            and User.find_by_id(students[7].id).class_id == other_class.id:
+        print("   ✓ Student in another class rejected by endpoint and model")
+    else:
+        print(f"   ✗ Unexpected: {single.status_code} {single.get_json()}, moved={moved}")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE name LIKE 'bulk_%'")
+        conn.execute("DELETE FROM classes WHERE name LIKE 'Bulk %'")
+        conn.commit()
+
+    print("\n✅ Bulk enrollment test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_class_bulk_enroll()
+    sys.exit(0 if success else 1)
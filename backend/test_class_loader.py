@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for batched relationship loading in Class.to_dicts
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+
+def _add_progress(conn, user_id, challenge_id, status, points):
+    conn.execute(
+        "INSERT INTO progress (user_id, challenge_id, status, points, updated_at) VALUES (?, ?, ?, ?, '2024-01-01T00:00:00')",
+        (user_id, challenge_id, status, points)
+    )
+
+def _legacy_dict(class_obj):
+    """What to_dict() returned when each relation was loaded per class"""
+    teacher = class_obj.get_teacher()
+    return {
+        'student_count': class_obj.get_student_count(),
+        'students': [student.to_dict() for student in class_obj.get_students()],
+        'teacher': {'id': teacher.id, 'name': teacher.name, 'email': teacher.email},
+    }
+
+def test_class_loader():
+    """Test that serializing many classes costs a constant number of queries"""
+    print("Testing Class Loader...")
+
+    setup_database()
+    seed_if_empty()
+
+    teachers = [
+        User.find_by_name(f"loader_teacher_{t}") or User.create_user(f"loader_teacher_{t}", f"loader_teacher_{t}@test.com", "pass", "teacher")
+        for t in range(3)
+    ]
+    classes = []
+    for n in range(20):
+        class_obj = Class.create_class(f"Loader Class {n}", teachers[n % 3].id, 1)
+        for s in range(n % 4):
+            student = User.create_user(f"loader_student_{n}_{s}", f"loader_student_{n}_{s}@test.com", "pass", "student")
+            class_obj.add_student(student.id)
+            run_write(_add_progress, student.id, "c1", "completed" if s % 2 == 0 else "in_progress", 10 * (s + 1))
+        classes.append(class_obj)
+
+    # Test 1: Same output as loading each relation per class
+    print("\n1. Testing batched output...")
+    batched = Class.to_dicts(classes, include_students=True, include_progress=True)
+    for class_obj, data in zip(classes, batched):
+        expected = _legacy_dict(class_obj)
+        if {key: data[key] for key in expected} != expected or data['progress'] != class_obj.get_class_progress():
+            print(f"   ✗ Class {class_obj.id} differs from the per-class load")
+            return False
+    totals = [data['progress']['total_points'] for data in batched]
+    print(f"   ✓ {len(batched)} classes match per-class loading (points {min(totals)}..{max(totals)})")
+
+    # Test 2: Query count does not grow with the number of classes
+    print("\n2. Testing query count...")
+    counts = []
+    for size in (2, 20):
+        with track_queries() as log:
+            Class.to_dicts(classes[:size], include_students=True, include_progress=True)
+        counts.append(log.count)
+    if counts[0] == counts[1] <= 4:
+        print(f"   ✓ {counts[1]} queries for 2 or 20 classes")
+    else:
+        print(f"   ✗ Query count grows with classes: {counts}")
+        return False
+
+    # Test 3: Relations are only loaded when needed
+    print("\n3. Testing lazy relations...")
+    with track_queries() as log:
+        Class.to_dicts(classes)
+    if log.count == 2:
+        print("   ✓ Counts and teachers only without students/progress")
+    else:
+        print(f"   ✗ Unexpected {log.count} queries")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE user_id IN (SELECT id FROM users WHERE name LIKE 'loader_student_%')")
+        conn.execute("DELETE FROM users WHERE name LIKE 'loader_student_%'")
+        conn.execute("DELETE FROM classes WHERE name LIKE 'Loader Class %'")
+        conn.commit()
+
+    print("\n✅ Class loader test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_class_loader()
+    sys.exit(0 if success else 1)
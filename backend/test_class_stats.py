@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for trigger-maintained class statistics
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from stats import rebuild_class_stats, main as stats_main
+from app import _write_progress
+
+def _snapshot():
+    """Non-empty class statistics rows"""
+    with get_conn() as conn:
+        classes = {
+            row[0]: tuple(row[1:]) for row in conn.execute(
+                "SELECT class_id, student_count, completed_challenges, total_points FROM class_stats"
+            ) if any(row[1:])
+        }
+        modules = {
+            (row[0], row[1]): row[2] for row in conn.execute(
+                "SELECT class_id, module_id, completed FROM class_module_stats WHERE completed != 0"
+            )
+        }
+    return classes, modules
+
+def test_class_stats():
+    """Test incremental class statistics against a full rebuild"""
+    print("Testing Class Statistics...")
+
+    setup_database()
+    seed_if_empty()
+
+    rng = random.Random(15)
+    teacher = User.find_by_name("stats_teacher") or User.create_user("stats_teacher", "stats_teacher@test.com", "pass", "teacher")
+    classes = [Class.create_class(f"Stats Class {n}", teacher.id, 1) for n in range(3)]
+    students = [
+        User.find_by_name(f"stats_student_{n}") or User.create_user(f"stats_student_{n}", f"stats_student_{n}@test.com", "pass", "student")
+        for n in range(12)
+    ]
+    with get_conn() as conn:
+        challenges = [row[0] for row in conn.execute("SELECT id FROM challenges")]
+
+    # Test 1: Incremental updates match a rebuild
+    print("\n1. Testing incremental maintenance...")
+    for step in range(300):
+        student = rng.choice(students)
+        action = rng.random()
+        if action < 0.6:
+            status = rng.choice(["started", "completed", "completed"])
+            run_write(_write_progress, student.id, rng.choice(challenges), status, rng.randint(0, 50), "{}")
+        elif action < 0.8:
+            # add_student does not move students between classes; move directly
+            with get_conn() as conn:
+                conn.execute("UPDATE users SET class_id = ? WHERE id = ?", (rng.choice(classes).id, student.id))
+                conn.commit()
+        elif action < 0.9:
+            with get_conn() as conn:
+                conn.execute("UPDATE users SET class_id = NULL WHERE id = ?", (student.id,))
+                conn.commit()
+        else:
+            with get_conn() as conn:
+                conn.execute("DELETE FROM progress WHERE user_id = ? AND challenge_id = ?", (student.id, rng.choice(challenges)))
+                conn.commit()
+
+    incremental = _snapshot()
+    run_write(rebuild_class_stats)
+    rebuilt = _snapshot()
+    if incremental == rebuilt and incremental[0]:
+        print(f"   ✓ {len(incremental[0])} classes and {len(incremental[1])} module rows match a full rebuild")
+    else:
+        print(f"   ✗ Drift: incremental={incremental}, rebuilt={rebuilt}")
+        return False
+
+    # Test 2: Role changes and deleted users leave the class
+    print("\n2. Testing role change and delete...")
+    member = next(s for s in students if User.find_by_id(s.id).class_id)
+    member = User.find_by_id(member.id)
+    member.role = "teacher"
+    member.save()
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (students[-1].id,))
+        conn.commit()
+    incremental = _snapshot()
+    run_write(rebuild_class_stats)
+    if incremental == _snapshot():
+        print("   ✓ Statistics follow role changes and deletions")
+    else:
+        print("   ✗ Statistics drifted after role change or delete")
+        return False
+
+    # Test 3: Reading statistics is one lookup
+    print("\n3. Testing reads...")
+    class_obj = max(classes, key=lambda c: c.get_class_progress()['completed_challenges'])
+    with track_queries() as log:
+        progress = class_obj.get_class_progress()
+    if log.count == 1 and progress['completed_challenges'] == sum(progress['module_completion'].values()):
+        print(f"   ✓ {progress['completed_challenges']} completions over {len(progress['module_completion'])} modules in {log.count} query")
+    else:
+        print(f"   ✗ Unexpected read: {log.count} queries, {progress}")
+        return False
+
+    # Test 4: Rebuild command
+    print("\n4. Testing rebuild command...")
+    with get_conn() as conn:
+        conn.execute("UPDATE class_stats SET total_points = -1")
+        conn.commit()
+    if stats_main(["rebuild"]) == 0 and _snapshot() == incremental:
+        print("   ✓ Corrupted statistics repaired")
+    else:
+        print("   ✗ Rebuild did not repair statistics")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE user_id IN (SELECT id FROM users WHERE name LIKE 'stats_student_%')")
+        conn.execute("DELETE FROM users WHERE name LIKE 'stats_student_%'")
+        conn.execute("DELETE FROM classes WHERE name LIKE 'Stats Class %'")
+        conn.commit()
+
+    print("\n✅ Class statistics test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_class_stats()
+    sys.exit(0 if success else 1)
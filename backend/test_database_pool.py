@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled, request-scoped database connections
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, release_conn, get_pool_stats, setup_database, seed_if_empty
+
+def test_database_pool():
+    """Test connection pooling and PRAGMA tuning"""
+    print("Testing Pooled Database Connections...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Same thread reuses one connection
+    print("\n1. Testing per-thread connection reuse...")
+    first = get_conn()
+    second = get_conn()
+    if first is second:
+        print("   ✓ Repeated get_conn() calls share one connection")
+    else:
+        print("   ✗ get_conn() opened a second connection in the same thread")
+        return False
+
+    # Test 2: close() does not tear down a leased connection
+    print("\n2. Testing close() on a leased connection...")
+    first.close()
+    try:
+        first.execute("SELECT 1").fetchone()
+        print("   ✓ Connection still usable after close()")
+    except Exception as e:
+        print(f"   ✗ Connection unusable after close(): {e}")
+        return False
+
+    # Test 3: Tuned PRAGMAs
+    print("\n3. Testing connection PRAGMAs...")
+    journal_mode = first.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = first.execute("PRAGMA synchronous").fetchone()[0]
+    busy_timeout = first.execute("PRAGMA busy_timeout").fetchone()[0]
+    temp_store = first.execute("PRAGMA temp_store").fetchone()[0]
+    if journal_mode == "wal" and synchronous == 1 and busy_timeout > 0 and temp_store == 2:
+        print(f"   ✓ journal_mode={journal_mode}, synchronous=NORMAL, busy_timeout={busy_timeout}")
+    else:
+        print(f"   ✗ Unexpected PRAGMAs: {journal_mode}, {synchronous}, {busy_timeout}, {temp_store}")
+        return False
+
+    # Test 4: Other threads get their own connection
+    print("\n4. Testing thread isolation...")
+    seen = {}
+
+    def worker():
+        seen['conn'] = get_conn()
+        release_conn()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    if seen['conn'] is not first:
+        print("   ✓ Worker thread received a separate connection")
+    else:
+        print("   ✗ Worker thread shared the main thread's connection")
+        return False
+
+    # Test 5: Released connections are reused
+    print("\n5. Testing release and reuse...")
+    before = get_pool_stats()
+    release_conn()
+    reused = get_conn()
+    after = get_pool_stats()
+    if after['reused'] > before['reused'] and after['created'] == before['created']:
+        print("   ✓ Released connection handed out again without reconnecting")
+    else:
+        print(f"   ✗ Pool did not reuse connection: {before} -> {after}")
+        return False
+
+    # Test 6: Pool statistics
+    print("\n6. Testing pool statistics...")
+    stats = get_pool_stats()
+    expected = ['max_size', 'size', 'idle', 'in_use', 'created', 'reused', 'waits']
+    if all(key in stats for key in expected) and stats['in_use'] >= 1:
+        print(f"   ✓ Pool stats: size={stats['size']}, in_use={stats['in_use']}, idle={stats['idle']}")
+    else:
+        print(f"   ✗ Pool stats incomplete: {stats}")
+        return False
+
+    # Test 7: Nested blocks do not commit or discard the outer transaction
+    print("\n7. Testing nested get_conn() blocks...")
+    reused.execute("CREATE TABLE IF NOT EXISTS _pool_nesting (n INTEGER)")
+    reused.commit()
+    try:
+        with get_conn() as outer:
+            outer.execute("INSERT INTO _pool_nesting VALUES (1)")
+            with get_conn() as inner:
+                inner.execute("INSERT INTO _pool_nesting VALUES (2)")
+                inner.commit()
+            try:
+                with get_conn() as inner:
+                    inner.execute("INSERT INTO _pool_nesting VALUES (3)")
+                    raise ValueError("inner failure")
+            except ValueError:
+                pass
+            raise RuntimeError("outer failure")
+    except RuntimeError:
+        pass
+    rolled_back = reused.execute("SELECT COUNT(*) FROM _pool_nesting").fetchone()[0]
+    with get_conn() as outer:
+        outer.execute("INSERT INTO _pool_nesting VALUES (1)")
+        try:
+            with get_conn() as inner:
+                inner.execute("INSERT INTO _pool_nesting VALUES (2)")
+                raise ValueError("inner failure")
+        except ValueError:
+            pass
+    kept = [row[0] for row in reused.execute("SELECT n FROM _pool_nesting")]
+    reused.execute("DROP TABLE _pool_nesting")
+    reused.commit()
+    if rolled_back == 0 and kept == [1]:
+        print("   ✓ Inner commit deferred to the outer block, inner failure rolled back alone")
+    else:
+        print(f"   ✗ Unexpected rows: {rolled_back} after outer rollback, {kept} after inner rollback")
+        return False
+
+    reused.execute("SELECT COUNT(*) FROM modules").fetchone()
+    release_conn()
+
+    print("\n✅ Pooled database connection test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_database_pool()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for integer epoch timestamp columns
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, epoch_seconds, setup_database, seed_if_empty
+from index_advisor import explain
+from models.user import User
+from models.class_model import Class
+from services.activity_service import activity_buffer
+from services.auth_service import auth_service
+from app import app
+
+def _insert_raw_progress(conn, user_id, created_at):
+    # Written without the epoch column, like an external script would
+    conn.execute(
+        "INSERT INTO detailed_progress (user_id, challenge_id, action, payload, created_at) VALUES (?, 'c1', 'raw', NULL, ?)",
+        (user_id, created_at)
+    )
+
+def test_epoch_timestamps():
+    """Test epoch columns are written, kept in sync and used for ordering and ranges"""
+    print("Testing Epoch Timestamp Columns...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Conversion helper
+    print("\n1. Testing epoch conversion...")
+    if epoch_seconds("2024-01-01T10:00:00.123456") == 1704103200 and epoch_seconds(None) is None:
+        print("   ✓ ISO timestamps convert to UTC epoch seconds")
+    else:
+        print("   ✗ Unexpected epoch conversion")
+        return False
+
+    # Test 2: Application writes fill both columns
+    print("\n2. Testing application writes...")
+    teacher = User.find_by_name("epoch_teacher") or User.create_user("epoch_teacher", "epoch_teacher@test.com", "pass", "teacher")
+    student = User.find_by_name("epoch_student") or User.create_user("epoch_student", "epoch_student@test.com", "pass", "student")
+    admin = User.find_by_name("epoch_admin") or User.create_user("epoch_admin", "epoch_admin@test.com", "pass", "admin")
+    student.update_last_active()
+    activity_buffer.flush()
+    class_obj = Class.create_class("Epoch Class", teacher.id, 1)
+
+    client = app.test_client()
+    token = auth_service.generate_token(student)
+    for challenge_id in ["c1", "c2", "c3"]:
+        client.post("/api/progress", json={"user_id": student.id, "challenge_id": challenge_id, "status": "completed", "points": 10},
+                    headers={"Authorization": f"Bearer {token}"})
+
+    with get_conn() as conn:
+        user_row = conn.execute("SELECT last_active, last_active_ts FROM users WHERE id = ?", (student.id,)).fetchone()
+        class_row = conn.execute("SELECT created_at, created_ts FROM classes WHERE id = ?", (class_obj.id,)).fetchone()
+        mismatched = conn.execute("""
+            SELECT COUNT(*) FROM progress
+            WHERE user_id = ? AND (updated_ts IS NULL OR updated_ts != CAST(strftime('%s', updated_at) AS INTEGER))
+        """, (student.id,)).fetchone()[0]
+        logged = conn.execute("SELECT COUNT(*) FROM detailed_progress WHERE user_id = ? AND created_ts IS NOT NULL", (student.id,)).fetchone()[0]
+    if (user_row['last_active_ts'] == epoch_seconds(user_row['last_active'])
+            and class_row['created_ts'] == epoch_seconds(class_row['created_at'])
+            and mismatched == 0 and logged == 3):
+        print("   ✓ users, classes, progress and detailed_progress carry epoch columns")
+    else:
+        print(f"   ✗ Epoch columns missing: mismatched={mismatched}, logged={logged}")
+        return False
+
+    # Test 3: Triggers fill the column for writers that do not set it
+    print("\n3. Testing sync triggers...")
+    run_write(_insert_raw_progress, student.id, "2024-03-01T08:00:00")
+    with get_conn() as conn:
+        raw_ts = conn.execute("SELECT created_ts FROM detailed_progress WHERE action = 'raw' AND user_id = ?", (student.id,)).fetchone()[0]
+        conn.execute("UPDATE classes SET created_at = '2024-02-01T00:00:00' WHERE id = ?", (class_obj.id,))
+        conn.commit()
+        class_ts = conn.execute("SELECT created_ts FROM classes WHERE id = ?", (class_obj.id,)).fetchone()[0]
+    if raw_ts == epoch_seconds("2024-03-01T08:00:00") and class_ts == epoch_seconds("2024-02-01T00:00:00"):
+        print("   ✓ Inserts and updates without epoch values are synced")
+    else:
+        print(f"   ✗ Triggers did not sync: {raw_ts}, {class_ts}")
+        return False
+
+    # Test 4: Feeds and ranges use index seeks
+    print("\n4. Testing query plans...")
+    with get_conn() as conn:
+        feed_plan = explain(conn, "SELECT * FROM progress ORDER BY updated_ts DESC, id DESC LIMIT 15")
+        range_plan = explain(conn, "SELECT COUNT(*) FROM detailed_progress WHERE created_ts >= ? AND created_ts < ?")
+    if not any("TEMP B-TREE" in detail for detail in feed_plan) and "idx_detailed_progress_created_ts" in range_plan[0]:
+        print(f"   ✓ {feed_plan[0]}")
+        print(f"   ✓ {range_plan[0]}")
+    else:
+        print(f"   ✗ Unexpected plans: {feed_plan}, {range_plan}")
+        return False
+
+    # Test 5: Activity analytics endpoint
+    print("\n5. Testing activity analytics...")
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(admin)}"}
+    response = client.get("/api/analytics/activity?start=2024-03-01&end=2024-03-02", headers=headers)
+    data = response.get_json()
+    recent = client.get("/api/analytics/activity", headers=headers).get_json()
+    bad = client.get("/api/analytics/activity?start=yesterday", headers=headers)
+    # Offsets are converted to UTC, also when only one bound is given
+    offset = client.get("/api/analytics/activity?start=2024-03-01T07:00:00%2B07:00&end=2024-03-02T07:00:00%2B07:00", headers=headers)
+    open_ended = client.get("/api/analytics/activity?start=2024-03-01T00:00:00Z", headers=headers)
+    if (response.status_code == 200 and data['total_events'] >= 1 and data['days'][0]['day'] == "2024-03-01"
+            and recent['total_events'] >= 3 and bad.status_code == 400
+            and offset.get_json()['days'] == data['days'] and open_ended.status_code == 200):
+        print(f"   ✓ Range query returned {data['total_events']} events on {data['days'][0]['day']}")
+    else:
+        print(f"   ✗ Unexpected analytics response: {response.status_code} {data}")
+        return False
+
+    # Test 6: Dashboards order by the epoch column
+    print("\n6. Testing activity feed ordering...")
+    response = client.get("/api/dashboard/admin", headers=headers)
+    activity = response.get_json()['recent_activity']
+    stamps = [entry['updated_ts'] for entry in activity]
+    if response.status_code == 200 and stamps == sorted(stamps, reverse=True):
+        print(f"   ✓ Admin feed ordered by updated_ts ({len(stamps)} entries)")
+    else:
+        print(f"   ✗ Feed not ordered: {stamps}")
+        return False
+
+    print("\n✅ Epoch timestamp test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_epoch_timestamps()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the secondary index migration and index advisor
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, setup_database, seed_if_empty, DB_PATH
+from index_advisor import collect_statements, advise, explain
+
+def test_index_advisor():
+    """Test hot predicates use indexes and the advisor reports plans"""
+    print("Testing Secondary Indexes and Index Advisor...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Indexes exist
+    print("\n1. Checking secondary indexes...")
+    required = [
+        'idx_progress_user_status', 'idx_users_class_role', 'uq_users_email',
+        'idx_classes_teacher_created_ts', 'uq_classes_class_code',
+        'idx_challenges_module_active', 'idx_detailed_progress_user_created_ts'
+    ]
+    with get_conn() as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for name in required:
+        if name in existing:
+            print(f"   ✓ {name} exists")
+        else:
+            print(f"   ✗ {name} missing")
+            return False
+
+    # Test 2: Hot predicates are index seeks
+    print("\n2. Checking hot query plans...")
+    hot_queries = [
+        "SELECT challenge_id FROM progress WHERE user_id = ? AND status = 'completed'",
+        "SELECT COUNT(*) FROM users WHERE class_id = ? AND role = 'student'",
+        "SELECT * FROM users WHERE email = ?",
+        "SELECT * FROM classes WHERE teacher_id = ? ORDER BY created_ts DESC, id DESC",
+        "SELECT * FROM classes WHERE class_code = ?",
+        "SELECT * FROM challenges WHERE module_id = ? AND is_active = 1 ORDER BY id",
+        "SELECT * FROM detailed_progress WHERE user_id = ? ORDER BY created_ts DESC",
+        "SELECT * FROM detailed_progress WHERE created_ts >= ? AND created_ts < ?",
+    ]
+    with get_conn() as conn:
+        for sql in hot_queries:
+            plan = explain(conn, sql)
+            if any(detail.startswith("SCAN") or "TEMP B-TREE" in detail for detail in plan):
+                print(f"   ✗ {sql} -> {plan}")
+                return False
+            print(f"   ✓ {plan[0]}")
+
+    # Test 3: Advisor collects and plans source statements
+    print("\n3. Testing advisor report...")
+    statements = collect_statements()
+    report = advise(DB_PATH)
+    errors = [entry for entry in report if entry.get("error")]
+    if statements and len(report) == len(statements) and not errors:
+        flagged = [entry for entry in report if entry["issues"]]
+        print(f"   ✓ Planned {len(report)} statements, {len(flagged)} still scan or sort")
+    else:
+        print(f"   ✗ Advisor failed: {errors[:3]}")
+        return False
+
+    print("\n✅ Index advisor test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_index_advisor()
+    sys.exit(0 if success else 1)
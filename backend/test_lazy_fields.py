@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for __slots__ models with lazily decoded JSON fields
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, setup_database, seed_if_empty
+from models.challenge import Challenge
+from models.user import User
+from models.class_model import Class
+
+def test_lazy_fields():
+    """Test slots, lazy JSON decoding, cached tasks and projections"""
+    print("Testing Lazy Model Fields...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Models use __slots__
+    print("\n1. Testing __slots__...")
+    if not any(hasattr(model(), '__dict__') for model in (Challenge, User, Class)):
+        print("   ✓ Challenge, User and Class instances have no __dict__")
+    else:
+        print("   ✗ A model instance still has a __dict__")
+        return False
+
+    # Test 2: JSON columns are decoded on first access
+    print("\n2. Testing lazy JSON decoding...")
+    challenge = Challenge.find_by_id("lazy_fields_challenge") or Challenge.create_challenge(
+        "lazy_fields_challenge", "m1", "Lazy fields", tasks=["a", "b"],
+        prerequisites=["c1"], tags=["lazy"], simulation_config={"nodes": 3}
+    )
+    with get_conn() as conn:
+        conn.execute("UPDATE challenges SET hints = 'not json' WHERE id = 'lazy_fields_challenge'")
+        conn.commit()
+
+    challenge = Challenge.find_by_id("lazy_fields_challenge")
+    try:
+        challenge._tags
+        print("   ✗ tags decoded while loading the row")
+        return False
+    except AttributeError:
+        pass
+    if challenge.tags == ["lazy"] and challenge.tags is challenge.tags and challenge.hints == []:
+        print("   ✓ Decoded once on access, invalid JSON falls back to the default")
+    else:
+        print(f"   ✗ Unexpected values: tags={challenge.tags}, hints={challenge.hints}")
+        return False
+
+    challenge.tags = ["lazy", "updated"]
+    challenge.save()
+    if Challenge.find_by_id("lazy_fields_challenge").tags == ["lazy", "updated"]:
+        print("   ✓ Assigned JSON values are saved")
+    else:
+        print("   ✗ Assigned value was not saved")
+        return False
+
+    # Test 3: Tasks are parsed once per tasks_json value
+    print("\n3. Testing cached tasks...")
+    tasks = challenge.get_tasks()
+    same = challenge.get_tasks() is tasks
+    challenge.set_tasks(["c"])
+    if same and tasks == ["a", "b"] and challenge.get_tasks() == ["c"]:
+        print("   ✓ get_tasks() cached and invalidated by set_tasks()")
+    else:
+        print("   ✗ get_tasks() cache is wrong")
+        return False
+
+    # Test 4: Projections load only the requested columns
+    print("\n4. Testing projections...")
+    summaries = Challenge.get_all_challenges(columns=Challenge.SUMMARY_COLUMNS)
+    summary = next(c for c in summaries if c.id == "lazy_fields_challenge")
+    try:
+        summary.description
+        print("   ✗ Projection loaded description")
+        return False
+    except AttributeError:
+        pass
+    if len(summaries) == len(Challenge.get_all_challenges()) and summary.prerequisites == ["c1"] and summary.title == "Lazy fields":
+        print(f"   ✓ {len(summaries)} challenge summaries without the blob columns")
+    else:
+        print("   ✗ Projection differs from the full load")
+        return False
+
+    try:
+        Challenge.get_all_challenges(columns=("id", "nope"))
+        print("   ✗ Unknown column accepted")
+        return False
+    except ValueError:
+        print("   ✓ Unknown projection column rejected")
+
+    user = User.find_by_name("lazy_fields_user") or User.create_user("lazy_fields_user", "lazy_fields@test.com", "pass")
+    user.preferences = {"theme": "dark"}
+    user.save()
+    listed = next(u for u in User.get_all_user_dicts() if u['name'] == "lazy_fields_user")
+    if User.find_by_id(user.id).preferences == {"theme": "dark"} and listed['preferences'] == {"theme": "dark"}:
+        print("   ✓ User preferences round-trip through the lazy field")
+    else:
+        print("   ✗ User preferences were not saved")
+        return False
+
+    Challenge.find_by_id("lazy_fields_challenge").delete()
+
+    print("\n✅ Lazy model fields test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_lazy_fields()
+    sys.exit(0 if success else 1)
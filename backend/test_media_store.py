@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the profile picture media store
+"""
+
+import sys
+import os
+import base64
+import importlib
+import io
+import struct
+import tempfile
+import zlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SKJ_MEDIA_DIR", tempfile.mkdtemp(prefix="skj-media-"))
+
+from database import get_conn, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from services.media_service import media_store, is_media_ref, MediaStore, Image, MEDIA_URL
+from app import app
+
+def _png(width, height, color):
+    """Minimal RGB PNG"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + bytes(color) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+def test_media_store():
+    """Test content-addressed storage, serving and the users row reference"""
+    print("Testing Media Store...")
+
+    setup_database()
+    seed_if_empty()
+
+    image = _png(300, 200, (200, 30, 30)) + os.urandom(300000)  # trailing bytes make it large
+    data_url = "data:image/png;base64," + base64.b64encode(image).decode()
+
+    # Test 1: Content addressing and validation
+    print("\n1. Testing store...")
+    ref = media_store.put(image)
+    errors = []
+    for bad in (b"<svg onload=alert(1)>", b"\x89PNG\r\n\x1a\n" + b"\x00" * (media_store.max_bytes + 1)):
+        try:
+            media_store.put(bad)
+        except ValueError as e:
+            errors.append(str(e))
+    # Variants are made on first request, not during the upload
+    variants = list(media_store.root.glob(f"*/{ref.split('.')[0]}_*"))
+    if is_media_ref(ref) and media_store.put(image) == ref and media_store.put_data_url(data_url) == ref and len(errors) == 2 \
+            and not variants:
+        print(f"   ✓ Stored once as {ref[:16]}..., rejected: {errors}")
+    else:
+        print(f"   ✗ Unexpected store behaviour: {ref}, {errors}, variants={variants}")
+        return False
+
+    if Image is not None:
+        # Images over the pixel limit are never decoded; the original is served
+        large = media_store.put(_png(120, 100, (0, 0, 200)))
+        capped = MediaStore(media_store.root, max_pixels=100 * 100)
+        if capped.open(large, "thumb")[0] != capped._path(large):
+            print("   ✗ Oversized image was resized")
+            return False
+        print("   ✓ Oversized image served without decoding")
+
+    # Test 2: Profile updates keep only the reference in the row
+    print("\n2. Testing profile update...")
+    users = [
+        User.find_by_name(f"media_user_{n}") or User.create_user(f"media_user_{n}", f"media_user_{n}@test.com")
+        for n in range(10)
+    ]
+    client = app.test_client()
+    for user in users:
+        headers = {"Authorization": f"Bearer {auth_service.generate_token(user)}"}
+        response = client.put("/api/auth/profile", json={"profile_picture": data_url}, headers=headers)
+    with get_conn() as conn:
+        stored = conn.execute("SELECT profile_picture FROM users WHERE id = ?", (users[0].id,)).fetchone()[0]
+    bad = client.put("/api/auth/profile", json={"profile_picture": "data:image/png;base64,!!!"}, headers=headers)
+    if response.status_code == 200 and stored == ref and response.get_json()['user']['profile_picture'] == MEDIA_URL + ref \
+            and bad.status_code == 400:
+        print(f"   ✓ Row stores {len(stored)} characters instead of {len(data_url)}")
+    else:
+        print(f"   ✗ Unexpected profile update: {response.status_code} {stored and stored[:40]}")
+        return False
+
+    # Test 3: User lists stay small
+    print("\n3. Testing list payload...")
+    admin = User.find_by_name("admin") or User.create_user("media_admin", "media_admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {auth_service.generate_token(admin)}"}
+    response = client.get("/api/users", headers=admin_headers)
+    listed = [u for u in response.get_json() if u['name'].startswith("media_user_")]
+    if len(listed) == 10 and all(u['profile_picture'] == MEDIA_URL + ref for u in listed) and len(response.data) < 100000:
+        print(f"   ✓ {len(response.data)} bytes for {len(response.get_json())} users")
+    else:
+        print(f"   ✗ List payload is {len(response.data)} bytes")
+        return False
+
+    # Test 4: Serving with cache headers
+    print("\n4. Testing media endpoint...")
+    response = client.get(MEDIA_URL + ref)
+    etag = response.headers.get("ETag")
+    cached = client.get(MEDIA_URL + ref, headers={"If-None-Match": etag})
+    thumb = client.get(MEDIA_URL + ref + "?size=thumb")
+    missing = [client.get(MEDIA_URL + "0" * 64 + ".png").status_code,
+               client.get(MEDIA_URL + "../skj.db").status_code,
+               client.get(MEDIA_URL + ref + "?size=huge").status_code]
+    if response.status_code == 200 and response.data == image and response.mimetype == "image/png" \
+            and "immutable" in response.headers["Cache-Control"] and cached.status_code == 304 \
+            and thumb.status_code == 200 and thumb.data.startswith(b"\x89PNG") and missing == [404, 404, 404]:
+        print(f"   ✓ Served with {response.headers['Cache-Control']}, thumbnail {len(thumb.data)} bytes")
+    else:
+        print(f"   ✗ Unexpected responses: {response.status_code} {cached.status_code} {thumb.status_code} {missing}")
+        return False
+
+    # Test 5: Upload endpoint
+    print("\n5. Testing upload...")
+    other = _png(8, 8, (0, 0, 255))
+    response = client.post("/api/auth/profile/picture", data={"file": (io.BytesIO(other), "me.png")}, headers=headers)
+    rejected = client.post("/api/auth/profile/picture", data=b"GIF00 not an image", headers=headers)
+    if response.status_code == 200 and User.find_by_id(users[-1].id).profile_picture == media_store.put(other) \
+            and rejected.status_code == 400:
+        print("   ✓ Multipart upload stored, invalid body rejected")
+    else:
+        print(f"   ✗ Unexpected upload result: {response.status_code} {rejected.status_code}")
+        return False
+
+    # Test 6: Migration moves existing data URLs
+    print("\n6. Testing migration...")
+    legacy = "data:image/png;base64," + base64.b64encode(_png(4, 4, (0, 255, 0))).decode()
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET profile_picture = ? WHERE id = ?", (legacy, users[1].id))
+        conn.execute("UPDATE users SET profile_picture = 'data:text/html;base64,PGI+' WHERE id = ?", (users[2].id,))
+        conn.commit()
+        importlib.import_module("migrations.013_move_profile_pictures").up(conn)
+        moved = conn.execute("SELECT profile_picture FROM users WHERE id = ?", (users[1].id,)).fetchone()[0]
+        cleared = conn.execute("SELECT profile_picture FROM users WHERE id = ?", (users[2].id,)).fetchone()[0]
+    if is_media_ref(moved) and media_store.open(moved) and cleared is None:
+        print("   ✓ Data URL moved, invalid picture cleared")
+    else:
+        print(f"   ✗ Migration result: {moved and moved[:40]}, {cleared and cleared[:40]}")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE name LIKE 'media_%'")
+        conn.commit()
+
+    print("\n✅ Media store test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_media_store()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Test script for online (chunked, resumable) migrations
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from migrations.online import BatchedBackfill, OnlineTableRebuild
+from migrations.migration_manager import MigrationManager
+from database import setup_database, DB_PATH
+
+ROWS = 5000
+
+NEW_EVENTS_TABLE = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        score INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        created_day TEXT
+    )
+"""
+
+ONLINE_MIGRATION = '''
+from migrations.online import BatchedBackfill
+
+def up(conn):
+    conn.execute("ALTER TABLE events ADD COLUMN flagged INTEGER")
+    conn.commit()
+
+ONLINE_STEPS = [
+    BatchedBackfill("001_flag_events", "events", "flagged = score > 50", where="flagged IS NULL",
+                    chunk_size=700, pause=0, progress=None)
+]
+'''
+
+def _create_events(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            score INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_events_user ON events(user_id)")
+    conn.executemany(
+        "INSERT INTO events (user_id, action, score, created_at) VALUES (?, ?, ?, ?)",
+        [(i % 50, "submit", i % 100, f"2024-01-{i % 28 + 1:02d}T10:00:00") for i in range(ROWS)]
+    )
+    conn.commit()
+    conn.close()
+
+def test_online_migration():
+    """Test batched backfills and online table rebuilds"""
+    print("Testing Online Migrations...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        # Test 1: Batched backfill
+        print("\n1. Testing batched backfill...")
+        db_path = tmp / "backfill.db"
+        _create_events(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("ALTER TABLE events ADD COLUMN bonus INTEGER")
+        conn.commit()
+
+        reports = []
+        step = BatchedBackfill("backfill_bonus", "events", "bonus = score * 2", where="bonus IS NULL",
+                               chunk_size=600, pause=0, progress=lambda *args: reports.append(args))
+        step.run(db_path)
+        missing = conn.execute("SELECT COUNT(*) FROM events WHERE bonus IS NULL OR bonus != score * 2").fetchone()[0]
+        state = conn.execute("SELECT phase, done FROM online_migrations WHERE name = 'backfill_bonus'").fetchone()
+        conn.close()
+        if missing == 0 and state == ("done", ROWS) and reports:
+            print(f"   ✓ Backfilled {ROWS} rows in chunks, {len(reports)} progress reports")
+        else:
+            print(f"   ✗ Backfill incomplete: missing={missing}, state={state}")
+            return False
+
+        # Test 2: Rebuild resumes after an interruption
+        print("\n2. Testing resumable rebuild...")
+        db_path = tmp / "rebuild.db"
+        _create_events(db_path)
+
+        def interrupt(name, phase, done, total):
+            if phase == "copying":
+                raise KeyboardInterrupt("worker restarted")
+
+        rebuild = OnlineTableRebuild(
+            "rebuild_events", "events", NEW_EVENTS_TABLE,
+            select={"created_day": "substr(created_at, 1, 10)"},
+            indexes=["CREATE INDEX idx_events_day ON events(created_day)"],
+            chunk_size=400, pause=0.001, progress=interrupt
+        )
+        try:
+            rebuild.run(db_path)
+            print("   ✗ Interruption did not happen")
+            return False
+        except KeyboardInterrupt:
+            pass
+
+        conn = sqlite3.connect(db_path)
+        phase, last_rowid = conn.execute(
+            "SELECT phase, last_rowid FROM online_migrations WHERE name = 'rebuild_events'"
+        ).fetchone()
+        conn.close()
+        if phase == "copy" and last_rowid > 0:
+            print(f"   ✓ Interrupted during copy at rowid {last_rowid}")
+        else:
+            print(f"   ✗ Unexpected state after interruption: {phase}, {last_rowid}")
+            return False
+
+        # Test 3: Writes during the copy are caught up before the swap
+        print("\n3. Testing writes during rebuild...")
+        expected = {i + 1: i % 100 for i in range(ROWS)}
+        errors = []
+
+        def writer():
+            try:
+                wconn = sqlite3.connect(db_path, timeout=30)
+                for i in range(200):
+                    row_id = wconn.execute(
+                        "INSERT INTO events (user_id, action, score, created_at) VALUES (1, 'live', 7, '2024-02-01T00:00:00')"
+                    ).lastrowid
+                    expected[row_id] = 7
+                    wconn.execute("UPDATE events SET score = 99 WHERE id = ?", (i * 20 + 1,))
+                    expected[i * 20 + 1] = 99
+                    wconn.execute("DELETE FROM events WHERE id = ?", (i * 20 + 2,))
+                    expected.pop(i * 20 + 2, None)
+                    wconn.commit()
+                wconn.close()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        rebuild.progress = None
+        rebuild.run(db_path)
+        thread.join()
+
+        conn = sqlite3.connect(db_path)
+        rows = dict(conn.execute("SELECT id, score FROM events"))
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+        days_missing = conn.execute("SELECT COUNT(*) FROM events WHERE created_day IS NULL AND action != 'live'").fetchone()[0]
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'events'")}
+        leftovers = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '\\_events\\_%' ESCAPE '\\'"
+        ).fetchone()[0]
+        conn.close()
+
+        if errors:
+            print(f"   ✗ Live writer failed: {errors}")
+            return False
+        if rows == expected and "created_day" in columns and days_missing == 0:
+            print(f"   ✓ {len(rows)} rows match, including live inserts, updates and deletes")
+        else:
+            print(f"   ✗ Rebuilt table differs: {len(rows)} rows vs {len(expected)} expected")
+            return False
+        if {"idx_events_user", "idx_events_day"} <= indexes and leftovers == 0:
+            print("   ✓ Indexes recreated, shadow table and triggers removed")
+        else:
+            print(f"   ✗ Unexpected schema after swap: indexes={indexes}, leftovers={leftovers}")
+            return False
+
+        # Test 4: MigrationManager runs ONLINE_STEPS
+        print("\n4. Testing MigrationManager integration...")
+        db_path = tmp / "managed.db"
+        _create_events(db_path)
+        migrations_dir = tmp / "migrations"
+        migrations_dir.mkdir()
+        (migrations_dir / "001_flag_events.py").write_text(ONLINE_MIGRATION)
+
+        manager = MigrationManager(db_path, migrations_dir)
+        manager.run_migrations()
+        conn = sqlite3.connect(db_path)
+        unflagged = conn.execute("SELECT COUNT(*) FROM events WHERE flagged IS NULL").fetchone()[0]
+        conn.close()
+        if unflagged == 0 and manager.get_applied_migrations() == ["001_flag_events.py"]:
+            print("   ✓ Online migration backfilled and recorded")
+        else:
+            print(f"   ✗ Online migration incomplete: unflagged={unflagged}")
+            return False
+
+        # Test 5: Rebuild a table other tables' triggers refer to
+        print("\n5. Testing rebuild of progress with statistics triggers...")
+        setup_database()
+        db_path = tmp / "app.db"
+        source = sqlite3.connect(DB_PATH)
+        target = sqlite3.connect(db_path)
+        source.backup(target)
+        source.close()
+        create_sql = target.execute("SELECT sql FROM sqlite_master WHERE name = 'progress'").fetchone()[0]
+        create_sql = create_sql.replace("CREATE TABLE progress (", "CREATE TABLE {table} (attempts INTEGER NOT NULL DEFAULT 0,", 1)
+        user_id = target.execute("INSERT INTO users (name, created_at) VALUES ('online_user', '2024-01-01T00:00:00')").lastrowid
+        challenge_ids = [row[0] for row in target.execute("SELECT id FROM challenges ORDER BY id LIMIT 2")]
+        target.execute("INSERT INTO progress (user_id, challenge_id, status, points, updated_at) VALUES (?, ?, 'completed', 5, '2024-01-01T00:00:00')",
+                       (user_id, challenge_ids[0]))
+        target.commit()
+        target.close()
+
+        state = OnlineTableRebuild("005_rebuild_progress", "progress", create_sql, pause=0, progress=None).run(db_path)
+        conn = sqlite3.connect(db_path)
+        triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'progress'")}
+        before = conn.execute("SELECT total_points FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+        conn.execute("INSERT INTO progress (user_id, challenge_id, status, points, updated_at) VALUES (?, ?, 'completed', 7, '2024-01-01T00:00:00')",
+                     (user_id, challenge_ids[1]))
+        after = conn.execute("SELECT total_points FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+        conn.close()
+        if state['phase'] == 'done' and {"trg_user_stats_progress_insert", "trg_class_stats_progress_insert"} <= triggers \
+                and before == 5 and after == 12:
+            print(f"   ✓ progress rebuilt, {len(triggers)} triggers recreated and still firing")
+        else:
+            print(f"   ✗ Unexpected rebuild: phase={state['phase']}, triggers={triggers}, points {before} -> {after}")
+            return False
+
+    print("\n✅ Online migration test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_online_migration()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for compiled permission masks and the class ownership index
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from services.auth_service import auth_service
+from services.rbac_service import rbac_service, Role, Permission
+from services.ownership_index import ownership_index
+from app import app
+
+def test_ownership_index():
+    """Test bitmask permission checks and scoped class/student checks"""
+    print("Testing Ownership Index...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Bitmasks agree with the permission sets
+    print("\n1. Testing permission bitmasks...")
+    checks = [
+        (role, perm, rbac_service.has_permission(role.value, perm), rbac_service.has_permission(role, perm.value))
+        for role in Role for perm in Permission
+    ]
+    wrong = [(role, perm) for role, perm, by_enum, by_value in checks
+             if by_enum != by_value or by_enum != (perm in rbac_service.role_permissions[role])]
+    invalid = [rbac_service.has_permission("student", "no_such_permission"), rbac_service.has_permission("guest", Permission.VIEW_CONTENT),
+               rbac_service.has_permission(None, None), rbac_service.has_permission(["admin"], Permission.VIEW_CONTENT)]
+    if not wrong and not any(invalid) and rbac_service.get_user_permissions("guest") == []:
+        print(f"   ✓ {len(checks)} role/permission pairs match, invalid input denied")
+    else:
+        print(f"   ✗ Mismatch: {wrong}, invalid={invalid}")
+        return False
+
+    # Test 2: Scoped checks: loaded classes compared directly, one change log poll per request
+    print("\n2. Testing scoped checks...")
+    teacher_a = User.find_by_name("owner_teacher_a") or User.create_user("owner_teacher_a", "owner_teacher_a@test.com", "pass", "teacher")
+    teacher_b = User.find_by_name("owner_teacher_b") or User.create_user("owner_teacher_b", "owner_teacher_b@test.com", "pass", "teacher")
+    student = User.find_by_name("owner_student") or User.create_user("owner_student", "owner_student@test.com", "pass", "student")
+    class_a = Class.create_class("Owner Class A", teacher_a.id, 1)
+    class_b = Class.create_class("Owner Class B", teacher_b.id, 1)
+    class_a.add_students([student.id])
+    ownership_index.teacher_of(class_a.id)
+    with app.test_request_context(), track_queries() as log:
+        scoped = [
+            rbac_service.can_access_class(teacher_a, class_a),
+            not rbac_service.can_access_class(teacher_b, class_a),
+            rbac_service.can_manage_class(teacher_a, class_a.id),
+            not rbac_service.can_manage_class(teacher_b, class_a.id),
+            rbac_service.can_access_user_data(teacher_a, student.id),
+            not rbac_service.can_access_user_data(teacher_b, student.id),
+        ]
+    if all(scoped) and log.count == 1:
+        print("   ✓ Owner allowed, other teacher denied, 1 query for the request")
+    else:
+        print(f"   ✗ Unexpected: {scoped}, {log.count} queries")
+        return False
+
+    # Test 3: Roster and class changes keep the index current
+    print("\n3. Testing index maintenance...")
+    class_a.remove_students([student.id])
+    unassigned = rbac_service.can_access_user_data(teacher_b, student.id)
+    class_b.add_student(student.id)
+    moved = rbac_service.can_access_user_data(teacher_b, student.id) and not rbac_service.can_access_user_data(teacher_a, student.id)
+    class_b.teacher_id = teacher_a.id
+    class_b.save()
+    reassigned = rbac_service.can_access_class(teacher_a, class_b.id) and not rbac_service.can_access_class(teacher_b, class_b.id)
+    class_b.delete()
+    deleted = not rbac_service.can_access_class(teacher_a, class_b.id) and ownership_index.user(student.id) == ("student", None)
+    if unassigned and moved and reassigned and deleted:
+        print("   ✓ Remove, enroll, reassign and delete reflected")
+    else:
+        print(f"   ✗ Stale index: {unassigned} {moved} {reassigned} {deleted}")
+        return False
+
+    # Test 4: Class endpoints use the ownership check
+    print("\n4. Testing class endpoints...")
+    client = app.test_client()
+    owner = client.get(f"/api/classes/{class_a.id}/students", headers={"Authorization": f"Bearer {auth_service.generate_token(teacher_a)}"})
+    other = client.get(f"/api/classes/{class_a.id}/students", headers={"Authorization": f"Bearer {auth_service.generate_token(teacher_b)}"})
+    if owner.status_code == 200 and other.status_code == 403:
+        print("   ✓ Owner 200, other teacher 403")
+    else:
+        print(f"   ✗ Unexpected statuses: {owner.status_code} {other.status_code}")
+        return False
+
+    # Test 5: Changes written by another worker process
+    print("\n5. Testing changes from another worker...")
+    with get_conn() as conn:
+        conn.execute("UPDATE classes SET teacher_id = ? WHERE id = ?", (teacher_b.id, class_a.id))
+        conn.execute("UPDATE users SET class_id = ? WHERE id = ?", (class_a.id, student.id))
+        conn.commit()
+    with app.test_request_context(), track_queries() as log:
+        moved = rbac_service.can_access_class(teacher_b, class_a.id) and not rbac_service.can_access_class(teacher_a, class_a.id) \
+            and rbac_service.can_access_user_data(teacher_b, student.id) and not rbac_service.can_access_user_data(teacher_a, student.id)
+    # The poll plus one read each for the changed class and user, no reload of either table
+    patched = log.count == 3
+    with get_conn() as conn:
+        conn.execute("DELETE FROM classes WHERE id = ?", (class_a.id,))
+        conn.commit()
+    gone = ownership_index.teacher_of(class_a.id) is None
+    if moved and gone and patched:
+        print("   ✓ Reassignment, enrollment and deletion from raw SQL reflected, only changed rows read")
+    else:
+        print(f"   ✗ Stale index: moved={moved}, gone={gone}, {log.count} queries")
+        return False
+
+    # Test 6: Rows created outside the models are found on first miss
+    print("\n6. Testing lookup on miss...")
+    with get_conn() as conn:
+        class_id = conn.execute("INSERT INTO classes (name, teacher_id, semester, created_at, class_code) VALUES ('Owner Raw', ?, 1, ?, 'OWNRAW') RETURNING id",
+                                (teacher_b.id, "2024-01-01T00:00:00")).fetchone()[0]
+        conn.commit()
+    if rbac_service.can_access_class(teacher_b, class_id) and ownership_index.teacher_of(-1) is None:
+        print("   ✓ Class inserted with raw SQL found")
+    else:
+        print("   ✗ Raw class not found")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET class_id = NULL WHERE name LIKE 'owner_%'")
+        conn.execute("DELETE FROM classes WHERE name LIKE 'Owner %'")
+        conn.execute("DELETE FROM users WHERE name LIKE 'owner_%'")
+        conn.commit()
+    ownership_index.invalidate()
+
+    print("\n✅ Ownership index test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_ownership_index()
+    sys.exit(0 if success else 1)
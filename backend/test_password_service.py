@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the password worker pool
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, setup_database, seed_if_empty
+from models.user import User
+from services.password_service import PasswordService, PasswordServiceBusy, password_service, hash_rounds, _hash
+from app import app
+
+def _stored_hash(user_id):
+    with get_conn() as conn:
+        return conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+def test_password_service():
+    """Test pooled hashing, queue limits and rehash on login"""
+    print("Testing Password Service...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Configurable cost, hashing and verification on the pool
+    print("\n1. Testing hash and verify...")
+    service = PasswordService(rounds=4, workers=2)
+    password_hash = service.hash("secret")
+    hashes = service.hash_many(["a", None, "b", "c", ""])
+    ok = (hash_rounds(password_hash) == 4 and service.verify("secret", password_hash)
+          and not service.verify("wrong", password_hash) and not service.verify("secret", None)
+          and hashes[1] is None and hashes[4] is None and service.verify("c", hashes[3])
+          and service._executor._mp_context.get_start_method() == "spawn")
+    if ok:
+        print("   ✓ Cost factor 4 applied, hashes verify")
+    else:
+        print(f"   ✗ Unexpected hash results: {password_hash}, {hashes}")
+        return False
+
+    # Test 2: A burst of logins queues on the pool
+    print("\n2. Testing concurrent verification...")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.verify("secret", password_hash))) for _ in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = service.stats()
+    if results == [True] * 40 and stats['pending'] == 0 and stats['peak_pending'] > 1 and stats['verified'] >= 42:
+        print(f"   ✓ 40 concurrent checks, peak queue depth {stats['peak_pending']}, avg {stats['avg_ms']} ms")
+    else:
+        print(f"   ✗ Unexpected results: {results.count(True)} ok, {stats}")
+        return False
+    service.shutdown()
+
+    # Test 3: The queue is bounded
+    print("\n3. Testing queue limit...")
+    service = PasswordService(rounds=10, workers=1, queue_size=2)
+    futures = [service._submit('hashed', 1, _hash, "x", 10) for _ in range(2)]
+    try:
+        service.hash("y")
+        rejected = False
+    except PasswordServiceBusy:
+        rejected = True
+    for future in futures:
+        future.result()
+    if rejected and service.stats()['rejected'] == 1 and service.stats()['pending'] == 0:
+        print("   ✓ Full queue rejects new work")
+    else:
+        print(f"   ✗ Queue not bounded: {service.stats()}")
+        return False
+    service.shutdown()
+
+    # Test 4: Hashes with an old cost are upgraded on login
+    print("\n4. Testing rehash on login...")
+    user = User.find_by_name("password_user") or User.create_user("password_user", "password_user@test.com")
+    user.password_hash = _hash("pw", 4)
+    user.save()
+    client = app.test_client()
+    response = client.post("/api/auth/login", json={"name": "password_user", "password": "pw"})
+    upgraded = _stored_hash(user.id)
+    response2 = client.post("/api/auth/login", json={"name": "password_user", "password": "pw"})
+    if response.status_code == 200 and response2.status_code == 200 \
+            and hash_rounds(upgraded) == password_service.rounds and _stored_hash(user.id) == upgraded:
+        print(f"   ✓ Cost 4 hash upgraded to {password_service.rounds} once")
+    else:
+        print(f"   ✗ Hash not upgraded: {upgraded}")
+        return False
+
+    # Test 5: Busy pool answers 503
+    print("\n5. Testing busy response...")
+    queue_size, password_service.queue_size = password_service.queue_size, 0
+    try:
+        response = client.post("/api/auth/login", json={"name": "password_user", "password": "pw"})
+    finally:
+        password_service.queue_size = queue_size
+    if response.status_code == 503 and response.headers.get("Retry-After") == "1":
+        print("   ✓ 503 with Retry-After")
+    else:
+        print(f"   ✗ Unexpected response: {response.status_code}")
+        return False
+
+    # Test 6: Inline mode
+    print("\n6. Testing inline mode...")
+    service = PasswordService(rounds=4, workers=0)
+    if service.verify("pw", service.hash("pw")) and service.stats()['hashed'] == 1:
+        print("   ✓ Works without worker processes")
+    else:
+        print("   ✗ Inline mode failed")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE name = 'password_user'")
+        conn.commit()
+
+    print("\n✅ Password service test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_password_service()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory prerequisite graph
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, track_queries, setup_database, seed_if_empty
+from models.challenge import Challenge
+from services.prerequisite_graph import PrerequisiteGraph, prerequisite_graph
+from services.prerequisite_service import prerequisite_service
+
+def _requires(prereqs, challenge_id):
+    """Reference transitive prerequisites by plain DFS"""
+    found, pending = set(), list(prereqs.get(challenge_id, []))
+    while pending:
+        current = pending.pop()
+        if current not in found:
+            found.add(current)
+            pending.extend(prereqs.get(current, []))
+    return found
+
+def test_prerequisite_graph():
+    """Test closure, cycle detection, incremental edits and the service queries"""
+    print("Testing Prerequisite Graph...")
+
+    setup_database()
+    seed_if_empty()
+
+    rng = random.Random(24)
+    ids = [f"pg_{n:02d}" for n in range(40)]
+    prereqs = {}
+    for n, challenge_id in enumerate(ids):
+        prereqs[challenge_id] = rng.sample(ids[:n], min(n, rng.randint(0, 3)))
+        Challenge.create_challenge(challenge_id, "m1", f"Graph {n}", prerequisites=prereqs[challenge_id])
+
+    # Test 1: Incremental closure matches a reference and a full rebuild
+    print("\n1. Testing transitive closure...")
+    rebuilt = PrerequisiteGraph()
+    wrong = [
+        challenge_id for challenge_id in ids
+        if set(prerequisite_graph.ids(prerequisite_graph.closure(challenge_id))) != _requires(prereqs, challenge_id)
+        or rebuilt.closure(challenge_id) and set(rebuilt.ids(rebuilt.closure(challenge_id))) != _requires(prereqs, challenge_id)
+    ]
+    order = prerequisite_graph.topological(ids)
+    ordered = all(order.index(p) < order.index(c) for c in ids for p in prereqs[c])
+    if not wrong and ordered and not prerequisite_graph.cycles():
+        print(f"   ✓ {len(ids)} closures match, topological order respects every edge")
+    else:
+        print(f"   ✗ Wrong closures: {wrong}, ordered={ordered}")
+        return False
+
+    # Test 2: Chain and dependency queries run in memory after one generation check each
+    print("\n2. Testing in-memory queries...")
+    target = max(ids, key=lambda challenge_id: len(_requires(prereqs, challenge_id)))
+    with track_queries() as log:
+        chain = prerequisite_service.get_prerequisite_chain(target)
+        dependencies = prerequisite_service.get_challenge_dependencies(ids[0])
+        stats = prerequisite_service.get_prerequisite_statistics()
+    direct = {item['id'] for item in chain if item['level'] == 1}
+    if log.count == 3 and {item['id'] for item in chain} == _requires(prereqs, target) and direct == set(prereqs[target]) \
+            and {d['id'] for d in dependencies} == {c for c in ids if ids[0] in prereqs[c]} \
+            and stats['circular_dependencies'] == []:
+        print(f"   ✓ Chain of {len(chain)}, {len(dependencies)} dependents and statistics with {log.count} queries")
+    else:
+        print(f"   ✗ Unexpected: {log.count} queries, chain={len(chain)}")
+        return False
+
+    # Test 3: Prerequisite updates are checked against the graph
+    print("\n3. Testing update validation...")
+    leaf = ids[0]
+    checks = [
+        prerequisite_service.validate_prerequisite_update(leaf, [target])[0] is False,
+        prerequisite_service.validate_prerequisite_update(target, [target])[0] is False,
+        prerequisite_service.validate_prerequisite_update(target, ["pg_missing"])[0] is False,
+        prerequisite_service.validate_prerequisite_update(target, [leaf]) == (True, None),
+    ]
+    if all(checks):
+        print(f"   ✓ Cycle, self-reference and unknown rejected: {prerequisite_service.validate_prerequisite_update(leaf, [target])[1]}")
+    else:
+        print(f"   ✗ Unexpected validation: {checks}")
+        return False
+
+    # Test 4: Saved cycles are detected and cleared
+    print("\n4. Testing cycle detection on edit...")
+    challenge = Challenge.find_by_id(leaf)
+    challenge.prerequisites = [target]
+    challenge.save()
+    cycle = prerequisite_graph.cycles()
+    flagged = prerequisite_service.get_prerequisite_statistics()['circular_dependencies']
+    chain_valid, _ = prerequisite_service.validate_prerequisite_chain(target)
+    challenge.prerequisites = []
+    challenge.save()
+    if len(cycle) == 1 and leaf in cycle[0] and target in cycle[0] and set(flagged) == set(cycle[0]) \
+            and not chain_valid and not prerequisite_graph.cycles():
+        print(f"   ✓ Cycle of {len(cycle[0])} challenges detected, cleared after fix")
+    else:
+        print(f"   ✗ Unexpected cycles: {cycle}, flagged={flagged}")
+        return False
+
+    # Test 5: Learning path and delete
+    print("\n5. Testing learning path and delete...")
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE user_id = 1 AND challenge_id LIKE 'pg_%'")
+        conn.commit()
+    with track_queries() as log:
+        path = [item['id'] for item in prerequisite_service.suggest_learning_path(1, target)]
+    path_ordered = path == prerequisite_graph.topological(path)
+    removed = prereqs[target][0]
+    Challenge.find_by_id(removed).delete()
+    after = {item['id'] for item in prerequisite_service.get_prerequisite_chain(target)}
+    if set(path) == _requires(prereqs, target) and path_ordered and log.count <= 3 \
+            and removed not in after:
+        print(f"   ✓ Path of {len(path)} challenges in {log.count} queries, deleted challenge left the chain")
+    else:
+        print(f"   ✗ Unexpected path: {path}, {log.count} queries")
+        return False
+
+    # Test 6: Changes written by another worker process
+    print("\n6. Testing changes from another worker...")
+    with get_conn() as conn:
+        conn.execute("UPDATE challenges SET prerequisites = ? WHERE id = ?", (f'["{target}"]', leaf))
+        conn.execute("INSERT INTO challenges (id, module_id, title, tasks_json, prerequisites, is_active) VALUES ('pg_raw', 'm1', 'Graph raw', '[]', ?, 1)",
+                     (f'["{leaf}"]',))
+        conn.commit()
+    flagged = prerequisite_service.get_prerequisite_statistics()['circular_dependencies']
+    raw_chain = {item['id'] for item in prerequisite_service.get_prerequisite_chain("pg_raw")}
+    with get_conn() as conn:
+        conn.execute("UPDATE challenges SET prerequisites = NULL WHERE id = ?", (leaf,))
+        conn.commit()
+    cleared = not prerequisite_service.get_prerequisite_statistics()['circular_dependencies']
+    if leaf in flagged and target in flagged and {leaf, target} <= raw_chain and cleared:
+        print("   ✓ Cycle and new challenge from raw SQL seen, fix seen as well")
+    else:
+        print(f"   ✗ Stale graph: flagged={flagged}, chain={raw_chain}, cleared={cleared}")
+        return False
+
+    for challenge in Challenge.get_all_challenges(active_only=False):
+        if challenge.id.startswith("pg_"):
+            challenge.delete()
+
+    print("\n✅ Prerequisite graph test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_prerequisite_graph()
+    sys.exit(0 if success else 1)
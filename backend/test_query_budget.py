@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for query instrumentation, N+1 detection and per-endpoint query budgets
+"""
+
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_conn, track_queries, query_budget, QueryBudgetExceeded, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from app import app
+
+# (path, role making the request, maximum number of queries)
+ENDPOINT_BUDGETS = [
+    ("/api/leaderboard", None, 1),
+    ("/api/modules", None, 2),
+    ("/api/progress/1", None, 2),
+    ("/api/progress/1?include_entries=false", None, 1),
+    ("/api/auth/me", "student", 2),
+    ("/api/dashboard/student", "student", 6),
+    ("/api/dashboard/teacher", "teacher", 5),
+    ("/api/dashboard/admin", "admin", 9),
+    ("/api/classes?include_students=true&include_progress=true", "admin", 6),
+]
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def test_query_budget():
+    """Test statement recording, slow query logging and endpoint budgets"""
+    print("Testing Query Instrumentation...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Statements, durations and row counts are recorded
+    print("\n1. Testing statement recording...")
+    with get_conn() as conn:
+        module_count = conn.execute("SELECT COUNT(*) FROM modules").fetchone()[0]
+        challenge_count = conn.execute("SELECT COUNT(*) FROM challenges WHERE module_id = ?", ("m1",)).fetchone()[0]
+    with track_queries() as log:
+        with get_conn() as conn:
+            conn.execute("SELECT * FROM modules").fetchall()
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM challenges WHERE module_id = ?", ("m1",))
+            cursor.fetchall()
+    if log.count == 2 and log.records[0].rows == module_count and log.records[1].rows == challenge_count:
+        print(f"   ✓ Recorded {log.count} statements in {log.total_ms:.2f} ms")
+    else:
+        print(f"   ✗ Unexpected log: {[(r.sql, r.rows) for r in log.records]}")
+        return False
+
+    # Test 2: Repeated statements are flagged as N+1
+    print("\n2. Testing N+1 detection...")
+    with track_queries() as log:
+        with get_conn() as conn:
+            for module_id in ["m1", "m2", "m3", "m4", "m5", "m6"]:
+                conn.execute("SELECT * FROM challenges WHERE module_id = ?", (module_id,)).fetchall()
+    if log.repeated():
+        print(f"   ✓ Flagged: {list(log.repeated().values())[0]} runs of one statement")
+    else:
+        print("   ✗ N+1 pattern not detected")
+        return False
+
+    # Test 3: Slow queries are logged with their plan
+    print("\n3. Testing slow query log...")
+    capture = _Capture()
+    database.logger.addHandler(capture)
+    threshold = database.SLOW_QUERY_MS
+    database.SLOW_QUERY_MS = 0
+    try:
+        with get_conn() as conn:
+            conn.execute("SELECT * FROM users WHERE email = ?", ("nobody@example.com",)).fetchall()
+    finally:
+        database.SLOW_QUERY_MS = threshold
+        database.logger.removeHandler(capture)
+    if any("plan:" in message and "uq_users_email" in message for message in capture.messages):
+        print("   ✓ Slow query logged with its query plan")
+    else:
+        print(f"   ✗ Slow query not logged: {capture.messages}")
+        return False
+
+    # Test 4: Budget helper fails when exceeded
+    print("\n4. Testing query budget helper...")
+    try:
+        with query_budget(1):
+            with get_conn() as conn:
+                conn.execute("SELECT 1").fetchone()
+                conn.execute("SELECT 2").fetchone()
+        print("   ✗ Budget overrun not reported")
+        return False
+    except QueryBudgetExceeded:
+        print("   ✓ Budget overrun raises QueryBudgetExceeded")
+
+    # Test 5: Endpoint budgets and debug headers
+    print("\n5. Testing endpoint query budgets...")
+    users = {}
+    for role in ["student", "teacher", "admin"]:
+        name = f"budget_{role}"
+        users[role] = User.find_by_name(name) or User.create_user(name, f"{name}@test.com", "pass", role)
+
+    app.config["SKJ_QUERY_HEADERS"] = True
+    client = app.test_client()
+    tokens = {role: auth_service.generate_token(user) for role, user in users.items()}
+    # Per-process caches (revocations, token versions, indexes) are filled by a first pass
+    for path, role, budget in ENDPOINT_BUDGETS:
+        client.get(path, headers={"Authorization": f"Bearer {tokens[role]}"} if role else {})
+    for path, role, budget in ENDPOINT_BUDGETS:
+        headers = {}
+        if role:
+            headers["Authorization"] = f"Bearer {tokens[role]}"
+        try:
+            with query_budget(budget):
+                response = client.get(path, headers=headers)
+        except QueryBudgetExceeded as e:
+            print(f"   ✗ {path}: {e}")
+            return False
+        if response.status_code != 200 or "X-Query-Count" not in response.headers:
+            print(f"   ✗ {path}: status {response.status_code}, headers {dict(response.headers)}")
+            return False
+        print(f"   ✓ {path}: {response.headers['X-Query-Count']} queries (budget {budget}), "
+              f"{response.headers['X-Query-Time-Ms']} ms")
+
+    print("\n✅ Query instrumentation test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_query_budget()
+    sys.exit(0 if success else 1)
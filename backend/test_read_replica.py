@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for the read-replica snapshot used by reporting queries
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_conn, run_write, refresh_replica, get_replica, get_replica_stats, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from app import app
+
+def _insert_rows(conn, start, count):
+    conn.executemany(
+        "INSERT INTO detailed_progress (user_id, challenge_id, action, payload, created_at) VALUES (1, 'c1', 'replica_test', ?, '2024-01-01T00:00:00')",
+        [(f"payload {i}" * 20,) for i in range(start, start + count)]
+    )
+
+def _count_rows(conn):
+    return conn.execute("SELECT COUNT(*) FROM detailed_progress WHERE action = 'replica_test'").fetchone()[0]
+
+def test_read_replica():
+    """Test snapshot reads, the staleness bound and refreshes under write load"""
+    print("Testing Read Replica...")
+
+    setup_database()
+    seed_if_empty()
+
+    settings = (database.READ_REPLICA, database.REPLICA_DIR, database.REPLICA_MAX_STALENESS, database.REPLICA_REFRESH_INTERVAL)
+    with tempfile.TemporaryDirectory() as replica_dir:
+        database.READ_REPLICA = True
+        database.REPLICA_DIR = replica_dir
+        database.REPLICA_MAX_STALENESS = 60
+        database.REPLICA_REFRESH_INTERVAL = 30
+        try:
+            # Test 1: Reads go to the snapshot, writes to the primary
+            print("\n1. Testing snapshot reads...")
+            run_write(_insert_rows, 0, 100)
+            refresh_replica()
+            run_write(_insert_rows, 100, 50)
+
+            primary = _count_rows(get_conn())
+            replica = _count_rows(get_conn(readonly=True))
+            if primary == 150 and replica == 100 and get_conn(readonly=True) is not get_conn():
+                print(f"   ✓ Replica sees {replica} rows, primary {primary}")
+            else:
+                print(f"   ✗ Unexpected counts: replica={replica}, primary={primary}")
+                return False
+
+            try:
+                get_conn(readonly=True).execute("DELETE FROM detailed_progress")
+                print("   ✗ Replica connection accepted a write")
+                return False
+            except Exception:
+                print("   ✓ Replica connection is read-only")
+
+            # Test 2: A refresh publishes a new generation
+            print("\n2. Testing refresh...")
+            refresh_replica()
+            refresh_replica()
+            generations = sorted(os.listdir(replica_dir))
+            replica = _count_rows(get_conn(readonly=True))
+            if replica == 150 and len([name for name in generations if name.endswith(".db")]) == 2:
+                print(f"   ✓ Replica caught up to {replica} rows, {len(generations) - 1} generations kept")
+            else:
+                print(f"   ✗ Refresh not visible: replica={replica}, files={generations}")
+                return False
+
+            # Test 3: Past the staleness bound reads fall back to the primary
+            print("\n3. Testing staleness bound...")
+            run_write(_insert_rows, 150, 10)
+            replica = get_replica()
+            replica.max_staleness = replica.refresh_interval = 0
+            fallbacks = replica.stats()['primary_fallbacks']
+            conn = get_conn(readonly=True)
+            stats = replica.stats()
+            if conn is get_conn() and _count_rows(conn) == 160 and stats['primary_fallbacks'] == fallbacks + 1:
+                print("   ✓ Stale snapshot skipped, read served by the primary")
+            else:
+                print(f"   ✗ Stale snapshot was used: {stats}")
+                return False
+            for _ in range(200):
+                if not replica.stats()['refreshing']:
+                    break
+                time.sleep(0.01)
+            replica.max_staleness, replica.refresh_interval = 60, 30
+            if _count_rows(get_conn(readonly=True)) == 160:
+                print("   ✓ Background refresh started by the stale read")
+            else:
+                print("   ✗ Background refresh did not run")
+                return False
+
+            # Test 4: Writers keep committing during a refresh
+            print("\n4. Testing writes during refresh...")
+            run_write(_insert_rows, 1000, 3000)
+            latencies = []
+            stop = threading.Event()
+
+            def writer():
+                offset = 10000
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    run_write(_insert_rows, offset, 5)
+                    latencies.append(time.perf_counter() - start)
+                    offset += 5
+
+            default_pages, default_sleep = database.BACKUP_PAGES, database.BACKUP_SLEEP
+            database.BACKUP_PAGES, database.BACKUP_SLEEP = 4, 0.005
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                time.sleep(0.05)
+                refresh_replica()
+            finally:
+                stop.set()
+                thread.join()
+                database.BACKUP_PAGES, database.BACKUP_SLEEP = default_pages, default_sleep
+
+            if latencies and max(latencies) < 1.0 and get_replica_stats()['error'] is None:
+                print(f"   ✓ {len(latencies)} writes during refresh, slowest {max(latencies) * 1000:.1f} ms")
+            else:
+                print(f"   ✗ Writes stalled during refresh: {len(latencies)} writes")
+                return False
+
+            # Test 5: Admin dashboard reads the replica
+            print("\n5. Testing admin dashboard...")
+            admin = User.find_by_name("replica_admin") or User.create_user("replica_admin", "replica_admin@test.com", "pass", "admin")
+            refresh_replica()
+            reads = get_replica().stats()['replica_reads']
+            client = app.test_client()
+            headers = {"Authorization": f"Bearer {auth_service.generate_token(admin)}"}
+            dashboard = client.get("/api/dashboard/admin", headers=headers)
+            stats = client.get("/api/admin/system/stats", headers=headers).get_json()
+            if dashboard.status_code == 200 and stats['replica']['replica_reads'] > reads and stats['replica']['enabled']:
+                print(f"   ✓ Dashboard served from {stats['replica']['generation']}")
+            else:
+                print(f"   ✗ Dashboard did not use the replica: {dashboard.status_code} {stats.get('replica')}")
+                return False
+        finally:
+            database.READ_REPLICA, database.REPLICA_DIR, database.REPLICA_MAX_STALENESS, database.REPLICA_REFRESH_INTERVAL = settings
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM detailed_progress WHERE action = 'replica_test'")
+        conn.commit()
+
+    print("\n✅ Read replica test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_read_replica()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for compiled row mappers
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import (
+    get_conn, compile_mapper, fetch_dicts, fetch_models, row_to_dict, setup_database, seed_if_empty
+)
+from models.user import User
+from models.challenge import Challenge
+from models.class_model import Class
+
+def test_row_mappers():
+    """Test compiled mappers match the per-row conversions they replace"""
+    print("Testing Compiled Row Mappers...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Dict mapper matches row_to_dict
+    print("\n1. Testing dict mapping...")
+    with get_conn() as conn:
+        rows = conn.execute("SELECT * FROM challenges ORDER BY id").fetchall()
+        mapped = fetch_dicts(conn.execute("SELECT * FROM challenges ORDER BY id"))
+    if mapped == [row_to_dict(row) for row in rows] and len(mapped) == len(rows) > 0:
+        print(f"   ✓ {len(mapped)} rows identical to row_to_dict()")
+    else:
+        print("   ✗ fetch_dicts() differs from row_to_dict()")
+        return False
+
+    # Test 2: Mappers are compiled once per result shape
+    print("\n2. Testing mapper cache...")
+    columns = ('id', 'name', 'id')
+    first = compile_mapper(columns)
+    if first is compile_mapper(columns) and first((1, 'a', 2)) == {'id': 1, 'name': 'a'}:
+        print("   ✓ Same mapper reused; duplicate columns resolve like sqlite3.Row")
+    else:
+        print("   ✗ Mapper cache or duplicate column handling broken")
+        return False
+
+    # Test 3: Model mappers decode JSON and apply defaults
+    print("\n3. Testing model mapping...")
+    user = User.find_by_name("mapper_user") or User.create_user("mapper_user", "mapper_user@test.com", "pass", "student")
+    user.preferences = {"theme": "dark"}
+    user.save()
+
+    with get_conn() as conn:
+        partial = fetch_models(conn.execute("SELECT id, name, preferences FROM users WHERE id = ?", (user.id,)), User)[0]
+    loaded = User.find_by_id(user.id)
+    if (loaded.preferences == {"theme": "dark"} and loaded.check_password("pass")
+            and partial.role == 'student' and partial.email is None):
+        print("   ✓ JSON columns decoded, missing columns use defaults")
+    else:
+        print("   ✗ Model mapping incorrect")
+        return False
+
+    challenge = Challenge.find_by_id("c1")
+    if isinstance(challenge.hints, list) and isinstance(challenge.simulation_config, dict) and challenge.is_active is True:
+        print("   ✓ Challenge JSON fields and flags mapped")
+    else:
+        print("   ✗ Challenge mapping incorrect")
+        return False
+
+    # Test 4: JSON fast path equals to_dict()
+    print("\n4. Testing JSON fast path...")
+    fast = User.get_all_user_dicts()
+    slow = [u.to_dict() for u in User.get_all_users()]
+    if fast == slow and fast:
+        print(f"   ✓ get_all_user_dicts() matches to_dict() for {len(fast)} users")
+    else:
+        print("   ✗ JSON fast path differs from to_dict()")
+        return False
+
+    # Test 5: Mapping cost compared with row_to_dict + from_db_row
+    print("\n5. Comparing mapping cost...")
+    with get_conn() as conn:
+        conn.execute("CREATE TEMP TABLE mapper_rows AS SELECT * FROM users")
+        for _ in range(11):
+            conn.execute("INSERT INTO mapper_rows SELECT * FROM mapper_rows")
+        count = conn.execute("SELECT COUNT(*) FROM mapper_rows").fetchone()[0]
+
+        start = time.perf_counter()
+        old = [row_to_dict(row) for row in conn.execute("SELECT * FROM mapper_rows").fetchall()]
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = fetch_dicts(conn.execute("SELECT * FROM mapper_rows"))
+        new_time = time.perf_counter() - start
+        conn.execute("DROP TABLE mapper_rows")
+
+    if old == new and len(new) == count:
+        print(f"   ✓ {count} rows: {old_time * 1000:.1f} ms row_to_dict() vs {new_time * 1000:.1f} ms compiled")
+    else:
+        print("   ✗ Row counts differ")
+        return False
+
+    # Test 6: Class lists use the mapper
+    print("\n6. Testing class lists...")
+    teacher = User.find_by_name("mapper_teacher") or User.create_user("mapper_teacher", "mapper_teacher@test.com", "pass", "teacher")
+    Class.create_class("Mapper Class", teacher.id, 1)
+    classes = Class.find_by_teacher(teacher.id)
+    if classes and isinstance(classes[0], Class) and classes[0].is_active is True:
+        print(f"   ✓ find_by_teacher() returned {len(classes)} classes")
+    else:
+        print("   ✗ Class mapping incorrect")
+        return False
+
+    print("\n✅ Compiled row mapper test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_row_mappers()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for schema versioning and the startup fast path
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, setup_database, get_schema_fingerprint, MIGRATIONS_DIR, DB_PATH
+from migrations.migration_manager import MigrationManager
+
+GOOD_MIGRATION = '''
+def up(conn):
+    conn.execute("CREATE TABLE first_table (id INTEGER PRIMARY KEY)")
+    conn.commit()
+'''
+
+BAD_MIGRATION = '''
+def up(conn):
+    conn.execute("CREATE TABLE second_table (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    raise RuntimeError("broken migration")
+'''
+
+def test_schema_version():
+    """Test the fingerprint check and single-transaction migrations"""
+    print("Testing Schema Versioning...")
+
+    # Test 1: Full setup stamps the database
+    print("\n1. Testing full setup...")
+    setup_database(seed=True)
+    with get_conn() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == get_schema_fingerprint(seeded=True):
+        print(f"   ✓ Database stamped with fingerprint {version}")
+    else:
+        print(f"   ✗ Unexpected user_version {version}")
+        return False
+
+    # Test 2: Up-to-date database takes the fast path
+    print("\n2. Testing startup fast path...")
+    start = time.perf_counter()
+    ran = setup_database(seed=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if ran is False and setup_database() is False:
+        print(f"   ✓ Up-to-date database skipped setup in {elapsed:.2f} ms")
+    else:
+        print("   ✗ Setup ran again on an up-to-date database")
+        return False
+
+    # Test 3: A stale fingerprint triggers the full path again
+    print("\n3. Testing stale fingerprint...")
+    with get_conn() as conn:
+        conn.execute("PRAGMA user_version = 0")
+    if setup_database(seed=True) is True and setup_database(seed=True) is False:
+        print("   ✓ Stale database re-checked and stamped again")
+    else:
+        print("   ✗ Stale fingerprint not detected")
+        return False
+
+    # Test 4: Only numbered files are migrations
+    print("\n4. Testing migration discovery...")
+    migrations = MigrationManager.list_migrations(MIGRATIONS_DIR)
+    manager = MigrationManager(DB_PATH, MIGRATIONS_DIR)
+    if "migration_manager.py" not in migrations and "__init__.py" not in migrations and not manager.get_pending_migrations():
+        print(f"   ✓ {len(migrations)} migrations, schema version {manager.get_schema_version()}")
+    else:
+        print(f"   ✗ Unexpected migration list: {migrations}")
+        return False
+
+    # Test 5: Pending migrations share one transaction
+    print("\n5. Testing single-transaction migrations...")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        migrations_dir = tmp / "migrations"
+        migrations_dir.mkdir()
+        (migrations_dir / "001_first.py").write_text(GOOD_MIGRATION)
+        (migrations_dir / "002_second.py").write_text(BAD_MIGRATION)
+        db_path = tmp / "test.db"
+
+        manager = MigrationManager(db_path, migrations_dir)
+        try:
+            manager.run_migrations()
+            print("   ✗ Broken migration did not raise")
+            return False
+        except RuntimeError:
+            pass
+
+        conn = sqlite3.connect(db_path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        if "first_table" not in tables and "second_table" not in tables and not manager.get_applied_migrations():
+            print("   ✓ Failed batch rolled back completely")
+        else:
+            print(f"   ✗ Partial migration left behind: {tables}")
+            return False
+
+        (migrations_dir / "002_second.py").write_text(GOOD_MIGRATION.replace("first_table", "second_table"))
+        manager.run_migrations()
+        if manager.get_applied_migrations() == ["001_first.py", "002_second.py"] and manager.get_schema_version() == 2:
+            print("   ✓ Fixed batch applied in one go")
+        else:
+            print(f"   ✗ Unexpected applied migrations: {manager.get_applied_migrations()}")
+            return False
+
+    print("\n✅ Schema versioning test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_schema_version()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the verified-token cache and revocation
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from services.auth_service import auth_service, AuthService
+from services.token_cache import TokenCache
+from services.change_feed import ChangeFeed
+from app import app
+
+def test_token_cache():
+    """Test cache hits, shared token versions and logout revocation across workers"""
+    print("Testing Token Cache...")
+
+    setup_database()
+    seed_if_empty()
+
+    student = User.find_by_name("token_student") or User.create_user("token_student", "token_student@test.com", "pass", "student")
+    teacher = User.find_by_name("token_teacher") or User.create_user("token_teacher", "token_teacher@test.com", "pass", "teacher")
+    client = app.test_client()
+    token = auth_service.generate_token(student)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Test 1: Repeated requests skip decode; revocations come from memory after one change log poll
+    print("\n1. Testing cache hits...")
+    client.get("/api/auth/me", headers=headers)
+    hits = auth_service.cache.stats()['hits']
+    with track_queries() as log:
+        for _ in range(10):
+            response = client.get("/api/auth/me", headers=headers)
+    revoked_reads = [record for record in log.records if "revoked_tokens" in record.sql]
+    if response.status_code == 200 and log.count == 20 and not revoked_reads \
+            and auth_service.cache.stats()['hits'] == hits + 10:
+        print("   ✓ 10 authenticated requests, 10 cache hits, change log poll and user row each")
+    else:
+        print(f"   ✗ Unexpected: {response.status_code}, {log.count} queries")
+        return False
+
+    # Test 2: Changes made by another worker bump the stored token version
+    print("\n2. Testing shared token version...")
+    def token_version():
+        with get_conn() as conn:
+            return conn.execute("SELECT token_version FROM users WHERE id = ?", (student.id,)).fetchone()[0]
+    version = token_version()
+    cached = auth_service.cache.token_version(student.id)
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET role = 'teacher' WHERE id = ?", (student.id,))
+        conn.execute("UPDATE users SET role = 'student' WHERE id = ?", (student.id,))
+        conn.commit()
+    if cached == version and token_version() == version + 2 and auth_service.cache.token_version(student.id) == version + 2:
+        print("   ✓ Role changes bump token_version, the cached copy follows the change log")
+    else:
+        print(f"   ✗ Unexpected token version: {token_version()} (was {version})")
+        return False
+
+    # Test 3: Role changes, class membership and deletion invalidate
+    print("\n3. Testing invalidation...")
+    user = User.find_by_id(student.id)
+    user.role = "teacher"
+    user.save()
+    role = client.get("/api/auth/me", headers=headers).get_json()['user']['role']
+    user.role = "student"
+    user.save()
+    class_obj = Class.create_class("Token Class", teacher.id, 1)
+    client.get("/api/auth/me", headers=headers)
+    class_obj.add_student(student.id)
+    joined = client.get("/api/auth/me", headers=headers).get_json()['user']['class_id']
+    class_obj.delete()
+    left = client.get("/api/auth/me", headers=headers).get_json()['user']['class_id']
+    if role == "teacher" and joined == class_obj.id and left is None:
+        print("   ✓ Role and class changes visible on the next request")
+    else:
+        print(f"   ✗ Stale user: role={role}, joined={joined}, left={left}")
+        return False
+
+    # Test 4: Logout revokes the token in every worker
+    print("\n4. Testing logout...")
+    other = auth_service.generate_token(User.find_by_id(student.id), expires_in_hours=1)
+    # A second worker process: its own cache, already holding the token
+    worker = AuthService(cache=TokenCache(feed=ChangeFeed()))
+    worker.verify_token(token)
+    response = client.post("/api/auth/logout", headers=headers)
+    after = client.get("/api/auth/me", headers=headers)
+    still = client.get("/api/auth/me", headers={"Authorization": f"Bearer {other}"})
+    with app.test_request_context(headers=headers):
+        elsewhere = worker.get_current_user()
+    if response.status_code == 200 and after.status_code == 401 and still.status_code == 200 \
+            and auth_service.verify_token(token) is None and worker.verify_token(token) is None \
+            and elsewhere is None:
+        print("   ✓ Logged-out token rejected by every cache, other tokens still valid")
+    else:
+        print(f"   ✗ Unexpected statuses: {response.status_code} {after.status_code} {still.status_code}")
+        return False
+
+    # Test 5: Deleted users are rejected at once
+    print("\n5. Testing delete...")
+    User.find_by_id(student.id).delete()
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {other}"})
+    if response.status_code == 401:
+        print("   ✓ Deleted user's token rejected")
+    else:
+        print(f"   ✗ Deleted user still authenticated: {response.status_code}")
+        return False
+
+    # Test 6: Bounded size and TTL capped at exp
+    print("\n6. Testing size and expiry...")
+    cache = TokenCache(max_size=3, ttl=60, feed=ChangeFeed())
+    for n in range(5):
+        cache.put(f"t{n}", {'user_id': n})
+    cache.put("expiring", {'user_id': 9, 'exp': time.time() + 0.05})
+    time.sleep(0.1)
+    if cache.stats()['size'] == 3 and cache.get("t0") is None and cache.get("t4") and cache.get("expiring") is None:
+        print("   ✓ Oldest entries evicted, expired token dropped")
+    else:
+        print(f"   ✗ Unexpected cache state: {cache.stats()}")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE name LIKE 'token_%'")
+        conn.execute("DELETE FROM revoked_tokens")
+        conn.commit()
+
+    print("\n✅ Token cache test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_token_cache()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch challenge unlock matrix
+"""
+
+import sys
+import os
+import time
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from models.challenge import Challenge
+from services.auth_service import auth_service
+from services.prerequisite_service import prerequisite_service
+from app import app, _write_progress
+
+def _complete_all(conn, completions):
+    """Write unit: mark many (user, challenge) pairs completed"""
+    for user_id, challenge_id in completions:
+        _write_progress(conn, user_id, challenge_id, "completed", 10, "{}")
+
+def _reference(user_id, challenge_id):
+    """Status from the per-challenge validation"""
+    can_access, _ = prerequisite_service.validate_prerequisites(challenge_id, user_id)
+    if not can_access:
+        return 'locked'
+    return 'completed' if challenge_id in prerequisite_service.get_user_completed_challenges(user_id) else 'available'
+
+def test_unlock_matrix():
+    """Test class-wide and single-user unlock statuses against per-challenge validation"""
+    print("Testing Unlock Matrix...")
+
+    setup_database()
+    seed_if_empty()
+
+    rng = random.Random(25)
+    ids = [f"um_{n:03d}" for n in range(200)]
+    for n, challenge_id in enumerate(ids):
+        prereqs = rng.sample(ids[max(0, n - 20):n], min(n, rng.randint(0, 2)))
+        if n == 7:
+            prereqs.append("um_unknown")
+        Challenge.create_challenge(challenge_id, "m1", f"Unlock {n}", prerequisites=prereqs)
+
+    teacher = User.find_by_name("unlock_teacher") or User.create_user("unlock_teacher", "unlock_teacher@test.com", "pass", "teacher")
+    other = User.find_by_name("unlock_other") or User.create_user("unlock_other", "unlock_other@test.com", "pass", "teacher")
+    class_obj = Class.create_class("Unlock Class", teacher.id, 1)
+    students = [
+        User.find_by_name(f"unlock_student_{n:02d}") or User.create_user(f"unlock_student_{n:02d}", f"unlock_student_{n:02d}@test.com")
+        for n in range(40)
+    ]
+    class_obj.add_students([student.id for student in students])
+    completions = [(student.id, challenge_id) for student in students for challenge_id in ids if rng.random() < 0.4]
+    run_write(_complete_all, completions)
+
+    # Test 1: Batch statuses match per-challenge validation
+    print("\n1. Testing against per-challenge validation...")
+    sample = [student.id for student in students[:4]]
+    rows = prerequisite_service.unlock_matrix(sample, ids)
+    mismatches = [(user_id, challenge_id) for user_id in sample for challenge_id, status in zip(ids, rows[user_id])
+                  if status != _reference(user_id, challenge_id)]
+    statuses = {status for row in rows.values() for status in row}
+    if not mismatches and statuses == {'completed', 'available', 'locked'} and rows[sample[0]][7] == 'locked':
+        print(f"   ✓ {len(sample) * len(ids)} statuses match, unknown prerequisite keeps challenge locked")
+    else:
+        print(f"   ✗ Mismatches: {mismatches[:5]}")
+        return False
+
+    # Test 2: Single-user available/locked lists (plus one lookup of the unknown prerequisite)
+    print("\n2. Testing get_available_challenges...")
+    with track_queries() as log:
+        available, locked = prerequisite_service.get_available_challenges(sample[0], "m1")
+    by_id = {item['challenge'].id: item for item in available + locked}
+    consistent = all(by_id[challenge_id]['status'] == status for challenge_id, status in zip(ids, rows[sample[0]]))
+    missing_ok = all(item['missing_prerequisites'] for item in locked)
+    if log.count <= 3 and consistent and missing_ok:
+        print(f"   ✓ {len(available)} available, {len(locked)} locked in {log.count} queries")
+    else:
+        print(f"   ✗ Unexpected: {log.count} queries, consistent={consistent}, missing={missing_ok}")
+        return False
+
+    # Test 3: Class grid endpoint
+    print("\n3. Testing class unlock endpoint...")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(teacher)}"}
+    client.get(f"/api/classes/{class_obj.id}/unlocks?module_id=m1", headers=headers)
+    started = time.perf_counter()
+    # One query for the token check (change log), one for the graph generation, at most three for the grid
+    with track_queries() as log:
+        response = client.get(f"/api/classes/{class_obj.id}/unlocks?module_id=m1", headers=headers)
+    elapsed = (time.perf_counter() - started) * 1000
+    data = response.get_json()
+    denied = client.get(f"/api/classes/{class_obj.id}/unlocks", headers={"Authorization": f"Bearer {auth_service.generate_token(other)}"})
+    grid_ids = [challenge['id'] for challenge in data['challenges']]
+    first = next(student for student in data['students'] if student['id'] == sample[0])
+    if response.status_code == 200 and len(data['students']) == 40 and set(ids) <= set(grid_ids) \
+            and [first['statuses'][grid_ids.index(c)] for c in ids] == rows[sample[0]] \
+            and log.count <= 5 and denied.status_code == 403:
+        print(f"   ✓ {len(data['students'])} x {len(grid_ids)} grid in {log.count} queries, {elapsed:.1f} ms")
+    else:
+        print(f"   ✗ Unexpected: {response.status_code} {denied.status_code}, {log.count} queries")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE challenge_id LIKE 'um_%'")
+        conn.execute("DELETE FROM detailed_progress WHERE challenge_id LIKE 'um_%'")
+        conn.commit()
+    class_obj.delete()
+    for user in students + [teacher, other]:
+        User.find_by_id(user.id).delete()
+    for challenge_id in ids:
+        Challenge.find_by_id(challenge_id).delete()
+
+    print("\n✅ Unlock matrix test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_unlock_matrix()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for single-statement upsert persistence
+"""
+
+import sys
+import os
+import sqlite3
+import importlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, track_queries, setup_database, seed_if_empty
+from models.user import User
+from models.challenge import Challenge
+from models.class_model import Class
+from services.auth_service import auth_service
+from app import app, _write_progress, _save_error
+
+def test_upsert_persistence():
+    """Test upserts, constraint-backed uniqueness and error mapping"""
+    print("Testing Upsert Persistence...")
+
+    setup_database()
+    seed_if_empty()
+
+    # Test 1: Each save() is a single statement
+    print("\n1. Testing statement counts...")
+    teacher = User.find_by_name("upsert_teacher") or User.create_user("upsert_teacher", "upsert_teacher@test.com", "pass", "teacher")
+    challenge = Challenge.find_by_id("upsert_challenge") or Challenge.create_challenge("upsert_challenge", "m1", "Upsert")
+    class_obj = Class.create_class("Upsert Class", teacher.id, 1)
+
+    counts = {}
+    for name, model in (("user", teacher), ("challenge", challenge), ("class", class_obj)):
+        with track_queries() as log:
+            model.save()
+        counts[name] = log.count
+    with track_queries() as log:
+        run_write(_write_progress, teacher.id, "upsert_challenge", "started", 0, "{}")
+        run_write(_write_progress, teacher.id, "upsert_challenge", "completed", 40, "{}")
+    with get_conn() as conn:
+        progress = conn.execute(
+            "SELECT COUNT(*), MAX(status), MAX(points) FROM progress WHERE user_id = ? AND challenge_id = 'upsert_challenge'",
+            (teacher.id,)
+        ).fetchone()
+
+    if set(counts.values()) == {1} and tuple(progress) == (1, "completed", 40):
+        print(f"   ✓ One statement per save {counts}, progress upserted in place")
+    else:
+        print(f"   ✗ Unexpected statements {counts}, progress {tuple(progress)}")
+        return False
+
+    if challenge.updated_at >= challenge.created_at and class_obj.id and class_obj.class_code:
+        print("   ✓ Generated ids, codes and timestamps read back with RETURNING")
+    else:
+        print("   ✗ Saved values not read back")
+        return False
+
+    # Test 2: Constraint failures keep the existing messages
+    print("\n2. Testing constraint errors...")
+    other = User.find_by_name("upsert_other") or User.create_user("upsert_other", "upsert_other@test.com", "pass")
+    other.email = "upsert_teacher@test.com"
+    errors = []
+    for action in (
+        other.save,
+        lambda: User.create_user("upsert_teacher", "fresh@test.com"),
+        lambda: Challenge.create_challenge("upsert_challenge", "m1", "Again"),
+        lambda: Class(name="Copy", teacher_id=teacher.id, semester=1, class_code=class_obj.class_code).save(),
+    ):
+        try:
+            action()
+            errors.append(None)
+        except ValueError as e:
+            errors.append(str(e))
+    expected = [
+        "User with this email already exists",
+        "User with this name already exists",
+        "Challenge with ID 'upsert_challenge' already exists",
+        "Class with this code already exists",
+    ]
+    if errors == expected and User.find_by_id(other.id).email == "upsert_other@test.com":
+        print("   ✓ Duplicate email, name, challenge ID and class code rejected")
+    else:
+        print(f"   ✗ Unexpected errors: {errors}")
+        return False
+
+    # Test 3: The migration refuses to run over duplicate data
+    print("\n3. Testing migration with duplicates...")
+    migration = importlib.import_module("migrations.011_add_unique_constraints")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.execute("CREATE TABLE classes (id INTEGER PRIMARY KEY, class_code TEXT)")
+    conn.executemany("INSERT INTO users (email) VALUES (?)", [("a@test.com",), ("a@test.com",), (None,), (None,)])
+    conn.execute("INSERT INTO classes (class_code) VALUES ('ABC123')")
+    try:
+        migration.up(conn)
+        failure = None
+    except RuntimeError as e:
+        failure = str(e)
+    conn.rollback()
+    conn.execute("UPDATE users SET email = 'b@test.com' WHERE id = 2")
+    migration.up(conn)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    if failure and "a@test.com" in failure and indexes == {"uq_users_email", "uq_classes_class_code"}:
+        print("   ✓ Duplicate emails fail the migration, both indexes created once resolved")
+    else:
+        print(f"   ✗ Unexpected migration result: {failure}, indexes={indexes}")
+        return False
+
+    # Test 4: Only the email constraint is reported as a taken email
+    print("\n4. Testing endpoint error messages...")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(other)}"}
+    taken = client.put("/api/auth/profile", json={"email": "upsert_teacher@test.com"}, headers=headers)
+    if taken.status_code == 400 and taken.get_json()['error'] == "Email already in use" \
+            and _save_error(ValueError("Name is required")) == "Name is required":
+        print("   ✓ Taken email mapped, other validation errors passed through")
+    else:
+        print(f"   ✗ Unexpected response: {taken.status_code} {taken.get_json()}")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE challenge_id = 'upsert_challenge'")
+        conn.execute("DELETE FROM challenges WHERE id = 'upsert_challenge'")
+        conn.execute("DELETE FROM classes WHERE id = ?", (class_obj.id,))
+        conn.commit()
+
+    print("\n✅ Upsert persistence test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_upsert_persistence()
+    sys.exit(0 if success else 1)
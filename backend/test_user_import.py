@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk user import
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from services.auth_service import auth_service
+from services.import_service import UserImporter
+from import_users import main as import_main
+from app import app
+
+def test_user_import():
+    """Test streaming CSV/JSONL import, validation and class assignment"""
+    print("Testing User Import...")
+
+    setup_database()
+    seed_if_empty()
+
+    teacher = User.find_by_name("import_teacher") or User.create_user("import_teacher", "import_teacher@test.com", "pass", "teacher")
+    class_obj = Class.create_class("Import Class", teacher.id, 1)
+    User.find_by_name("import_existing") or User.create_user("import_existing", "import_existing@test.com", "pass")
+
+    # Test 1: CSV import with hashing, class assignment and per-line errors
+    print("\n1. Testing CSV import...")
+    lines = ["name,email,password,role"]
+    lines += [f"import_student_{n},import_student_{n}@test.com,secret{n}," for n in range(30)]
+    lines += [
+        ",nobody@test.com,x,",
+        "import_existing,,x,",
+        "import_student_0,,x,",
+        "import_bad_role,,x,janitor",
+        "import_helper,import_helper@test.com,x,teacher",
+    ]
+    start = time.time()
+    summary = UserImporter(batch_size=8).import_users(io.StringIO("\n".join(lines)), "csv", class_id=class_obj.id)
+    elapsed = time.time() - start
+    errors = {error['line']: error['error'] for error in summary['errors']}
+    student = User.find_by_name("import_student_7")
+    if summary['imported'] == 31 and summary['batches'] == 5 and sorted(errors) == [32, 33, 34, 35] \
+            and student.check_password("secret7") and student.class_id == class_obj.id \
+            and User.find_by_name("import_helper").class_id is None and class_obj.get_student_count() == 30:
+        print(f"   ✓ {summary['imported']} users in {summary['batches']} batches ({elapsed:.1f}s), errors: {errors}")
+    else:
+        print(f"   ✗ Unexpected summary: {summary}")
+        return False
+
+    # Test 2: JSONL through the admin endpoint
+    print("\n2. Testing JSONL upload...")
+    admin = User.find_by_name("admin") or User.create_user("import_admin", "import_admin@test.com", "pass", "admin")
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(admin)}"}
+    body = "\n".join([json.dumps({"name": f"import_jsonl_{n}", "password": "pw"}) for n in range(5)] + ["{oops", ""])
+    client = app.test_client()
+    response = client.post(
+        "/api/admin/users/import",
+        data={"file": (io.BytesIO(body.encode()), "users.jsonl")},
+        headers=headers
+    )
+    data = response.get_json()
+    if response.status_code == 200 and data['imported'] == 5 and data['errors'] == [{"line": 6, "error": "Invalid JSON"}]:
+        print("   ✓ JSONL file imported, invalid line reported")
+    else:
+        print(f"   ✗ Unexpected response: {response.status_code} {data}")
+        return False
+
+    # Test 3: Permission and class validation
+    print("\n3. Testing access control and validation...")
+    statuses = [
+        client.post("/api/admin/users/import", data=body,
+                    headers={"Authorization": f"Bearer {auth_service.generate_token(User.find_by_name('import_student_1'))}"}).status_code,
+        client.post("/api/admin/users/import?format=jsonl&class_id=999999", data=body, headers=headers).status_code,
+    ]
+    if statuses == [403, 400]:
+        print("   ✓ Students rejected, unknown class rejected")
+    else:
+        print(f"   ✗ Unexpected status codes: {statuses}")
+        return False
+
+    # Test 4: CLI
+    print("\n4. Testing CLI...")
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        f.write("name,email\nimport_cli_user,import_cli_user@test.com\n")
+    try:
+        code = import_main([f.name])
+    finally:
+        os.unlink(f.name)
+    if code == 0 and User.find_by_name("import_cli_user") and import_main(["/nonexistent.csv"]) == 1:
+        print("   ✓ CLI imported file")
+    else:
+        print("   ✗ CLI import failed")
+        return False
+
+    # Test 5: Class capacity
+    print("\n5. Testing class capacity...")
+    small = Class.create_class("Import Small Class", teacher.id, 1, max_students=3)
+    small.add_student(User.find_by_name("import_jsonl_0").id)
+    lines = ["name,email,password,role"] + [f"import_seat_{n},,pw," for n in range(4)] + ["import_seat_teacher,,pw,teacher"]
+    summary = UserImporter(batch_size=2).import_users(io.StringIO("\n".join(lines)), "csv", class_id=small.id)
+    full = [error['line'] for error in summary['errors'] if error.get('status') == 'class_full']
+    if summary['imported'] == 3 and full == [4, 5] and small.get_student_count() == 3 \
+            and User.find_by_name("import_seat_teacher") and not User.find_by_name("import_seat_3"):
+        print(f"   ✓ 2 seats filled across batches, lines {full} rejected as class_full, teacher imported")
+    else:
+        print(f"   ✗ Unexpected summary: {summary}, {small.get_student_count()} students")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("UPDATE users SET class_id = NULL WHERE name LIKE 'import_%'")
+        conn.execute("DELETE FROM users WHERE name LIKE 'import_%'")
+        conn.execute("DELETE FROM classes WHERE name IN ('Import Class', 'Import Small Class')")
+        conn.commit()
+
+    print("\n✅ User import test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_user_import()
+    sys.exit(0 if success else 1)
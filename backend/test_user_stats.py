@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for trigger-maintained user progress summaries
+"""
+
+import sys
+import os
+import json
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, track_queries, setup_database, seed_if_empty
+from models.user import User
+from services.auth_service import auth_service
+from stats import rebuild_user_stats
+from app import app, _write_progress
+
+def _snapshot():
+    """User statistics with completed sets normalized"""
+    with get_conn() as conn:
+        users = {
+            row[0]: (row[1], row[2], sorted(json.loads(row[3]))) for row in conn.execute(
+                "SELECT user_id, total_points, completed_count, completed FROM user_stats"
+            ) if row[1] or row[2]
+        }
+        modules = {
+            (row[0], row[1]): row[2] for row in conn.execute(
+                "SELECT user_id, module_id, completed FROM user_module_stats WHERE completed != 0"
+            )
+        }
+    return users, modules
+
+def test_user_stats():
+    """Test incremental user statistics against a full rebuild and the endpoints using them"""
+    print("Testing User Statistics...")
+
+    setup_database()
+    seed_if_empty()
+
+    rng = random.Random(20)
+    students = [
+        User.find_by_name(f"ustats_student_{n}") or User.create_user(f"ustats_student_{n}", f"ustats_student_{n}@test.com", "pass", "student")
+        for n in range(6)
+    ]
+    with get_conn() as conn:
+        challenges = [row[0] for row in conn.execute("SELECT id FROM challenges")]
+
+    # Test 1: Incremental updates match a rebuild
+    print("\n1. Testing incremental maintenance...")
+    for step in range(300):
+        student = rng.choice(students)
+        if rng.random() < 0.85:
+            status = rng.choice(["started", "completed", "completed"])
+            run_write(_write_progress, student.id, rng.choice(challenges), status, rng.randint(0, 50), "{}")
+        else:
+            with get_conn() as conn:
+                conn.execute("DELETE FROM progress WHERE user_id = ? AND challenge_id = ?", (student.id, rng.choice(challenges)))
+                conn.commit()
+
+    incremental = _snapshot()
+    run_write(rebuild_user_stats)
+    if incremental == _snapshot() and incremental[0]:
+        print(f"   ✓ {len(incremental[0])} users and {len(incremental[1])} module rows match a full rebuild")
+    else:
+        print(f"   ✗ Drift: incremental={incremental}, rebuilt={_snapshot()}")
+        return False
+
+    # Test 2: Progress endpoint reads the summary in one query (plus one for the raw rows unless skipped)
+    print("\n2. Testing GET /api/progress...")
+    client = app.test_client()
+    student = max(students, key=lambda s: User.get_progress_summary(s.id)['completed_count'])
+    with get_conn() as conn:
+        rows = conn.execute("SELECT challenge_id, status, points FROM progress WHERE user_id = ?", (student.id,)).fetchall()
+    with track_queries() as log:
+        data = client.get(f"/api/progress/{student.id}?include_entries=false").get_json()
+    expected_completed = sorted(r[0] for r in rows if r[1] == "completed")
+    full = client.get(f"/api/progress/{student.id}").get_json()
+    if log.count == 1 and data['points'] == sum(r[2] for r in rows) and sorted(data['completed']) == expected_completed \
+            and sum(data['module_completion'].values()) == len(expected_completed) and 'entries' not in data \
+            and len(full['entries']) == len(rows):
+        print(f"   ✓ {data['points']} points, {len(data['completed'])} completed in {log.count} query")
+    else:
+        print(f"   ✗ Unexpected progress: {log.count} queries, {data}")
+        return False
+
+    # Test 3: Dashboard and leaderboard use the summary
+    print("\n3. Testing dashboard and leaderboard...")
+    headers = {"Authorization": f"Bearer {auth_service.generate_token(student)}"}
+    dashboard = client.get("/api/dashboard/student", headers=headers).get_json()
+    leaderboard = {row['name']: row['points'] for row in client.get("/api/leaderboard").get_json()}
+    if dashboard['statistics']['total_points'] == data['points'] \
+            and dashboard['statistics']['completed_challenges'] == len(expected_completed) \
+            and len(dashboard['recent_progress']) == min(5, len(rows)) \
+            and leaderboard[student.name] == data['points']:
+        print("   ✓ Dashboard statistics and leaderboard agree with progress")
+    else:
+        print(f"   ✗ Mismatch: {dashboard['statistics']}, leaderboard={leaderboard.get(student.name)}")
+        return False
+
+    # Test 4: Deleting a user removes their statistics
+    print("\n4. Testing user delete...")
+    with get_conn() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (students[0].id,))
+        conn.commit()
+    if User.get_progress_summary(students[0].id) == {'total_points': 0, 'completed_count': 0, 'completed': [], 'module_completion': {}}:
+        print("   ✓ Statistics removed with the user")
+    else:
+        print("   ✗ Statistics left behind")
+        return False
+
+    with get_conn() as conn:
+        conn.execute("DELETE FROM progress WHERE user_id IN (SELECT id FROM users WHERE name LIKE 'ustats_student_%')")
+        conn.execute("DELETE FROM users WHERE name LIKE 'ustats_student_%'")
+        conn.commit()
+
+    print("\n✅ User statistics test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_user_stats()
+    sys.exit(0 if success else 1)
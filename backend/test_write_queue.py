@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-writer commit queue
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_conn, run_write, submit_write, get_writer_stats, setup_database, seed_if_empty
+from models.user import User
+from models.class_model import Class
+from services.activity_service import activity_buffer
+
+def _create_counter(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS write_queue_test (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+    conn.execute("DELETE FROM write_queue_test")
+
+def _insert_value(conn, value):
+    cursor = conn.execute("INSERT INTO write_queue_test (value) VALUES (?)", (value,))
+    return cursor.lastrowid
+
+def _failing_unit(conn):
+    conn.execute("INSERT INTO write_queue_test (value) VALUES (-1)")
+    raise ValueError("unit failed")
+
+def _savepoint_breaking_unit(conn):
+    # Releasing the writer's savepoint makes its ROLLBACK TO fail
+    conn.execute("RELEASE write_unit")
+    raise ValueError("unit failed")
+
+def test_write_queue():
+    """Test group-committed writes through the writer thread"""
+    print("Testing Single-Writer Commit Queue...")
+
+    setup_database()
+    seed_if_empty()
+    run_write(_create_counter)
+
+    # Test 1: Results are returned to the caller
+    print("\n1. Testing write results...")
+    row_id = run_write(_insert_value, 1)
+    if isinstance(row_id, int) and row_id > 0:
+        print(f"   ✓ Write unit returned row id {row_id}")
+    else:
+        print("   ✗ Write unit result missing")
+        return False
+
+    # Test 2: Concurrent writers are group-committed
+    print("\n2. Testing concurrent writes...")
+    before = get_writer_stats()
+    errors = []
+
+    def writer(offset):
+        try:
+            futures = [submit_write(_insert_value, offset + i) for i in range(50)]
+            for future in futures:
+                future.result(30)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n * 100,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    after = get_writer_stats()
+    with get_conn() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM write_queue_test").fetchone()[0]
+
+    batches = after['batches'] - before['batches']
+    if not errors and count == 401 and batches < 400:
+        print(f"   ✓ 400 writes committed in {batches} transactions")
+    else:
+        print(f"   ✗ Concurrent writes failed: errors={errors}, rows={count}, batches={batches}")
+        return False
+
+    # Test 3: A failing unit does not affect the rest of its batch
+    print("\n3. Testing failure isolation...")
+    bad = submit_write(_failing_unit)
+    good = submit_write(_insert_value, 999)
+    try:
+        bad.result(30)
+        print("   ✗ Failing unit did not raise")
+        return False
+    except ValueError:
+        print("   ✓ Unit exception propagated to the caller")
+
+    good.result(30)
+    with get_conn() as conn:
+        negatives = conn.execute("SELECT COUNT(*) FROM write_queue_test WHERE value = -1").fetchone()[0]
+        kept = conn.execute("SELECT COUNT(*) FROM write_queue_test WHERE value = 999").fetchone()[0]
+    if negatives == 0 and kept == 1:
+        print("   ✓ Failed unit rolled back, neighbouring unit committed")
+    else:
+        print("   ✗ Failure isolation broken")
+        return False
+
+    # Test 4: Writer survives a batch failing outside the units
+    print("\n4. Testing writer recovery...")
+    broken = submit_write(_savepoint_breaking_unit)
+    try:
+        broken.result(5)
+        print("   ✗ Broken batch did not fail")
+        return False
+    except Exception as e:
+        failure = e
+    if get_writer_stats()['running'] and run_write(_insert_value, 1000):
+        print(f"   ✓ Batch failed with {type(failure).__name__}, writer still running")
+    else:
+        print("   ✗ Writer thread died")
+        return False
+
+    # Test 5: Model writes go through the queue
+    print("\n5. Testing model write paths...")
+    teacher = User.create_user("writer_teacher", "writer_teacher@test.com", "pass", "teacher")
+    student = User.create_user("writer_student", "writer_student@test.com", "pass", "student")
+    student.update_last_active()
+    activity_buffer.flush()
+    with get_conn() as conn:
+        stored = conn.execute("SELECT last_active FROM users WHERE id = ?", (student.id,)).fetchone()[0]
+    if stored == student.last_active:
+        print("   ✓ update_last_active persisted through the writer")
+    else:
+        print("   ✗ update_last_active not persisted")
+        return False
+
+    class_obj = Class.create_class("Writer Queue Class", teacher.id, 1, max_students=1)
+    if class_obj.add_student(student.id):
+        print("   ✓ add_student persisted through the writer")
+    else:
+        print("   ✗ add_student failed")
+        return False
+
+    other = User.create_user("writer_student_2", "writer_student_2@test.com", "pass", "student")
+    try:
+        class_obj.add_student(other.id)
+        print("   ✗ Capacity not enforced")
+        return False
+    except ValueError:
+        print("   ✓ Capacity enforced inside the write transaction")
+
+    with get_conn() as conn:
+        conn.execute("DROP TABLE write_queue_test")
+        conn.commit()
+
+    print("\n✅ Single-writer commit queue test completed successfully!")
+    return True
+
+if __name__ == "__main__":
+    success = test_write_queue()
+    sys.exit(0 if success else 1)